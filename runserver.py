@@ -1,22 +1,22 @@
-# Copyright 2020 The `Kumar Nityan Suman` (https://github.com/nityansuman/).
-# All Rights Reserved.
-#
-#                     GNU GENERAL PUBLIC LICENSE
-#                        Version 3, 29 June 2007
-#  Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
-#  Everyone is permitted to copy and distribute verbatim copies
-#  of this license document, but changing it is not allowed.
-# ==============================================================================
-
-import os
-from src import app
-
-
-if __name__ == "__main__":
-    HOST = os.environ.get("SERVER_HOST", "localhost")
-    try:
-        PORT = int(os.environ.get("SERVER_PORT", "5555"))
-    except ValueError:
-        PORT = 1234
-    app.secret_key = "1cd6f35db029d4b8fc98fc05c9efd06a2e2cd1ffc3774d3f035ebd8d"
-    app.run(HOST, PORT, debug=True)
+# Copyright 2020 The `Kumar Nityan Suman` (https://github.com/nityansuman/).
+# All Rights Reserved.
+#
+#                     GNU GENERAL PUBLIC LICENSE
+#                        Version 3, 29 June 2007
+#  Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+#  Everyone is permitted to copy and distribute verbatim copies
+#  of this license document, but changing it is not allowed.
+# ==============================================================================
+
+import os
+from src import app
+
+
+if __name__ == "__main__":
+    HOST = os.environ.get("SERVER_HOST", "localhost")
+    try:
+        PORT = int(os.environ.get("SERVER_PORT", "5555"))
+    except ValueError:
+        PORT = 1234
+    app.secret_key = "1cd6f35db029d4b8fc98fc05c9efd06a2e2cd1ffc3774d3f035ebd8d"
+    app.run(HOST, PORT, debug=True)
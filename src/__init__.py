@@ -1,15 +1,34 @@
-# Copyright 2020 The `Kumar Nityan Suman` (https://github.com/nityansuman/).
-# All Rights Reserved.
-#
-#                     GNU GENERAL PUBLIC LICENSE
-#                        Version 3, 29 June 2007
-#  Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
-#  Everyone is permitted to copy and distribute verbatim copies
-#  of this license document, but changing it is not allowed.
-# ==============================================================================
-
-from flask import Flask
-
-app = Flask(__name__)
-
-import src.views
+# Copyright 2020 The `Kumar Nityan Suman` (https://github.com/nityansuman/).
+# All Rights Reserved.
+#
+#                     GNU GENERAL PUBLIC LICENSE
+#                        Version 3, 29 June 2007
+#  Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+#  Everyone is permitted to copy and distribute verbatim copies
+#  of this license document, but changing it is not allowed.
+# ==============================================================================
+
+import multiprocessing
+from flask import Flask
+
+app = Flask(__name__)
+
+# NLP pool workers are spawned and import this package to unpickle their
+# tasks, they need none of the routes, middleware or background threads
+if multiprocessing.parent_process() is None:
+    import src.views
+    import src.api
+    from src.profiler import request_profiler
+    from src.registry import registry
+    from src.traffic import traffic_recorder
+    from src.utils import prebuild_changed
+
+    request_profiler.install(app)
+    traffic_recorder.install(app)
+    # Workers load the corpus caches the watcher has them build off the request path
+    registry.add_listener(prebuild_changed)
+
+    @app.before_request
+    def start_registry():
+        ''' Watch the corpora from the process serving requests, not from CLI tools importing the package '''
+        registry.start()
@@ -0,0 +1,168 @@
+
+
+import functools
+import math
+import os
+import threading
+import time
+from typing import Callable
+
+from flask import make_response
+
+from src.executor import nlp_pool
+
+# Upper bounds in seconds of the queue-time histogram buckets
+QUEUE_TIME_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+
+class AdmissionController:
+	"""Admission control in front of the NLP-heavy routes.
+
+	At most `max_concurrent` requests run at once and at most `max_waiting`
+	more wait for a slot, each for up to `max_wait` seconds. Everything else
+	is refused at once with 503 and a Retry-After estimated from recent
+	service times, so the server stays at capacity instead of timing out
+	every request together.
+	"""
+
+	def __init__(self, max_concurrent: int, max_waiting: int, max_wait: float = 5.0):
+		"""Class constructor.
+
+		Args:
+			max_concurrent (int): Requests admitted at once.
+			max_waiting (int): Requests allowed to queue for a slot.
+			max_wait (float, optional): Seconds a request may queue.
+				Defaults to 5.0.
+		"""
+		self.max_concurrent = max_concurrent
+		self.max_waiting = max_waiting
+		self.max_wait = max_wait
+		self.active = 0
+		self.waiting = 0
+		# Guards the counters and `_stats`, waiters block on the condition
+		self.lock = threading.Lock()
+		self._condition = threading.Condition(self.lock)
+		self._stats = {
+			"admitted": 0,
+			"rejected": 0,
+			"timed_out": 0,
+			"total_queue_time": 0.0,
+			"max_queue_time": 0.0,
+			"total_service_time": 0.0,
+			"queue_time_buckets": [0] * len(QUEUE_TIME_BUCKETS)
+		}
+
+	def acquire(self) -> bool:
+		"""Method to wait for a free slot.
+
+		Returns:
+			bool: True if admitted.
+		"""
+		start = time.monotonic()
+		with self._condition:
+			if self.active >= self.max_concurrent:
+				if self.waiting >= self.max_waiting:
+					self._stats["rejected"] += 1
+					return False
+				self.waiting += 1
+				try:
+					admitted = self._condition.wait_for(
+						lambda: self.active < self.max_concurrent, timeout=self.max_wait
+					)
+				finally:
+					self.waiting -= 1
+				if not admitted:
+					self._stats["timed_out"] += 1
+					return False
+			self.active += 1
+
+			queue_time = time.monotonic() - start
+			self._stats["admitted"] += 1
+			self._stats["total_queue_time"] += queue_time
+			self._stats["max_queue_time"] = max(self._stats["max_queue_time"], queue_time)
+			for i, bound in enumerate(QUEUE_TIME_BUCKETS):
+				if queue_time <= bound:
+					self._stats["queue_time_buckets"][i] += 1
+					break
+		return True
+
+	def release(self, service_time: float = 0.0) -> None:
+		"""Method to free a slot.
+
+		Args:
+			service_time (float, optional): Seconds the request held the slot.
+				Defaults to 0.0.
+		"""
+		with self._condition:
+			self.active -= 1
+			self._stats["total_service_time"] += service_time
+			self._condition.notify()
+
+	def retry_after(self) -> int:
+		"""Method to estimate when a refused request should retry.
+
+		Returns:
+			int: Seconds until a slot is likely free, at least 1.
+		"""
+		with self.lock:
+			admitted = max(self._stats["admitted"], 1)
+			mean_service = self._stats["total_service_time"] / admitted
+			waiting = self.waiting
+		return max(1, math.ceil(mean_service * (waiting + 1) / max(self.max_concurrent, 1)))
+
+	def limit(self, view: Callable) -> Callable:
+		"""Decorator admitting a view through the controller.
+
+		Streamed responses hold their slot until they are closed, so they
+		count for as long as they run.
+
+		Args:
+			view (Callable): View function.
+
+		Returns:
+			Callable: Admission controlled view function.
+		"""
+		@functools.wraps(view)
+		def admitted_view(*args, **kwargs):
+			if not self.acquire():
+				response = make_response("Server is at capacity, please retry.", 503)
+				response.headers["Retry-After"] = str(self.retry_after())
+				return response
+
+			start = time.monotonic()
+			try:
+				response = make_response(view(*args, **kwargs))
+			except BaseException:
+				self.release(time.monotonic() - start)
+				raise
+			if response.is_streamed:
+				response.call_on_close(lambda: self.release(time.monotonic() - start))
+			else:
+				self.release(time.monotonic() - start)
+			return response
+		return admitted_view
+
+	def stats(self) -> dict:
+		"""Method to report occupancy and queue-time metrics.
+
+		Returns:
+			dict: Admission statistics, times in seconds.
+		"""
+		with self.lock:
+			stats = dict(self._stats)
+			stats["queue_time_buckets"] = dict(zip(
+				[str(bound) for bound in QUEUE_TIME_BUCKETS], self._stats["queue_time_buckets"]
+			))
+			stats["active"] = self.active
+			stats["waiting"] = self.waiting
+		admitted = max(stats["admitted"], 1)
+		stats["mean_queue_time"] = stats.pop("total_queue_time") / admitted
+		stats["mean_service_time"] = stats.pop("total_service_time") / admitted
+		return stats
+
+
+nlp_admission = AdmissionController(
+	max_concurrent=int(os.environ.get("ADMISSION_MAX_CONCURRENT", "0")) or max(nlp_pool.max_workers, 1),
+	max_waiting=int(os.environ.get("ADMISSION_MAX_WAITING", "0")) or 4 * max(nlp_pool.max_workers, 1),
+	max_wait=float(os.environ.get("ADMISSION_MAX_WAIT", "5"))
+)
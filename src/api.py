@@ -0,0 +1,287 @@
+# Import packages
+import hmac
+import json
+import math
+import os
+from datetime import datetime
+from flask import Response, jsonify, request, session, stream_with_context
+from src import app
+from src.admission import nlp_admission
+from src.executor import nlp_pool
+from src.export import export, iter_results
+from src.history import history_index
+from src.utils import (
+    backup, corpus_stat, database_path, generate, grade, relative_ranking, screen_answers, subject_details
+)
+from src.writer import results_writer
+
+API_PREFIX = "/api/v1"
+NDJSON = "application/x-ndjson"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Bounds of one generation item, larger requests are clamped
+MAX_QUESTIONS = 10
+MAX_TESTS_PER_ITEM = 20
+# Bearer token guarding answer keys and results, those routes are refused while unset
+API_TOKEN = os.environ.get("API_TOKEN")
+
+
+def read_items():
+    ''' Yield (item, error) pairs from an NDJSON stream or a JSON object/array body, error is None if valid '''
+    if request.mimetype == NDJSON:
+        # Consume the body line by line so large batches are never buffered whole
+        for number, line in enumerate(request.stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield None, f"Line {number} is not valid JSON."
+                continue
+            yield item, None if isinstance(item, dict) else "Each item must be a JSON object."
+    else:
+        payload = request.get_json(force=True, silent=True)
+        if payload is None:
+            yield None, "Body is not valid JSON."
+            return
+        for item in payload if isinstance(payload, list) else [payload]:
+            yield item, None if isinstance(item, dict) else "Each item must be a JSON object."
+
+
+def bounded_int(value, default, low, high):
+    ''' Parse an integer field clamped to [low, high], raise ValueError if it is not an integer '''
+    if value is None:
+        return default
+    if isinstance(value, (bool, float)):
+        raise ValueError(f"{value!r} is not an integer.")
+    return min(max(int(value), low), high)
+
+
+def authorize():
+    ''' Return an error response unless the request carries the API token, None if it does '''
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return jsonify({"error": "An API token is required."}), 401, {"WWW-Authenticate": "Bearer"}
+    if not API_TOKEN or not hmac.compare_digest(token.strip().encode(), API_TOKEN.encode()):
+        return jsonify({"error": "Invalid API token."}), 403
+    return None
+
+
+def ndjson_response(records):
+    ''' Stream an iterable of records back as NDJSON '''
+    def generate():
+        for record in records:
+            yield json.dumps(record) + "\n"
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+
+def session_for(item):
+    ''' Build the session-like container used by `utils` from an API item '''
+    subject_id = str(item.get("subject_id", ""))
+    subject_name, filepath = subject_details(subject_id)
+    return {
+        "username": str(item.get("username", "")),
+        "subject_id": subject_id,
+        "subject_name": subject_name or "",
+        "filepath": filepath,
+        "test_id": str(item.get("test_id", "")),
+        "database_path": database_path(),
+        # Corpus snapshot served here, pool workers catch up with it
+        "stat": corpus_stat(subject_id),
+    }
+
+
+def generate_tests(items):
+    ''' Generate `count` tests per item on the NLP process pool '''
+    for item, error in items:
+        if error is not None:
+            yield {"error": error, "request": item}
+            continue
+        meta = session_for(item)
+        if meta["filepath"] is None or meta["test_id"] not in ("0", "1"):
+            yield {"error": "Unknown subject_id or test_id.", "request": item}
+            continue
+
+        default_questions = 3 if meta["test_id"] == "0" else 5
+        try:
+            num_questions = bounded_int(item.get("num_questions"), default_questions, 1, MAX_QUESTIONS)
+            count = bounded_int(item.get("count"), 1, 1, MAX_TESTS_PER_ITEM)
+            difficulty = item.get("difficulty")
+            target_difficulty = None if difficulty is None else float(difficulty)
+            if target_difficulty is not None and not math.isfinite(target_difficulty):
+                raise ValueError("difficulty must be finite.")
+        except (TypeError, ValueError):
+            yield {"error": "num_questions and count must be integers, difficulty a number.", "request": item}
+            continue
+        if target_difficulty is not None:
+            target_difficulty = min(max(target_difficulty, 0.0), 1.0)
+
+        arguments = (
+            (meta["subject_id"], meta["test_id"], meta["filepath"], num_questions, target_difficulty, meta["stat"])
+            for _ in range(count)
+        )
+        for questions, answers in nlp_pool.imap(generate, arguments):
+            yield {
+                "subject_id": meta["subject_id"],
+                "subject_name": meta["subject_name"],
+                "test_id": meta["test_id"],
+                "questions": questions,
+                "answers": answers,
+            }
+
+
+def submission_for(item, error):
+    ''' Resolve a grading item into its session-like container, or an error container '''
+    if error is None and not all(isinstance(item.get(key, []), list) for key in ("expected", "answers")):
+        error = "expected and answers must be lists."
+    questions = None if error is not None else item.get("questions")
+    if questions is not None and (
+        not isinstance(questions, list) or len(questions) != len(item.get("expected", []))
+        or not all(isinstance(question, str) for question in questions)
+    ):
+        error = "questions must be a list of strings, one per expected answer."
+    date = datetime.now()
+    if error is None and item.get("date") is not None:
+        try:
+            date = datetime.strptime(str(item["date"]), DATE_FORMAT)
+        except ValueError:
+            error = "date must be formatted as YYYY-MM-DD HH:MM:SS."
+    if error is not None:
+        return {"error": error}
+    meta = session_for(item)
+    meta["date"] = date.strftime(DATE_FORMAT)
+    return meta
+
+
+def grade_item(item, meta):
+    ''' Grade one submission resolved by `submission_for`; runs on the NLP process pool '''
+    if "error" in meta:
+        return meta, None
+    if meta["filepath"] is None or meta["test_id"] not in ("0", "1"):
+        meta["error"] = "Unknown subject_id or test_id."
+        return meta, None
+    if meta["test_id"] == "1":
+        meta["flags"] = screen_answers(
+            meta["subject_id"], meta["username"], item.get("expected", []), item.get("answers", [])
+        )
+    return meta, grade(
+        meta["test_id"], item.get("expected", []), item.get("answers", []), meta["filepath"], meta["subject_id"],
+        item.get("questions"), meta["stat"]
+    )
+
+
+def grade_submissions(items):
+    ''' Grade submissions in parallel and record each one in order '''
+    # Subjects are resolved here, workers may not have seen the latest corpora
+    submissions = ((item, submission_for(item, error)) for item, error in items)
+    for meta, graded in nlp_pool.imap(grade_item, submissions):
+        if graded is None:
+            yield {"error": meta["error"], "subject_id": meta.get("subject_id"), "test_id": meta.get("test_id")}
+            continue
+
+        score, status, feedback = graded
+        meta["score"] = score
+        meta["result"] = status
+        yield {
+            "username": meta["username"],
+            "subject_id": meta["subject_id"],
+            "test_id": meta["test_id"],
+            "score": score,
+            "status": status,
+            "feedback": feedback,
+            "flags": meta.get("flags", ""),
+            "recorded": backup(meta),
+        }
+
+
+@app.route(API_PREFIX + "/tests", methods=["POST"])
+@nlp_admission.limit
+def api_generate_tests():
+    ''' Generate a batch of tests, one NDJSON line per test '''
+    denied = authorize()
+    if denied:
+        return denied
+    return ndjson_response(generate_tests(read_items()))
+
+
+@app.route(API_PREFIX + "/grade", methods=["POST"])
+@nlp_admission.limit
+def api_grade():
+    ''' Grade a batch of submissions, one NDJSON line per submission '''
+    denied = authorize()
+    if denied:
+        return denied
+    return ndjson_response(grade_submissions(read_items()))
+
+
+@app.route(API_PREFIX + "/ranking", methods=["GET"])
+def api_ranking():
+    ''' Return max, min and mean scores for a subject and test type '''
+    meta = session_for(request.args)
+    max_score, min_score, mean_score = relative_ranking(meta)
+    return jsonify({
+        "subject_id": meta["subject_id"],
+        "test_id": meta["test_id"],
+        "max_score": None if max_score is None else float(max_score),
+        "min_score": None if min_score is None else float(min_score),
+        "mean_score": None if mean_score is None else float(mean_score),
+    })
+
+
+@app.route(API_PREFIX + "/metrics", methods=["GET"])
+def api_metrics():
+    ''' Report queue and latency metrics of the background services '''
+    return jsonify({
+        "admission": nlp_admission.stats(),
+        "results_writer": results_writer.stats(),
+    })
+
+
+@app.route(API_PREFIX + "/results/export", methods=["GET"])
+def api_export_results():
+    ''' Stream filtered results as CSV or NDJSON, resumable from a cursor '''
+    denied = authorize()
+    if denied:
+        return denied
+    fmt = request.args.get("format", "ndjson")
+    try:
+        cursor = int(request.args.get("cursor", "0"))
+        limit = int(request.args["limit"]) if "limit" in request.args else None
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers."}), 400
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson."}), 400
+
+    records = iter_results(
+        database_path(),
+        subject_id=request.args.get("subject_id"),
+        test_id=request.args.get("test_id"),
+        username=request.args.get("username"),
+        date_from=request.args.get("date_from"),
+        date_to=request.args.get("date_to"),
+        cursor=cursor,
+    )
+    mimetype = "text/csv" if fmt == "csv" else NDJSON
+    return Response(stream_with_context(export(records, fmt, limit)), mimetype=mimetype)
+
+
+@app.route(API_PREFIX + "/history", methods=["GET"])
+def api_history():
+    ''' Return one page of the signed-in candidate's attempts, newest first '''
+    username = session.get("user", "")
+    if not username.strip():
+        return jsonify({"error": "Sign in to see your history."}), 401
+    try:
+        page = max(int(request.args.get("page", "1")), 1)
+        per_page = min(max(int(request.args.get("per_page", "20")), 1), 100)
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers."}), 400
+
+    attempts, total = history_index.history(database_path(), username, page, per_page)
+    return jsonify({
+        "username": username,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "attempts": attempts,
+    })
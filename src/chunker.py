@@ -0,0 +1,128 @@
+
+
+import bisect
+import re
+from typing import Iterable, List, Tuple
+
+# Noun-phrase grammar shared by the objective and subjective generators
+CHUNK_GRAMMAR = r"""
+	CHUNK: {<NN>+<IN|DT>*<NN>+}
+		{<NN>+<IN|DT>*<NNP>+}
+		{<NNP>+<NNS>*}
+	"""
+
+# Tag id of every tag the grammar does not mention, and of sentence breaks
+OTHER = "\0"
+# Tag ids of chunked tokens, hidden from the rules that follow
+CHUNKED = "\1"
+
+TAG_PATTERN = re.compile(r"<([^<>]*)>")
+RULE_PATTERN = re.compile(r"\{([^{}]*)\}")
+
+
+class NounPhraseChunker:
+	"""Finite-state equivalent of `nltk.RegexpParser` for chunk grammars.
+
+	Each tag the grammar names is given a one-character id and every rule
+	is compiled once into a regular expression over those ids. A batch of
+	tagged sentences is encoded into one id string, with sentence breaks
+	that no rule matches, and every rule runs over it in a single pass.
+	Rules apply in order and never touch tokens chunked by an earlier rule,
+	as with `RegexpParser`, and chunks come back as spans without building
+	trees.
+	"""
+
+	def __init__(self, grammar: str = CHUNK_GRAMMAR):
+		"""Class constructor.
+
+		Args:
+			grammar (str, optional): `RegexpParser` grammar made of `{...}`
+				chunk rules over exact tags. Defaults to `CHUNK_GRAMMAR`.
+
+		Raises:
+			ValueError: If the grammar uses other rule types or tag wildcards.
+		"""
+		self.tag_ids = dict()
+		self.rules = list()
+		for line in grammar.strip().splitlines():
+			line = line.split("#")[0].strip()
+			if ":" in line:
+				line = line.split(":", 1)[1].strip()
+			if not line:
+				continue
+			pattern = RULE_PATTERN.fullmatch("".join(line.split()))
+			if pattern is None:
+				raise ValueError(f"Only chunk rules are supported, got `{line}`.")
+			self.rules.append(re.compile(TAG_PATTERN.sub(self._tag_class, pattern.group(1))))
+
+	def _tag_class(self, match: re.Match) -> str:
+		"""Method to compile one `<TAG|TAG>` pattern into a character class."""
+		ids = list()
+		for tag in match.group(1).split("|"):
+			if not re.fullmatch(r"[A-Za-z0-9$]+", tag):
+				raise ValueError(f"Unsupported tag pattern `<{match.group(1)}>`.")
+			ids.append(self.tag_ids.setdefault(tag, chr(0x100 + len(self.tag_ids))))
+		return "[" + "".join(ids) + "]"
+
+	def encode(self, tags: Iterable) -> str:
+		"""Method to map POS tags to their ids.
+
+		Args:
+			tags (Iterable): POS tags.
+
+		Returns:
+			str: One id character per tag.
+		"""
+		return "".join([self.tag_ids.get(tag, OTHER) for tag in tags])
+
+	def spans(self, tagged_sentences: Iterable) -> List[List[Tuple[int, int]]]:
+		"""Method to chunk a batch of tagged sentences in one pass.
+
+		Args:
+			tagged_sentences (Iterable): Sentences as lists of (word, tag).
+
+		Returns:
+			List[List[Tuple[int, int]]]: Start and end token index of every
+				chunk, per sentence and in sentence order.
+		"""
+		starts, encoded = list(), list()
+		position = 0
+		lookup = self.tag_ids.get
+		for tagged in tagged_sentences:
+			starts.append(position)
+			encoded.append("".join([lookup(tag, OTHER) for _, tag in tagged]))
+			position += len(encoded[-1]) + 1
+		ids = OTHER.join(encoded)
+
+		found = list()
+
+		def chunk(match: re.Match) -> str:
+			# Record the chunk and hide its tokens from the remaining rules
+			start, end = match.span()
+			if end > start:
+				found.append((start, end))
+			return CHUNKED * (end - start)
+
+		for rule in self.rules:
+			ids = rule.sub(chunk, ids)
+		found.sort()
+
+		spans = [list() for _ in starts]
+		for start, end in found:
+			sentence = bisect.bisect_right(starts, start) - 1
+			spans[sentence].append((start - starts[sentence], end - starts[sentence]))
+		return spans
+
+	def phrases(self, tagged: list) -> List[list]:
+		"""Method to extract the chunked words of one tagged sentence.
+
+		Args:
+			tagged (list): Sentence as a list of (word, tag).
+
+		Returns:
+			List[list]: Words of every chunk in sentence order.
+		"""
+		return [[word for word, _ in tagged[start:end]] for start, end in self.spans([tagged])[0]]
+
+
+noun_phrase_chunker = NounPhraseChunker()
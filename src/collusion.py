@@ -0,0 +1,202 @@
+
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+# Mersenne prime of the universal hash family
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class CollusionIndex:
+	"""Persistent MinHash/LSH index of subjective answers.
+
+	Every answer is reduced to a MinHash signature of its word shingles and
+	filed under one bucket per LSH band, scoped by subject and question. A
+	new answer is compared only against the answers sharing one of its
+	buckets, so lookups stay sub-linear however many answers are indexed.
+	Answers close to the expected answer are neither flagged nor indexed:
+	candidates who learnt the reference sentence have not colluded, and
+	their copies would crowd one bucket.
+	Buckets live in SQLite, which serialises writers across worker
+	processes and keeps the index on disk between runs.
+	"""
+
+	def __init__(
+		self,
+		filepath: str,
+		num_perm: int = 64,
+		bands: int = 16,
+		threshold: float = 0.8,
+		shingle_size: int = 3,
+		min_tokens: int = 8,
+		max_matches: int = 5,
+		max_candidates: int = 1000
+	):
+		"""Class constructor.
+
+		Args:
+			filepath (str): SQLite database of the index.
+			num_perm (int, optional): MinHash signature length. Defaults to 64.
+			bands (int, optional): LSH bands, must divide `num_perm`.
+				Defaults to 16.
+			threshold (float, optional): Estimated Jaccard similarity from
+				which a pair is flagged. Defaults to 0.8.
+			shingle_size (int, optional): Words per shingle. Defaults to 3.
+			min_tokens (int, optional): Shorter answers are neither checked
+				nor indexed. Defaults to 8.
+			max_matches (int, optional): Most similar candidates reported per
+				answer. Defaults to 5.
+			max_candidates (int, optional): Newest indexed answers compared
+				per check. Defaults to 1000.
+		"""
+		if num_perm % bands:
+			raise ValueError("`bands` must divide `num_perm`.")
+		self.filepath = filepath
+		self.num_perm = num_perm
+		self.bands = bands
+		self.rows = num_perm // bands
+		self.threshold = threshold
+		self.shingle_size = shingle_size
+		self.min_tokens = min_tokens
+		self.max_matches = max_matches
+		self.max_candidates = max_candidates
+
+		# Fixed seed, signatures must stay comparable across processes and runs
+		rng = np.random.default_rng(2024)
+		self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+		self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+		self._local = threading.local()
+
+	def connection(self) -> sqlite3.Connection:
+		"""Method to open the index database once per thread and process.
+
+		Returns:
+			sqlite3.Connection: Connection in autocommit mode.
+		"""
+		if getattr(self._local, "pid", None) != os.getpid():
+			connection = sqlite3.connect(self.filepath, timeout=30, isolation_level=None)
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute(
+				"CREATE TABLE IF NOT EXISTS answers ("
+				"id INTEGER PRIMARY KEY, username TEXT NOT NULL, signature BLOB NOT NULL)"
+			)
+			connection.execute(
+				"CREATE TABLE IF NOT EXISTS buckets ("
+				"key INTEGER NOT NULL, answer INTEGER NOT NULL, PRIMARY KEY (key, answer)) WITHOUT ROWID"
+			)
+			self._local.connection = connection
+			self._local.pid = os.getpid()
+		return self._local.connection
+
+	def signature(self, tokens: list) -> np.ndarray:
+		"""Method to compute the MinHash signature of a tokenized answer.
+
+		Args:
+			tokens (list): Answer tokens.
+
+		Returns:
+			np.ndarray: Signature, None if the answer is too short.
+		"""
+		tokens = [token.lower() for token in tokens if token.isalnum()]
+		if len(tokens) < self.min_tokens:
+			return None
+		shingles = {
+			zlib.crc32("\x1f".join(tokens[i:i + self.shingle_size]).encode("utf-8"))
+			for i in range(len(tokens) - self.shingle_size + 1)
+		}
+		hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+		permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+		return permuted.min(axis=0).astype(np.uint32)
+
+	def band_keys(self, scope: str, signature: np.ndarray) -> List[int]:
+		"""Method to map a signature to its LSH bucket in every band.
+
+		Args:
+			scope (str): Subject and question the answer belongs to.
+			signature (np.ndarray): MinHash signature.
+
+		Returns:
+			List[int]: Signed 64-bit bucket keys, one per band.
+		"""
+		keys = list()
+		for band in range(self.bands):
+			digest = hashlib.blake2b(digest_size=8)
+			digest.update(f"{scope}\0{band}\0".encode("utf-8"))
+			digest.update(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+			keys.append(int.from_bytes(digest.digest(), "little", signed=True))
+		return keys
+
+	def check(
+		self,
+		subject_id: str,
+		question: str,
+		username: str,
+		tokens: list,
+		reference: list = None
+	) -> List[Tuple[str, float]]:
+		"""Method to match an answer against earlier ones and index it.
+
+		Args:
+			subject_id (str): Subject identifier.
+			question (str): Identifies the question the answer responds to,
+				e.g. its suggested answer. Question wordings are drawn at
+				random and do not identify it.
+			username (str): Candidate who submitted the answer.
+			tokens (list): Answer tokens.
+			reference (list, optional): Expected answer tokens, answers this
+				close to them are skipped. Defaults to None.
+
+		Returns:
+			List[Tuple[str, float]]: Up to `max_matches` other candidates
+				with a near-identical answer and the estimated similarity,
+				most similar first.
+		"""
+		signature = self.signature(tokens)
+		if signature is None:
+			return []
+		expected = self.signature(reference) if reference else None
+		if expected is not None and float(np.mean(expected == signature)) >= self.threshold:
+			return []
+		keys = self.band_keys(f"{subject_id}\0{question}", signature)
+
+		connection = self.connection()
+		connection.execute("BEGIN IMMEDIATE")
+		try:
+			placeholders = ",".join("?" * len(keys))
+			rows = connection.execute(
+				f"SELECT id, username, signature FROM answers WHERE id IN "
+				f"(SELECT answer FROM buckets WHERE key IN ({placeholders})) ORDER BY id DESC LIMIT ?",
+				keys + [self.max_candidates]
+			).fetchall()
+			matches = dict()
+			for _, other, blob in rows:
+				if other == username:
+					continue
+				similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+				if similarity >= self.threshold:
+					matches[other] = max(similarity, matches.get(other, 0.0))
+
+			answer = connection.execute(
+				"INSERT INTO answers (username, signature) VALUES (?, ?)", (username, signature.tobytes())
+			).lastrowid
+			connection.executemany(
+				"INSERT OR IGNORE INTO buckets (key, answer) VALUES (?, ?)", [(key, answer) for key in keys]
+			)
+			connection.execute("COMMIT")
+		except BaseException:
+			connection.execute("ROLLBACK")
+			raise
+		return sorted(matches.items(), key=lambda match: -match[1])[:self.max_matches]
+
+
+collusion_index = CollusionIndex(
+	os.environ.get("COLLUSION_INDEX", os.path.join(str(os.getcwd()), "database", "collusion.sqlite3")),
+	threshold=float(os.environ.get("COLLUSION_THRESHOLD", "0.8"))
+)
@@ -0,0 +1,372 @@
+
+
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import lzma
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Iterator, List
+
+import numpy as np
+
+# Leading bytes of every corpus store file
+MAGIC = b"EVCORPS1"
+# Extension of corpus store files, scanned by the registry next to `.txt`
+CORPUS_EXTENSION = ".evc"
+# Uncompressed bytes gathered into one block before it is compressed
+BLOCK_SIZE = 1 << 16
+
+CODECS = {
+	"zlib": (functools.partial(zlib.compress, level=9), zlib.decompress),
+	"lzma": (functools.partial(lzma.compress, preset=9), lzma.decompress),
+}
+
+# Sentence breaks used when the sentence tokenizer data is not installed
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+def sentence_starts(text: str) -> List[int]:
+	"""Method to find where every sentence of a text starts.
+
+	Sentences are those of `nltk.sent_tokenize`, located back in the text
+	so the whitespace between them is kept and the text round-trips.
+
+	Args:
+		text (str): Corpus text.
+
+	Returns:
+		List[int]: Character offset of every sentence, the first one is 0.
+	"""
+	import nltk
+
+	if not text:
+		return []
+	try:
+		sentences = nltk.sent_tokenize(text)
+	except LookupError:
+		logging.warning("Sentence tokenizer unavailable, splitting on punctuation.")
+		sentences = None
+
+	starts, position = [0], 0
+	for sentence in sentences or []:
+		position = text.find(sentence, position)
+		if position < 0:
+			sentences = None
+			break
+		if position > 0:
+			starts.append(position)
+		position += len(sentence)
+	if sentences is None:
+		starts = [0] + [match.end() for match in SENTENCE_BREAK.finditer(text) if match.end() < len(text)]
+	return starts
+
+
+def is_corpus_store(filepath: str) -> bool:
+	"""Method to tell a corpus store from a plain text corpus.
+
+	Args:
+		filepath (str): Absolute filepath to the corpus.
+
+	Returns:
+		bool: True if the file starts with the corpus store magic.
+	"""
+	try:
+		with open(filepath, mode="rb") as fp:
+			return fp.read(len(MAGIC)) == MAGIC
+	except OSError:
+		return False
+
+
+def stored_digest(filepath: str) -> str:
+	"""Method to read the digest of the text held by a corpus store.
+
+	Args:
+		filepath (str): Absolute filepath to the corpus.
+
+	Returns:
+		str: Hex SHA-1 of the original text, None if the file is not a
+			corpus store.
+	"""
+	with open(filepath, mode="rb") as fp:
+		if fp.read(len(MAGIC)) != MAGIC:
+			return None
+		(header_size,) = struct.unpack("<I", fp.read(4))
+		return json.loads(fp.read(header_size).decode("utf-8"))["sha1"]
+
+
+class CorpusStore:
+	"""Read-only corpus split into sentences and compressed in blocks.
+
+	Sentences are grouped into blocks of about `BLOCK_SIZE` bytes and every
+	block is compressed on its own. The header holds the byte offset of
+	every sentence and the file position of every block, so reading one
+	sentence or a range of sentences decompresses only the blocks holding
+	them. The file is memory-mapped and recently used blocks are cached.
+
+	Layout: magic, header length, JSON header, sentence offsets
+	(sentences + 1), first sentence of every block (blocks + 1), block
+	positions (blocks + 1), then the compressed blocks.
+	"""
+
+	def __init__(self, filepath: str, cache_blocks: int = 8):
+		"""Class constructor.
+
+		Args:
+			filepath (str): Absolute filepath to the corpus store.
+			cache_blocks (int, optional): Decompressed blocks kept in memory.
+				Defaults to 8.
+
+		Raises:
+			ValueError: If the file is not a corpus store.
+		"""
+		self.filepath = filepath
+		with open(filepath, mode="rb") as fp:
+			self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+		if self._mmap[:len(MAGIC)] != MAGIC:
+			self._mmap.close()
+			raise ValueError(f"{filepath} is not a corpus store.")
+
+		position = len(MAGIC) + 4
+		(header_size,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+		self.header = json.loads(self._mmap[position:position + header_size].decode("utf-8"))
+		position += header_size
+		self._decompress = CODECS[self.header["codec"]][1]
+
+		def array(count: int) -> np.ndarray:
+			nonlocal position
+			values = np.frombuffer(self._mmap, dtype="<u8", count=count, offset=position)
+			position += values.nbytes
+			return values
+
+		self.offsets = array(self.header["sentences"] + 1)
+		self.block_sentences = array(self.header["blocks"] + 1)
+		self.block_positions = array(self.header["blocks"] + 1) + position
+		self.block = functools.lru_cache(maxsize=cache_blocks)(self.read_block)
+
+	def __len__(self) -> int:
+		return self.header["sentences"]
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			start, stop, step = index.indices(len(self))
+			if step == 1:
+				return self.sentences(start, stop)
+			return [self.sentence(i) for i in range(start, stop, step)]
+		return self.sentence(index)
+
+	def __iter__(self) -> Iterator[str]:
+		for block in range(self.header["blocks"]):
+			yield from self.sentences(int(self.block_sentences[block]), int(self.block_sentences[block + 1]))
+
+	@property
+	def digest(self) -> str:
+		"""Hex SHA-1 digest of the original text."""
+		return self.header["sha1"]
+
+	@classmethod
+	def write(cls, filepath: str, data: bytes, codec: str = "zlib", block_size: int = BLOCK_SIZE) -> "CorpusStore":
+		"""Method to store a corpus text.
+
+		Args:
+			filepath (str): Absolute filepath to the corpus store.
+			data (bytes): UTF-8 corpus text, kept byte for byte.
+			codec (str, optional): `zlib` or `lzma`. Defaults to "zlib".
+			block_size (int, optional): Uncompressed bytes per block.
+				Defaults to `BLOCK_SIZE`.
+
+		Returns:
+			CorpusStore: The written corpus store.
+		"""
+		text = data.decode("utf-8")
+		starts = sentence_starts(text)
+		segments = [
+			text[start:end].encode("utf-8") for start, end in zip(starts, starts[1:] + [len(text)])
+		]
+		offsets = np.zeros(len(segments) + 1, dtype="<u8")
+		np.cumsum([len(segment) for segment in segments], out=offsets[1:])
+
+		# Close a block at the first sentence boundary past the block size
+		compress = CODECS[codec][0]
+		block_sentences, blocks = [0], list()
+		for sentence in range(1, len(segments) + 1):
+			size = offsets[sentence] - offsets[block_sentences[-1]]
+			if size >= block_size or (sentence == len(segments) and size):
+				blocks.append(compress(b"".join(segments[block_sentences[-1]:sentence])))
+				block_sentences.append(sentence)
+		block_positions = np.zeros(len(blocks) + 1, dtype="<u8")
+		np.cumsum([len(block) for block in blocks], out=block_positions[1:])
+
+		header = json.dumps({
+			"codec": codec,
+			"sentences": len(segments),
+			"blocks": len(blocks),
+			"size": len(data),
+			"sha1": hashlib.sha1(data).hexdigest(),
+		}).encode("utf-8")
+		# Replace the file whole, readers may still have the previous one mapped
+		partial = f"{filepath}.{os.getpid()}.tmp"
+		with open(partial, mode="wb") as fp:
+			fp.write(MAGIC + struct.pack("<I", len(header)) + header)
+			fp.write(offsets.tobytes())
+			fp.write(np.array(block_sentences, dtype="<u8").tobytes())
+			fp.write(block_positions.tobytes())
+			for block in blocks:
+				fp.write(block)
+		os.replace(partial, filepath)
+		return cls(filepath)
+
+	def read_block(self, block: int) -> bytes:
+		"""Method to decompress one block, use the cached `block` instead.
+
+		Args:
+			block (int): Block number.
+
+		Returns:
+			bytes: Uncompressed block.
+		"""
+		return self._decompress(self._mmap[self.block_positions[block]:self.block_positions[block + 1]])
+
+	def segment(self, index: int) -> str:
+		"""Method to read one sentence with the whitespace that follows it.
+
+		Args:
+			index (int): Sentence id, negative ids count from the end.
+
+		Returns:
+			str: Sentence exactly as in the original text.
+
+		Raises:
+			IndexError: If there is no such sentence.
+		"""
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("Sentence id out of range.")
+		block = int(np.searchsorted(self.block_sentences, index, side="right")) - 1
+		base = self.offsets[self.block_sentences[block]]
+		start, end = self.offsets[index] - base, self.offsets[index + 1] - base
+		return self.block(block)[start:end].decode("utf-8")
+
+	def sentence(self, index: int) -> str:
+		"""Method to read one sentence.
+
+		Args:
+			index (int): Sentence id, negative ids count from the end.
+
+		Returns:
+			str: Sentence without surrounding whitespace.
+		"""
+		return self.segment(index).strip()
+
+	def sentences(self, start: int, stop: int) -> List[str]:
+		"""Method to read a range of sentences, one decompression per block.
+
+		Args:
+			start (int): First sentence id.
+			stop (int): Sentence id past the last one.
+
+		Returns:
+			List[str]: Sentences without surrounding whitespace.
+		"""
+		start, stop = max(start, 0), min(stop, len(self))
+		sentences = list()
+		while start < stop:
+			block = int(np.searchsorted(self.block_sentences, start, side="right")) - 1
+			end = min(stop, int(self.block_sentences[block + 1]))
+			base = self.offsets[self.block_sentences[block]]
+			data = self.block(block)
+			cuts = (self.offsets[start:end + 1] - base).tolist()
+			sentences.extend(data[i:j].decode("utf-8").strip() for i, j in zip(cuts, cuts[1:]))
+			start = end
+		return sentences
+
+	def data(self) -> bytes:
+		"""Method to restore the original corpus bytes.
+
+		Returns:
+			bytes: Corpus text exactly as stored.
+
+		Raises:
+			ValueError: If the restored text does not match its digest.
+		"""
+		data = b"".join(self.read_block(block) for block in range(self.header["blocks"]))
+		if hashlib.sha1(data).hexdigest() != self.digest:
+			raise ValueError(f"{self.filepath} is corrupted.")
+		return data
+
+	def text(self) -> str:
+		"""Method to restore the original corpus text.
+
+		Returns:
+			str: Corpus text.
+		"""
+		return self.data().decode("utf-8")
+
+	def close(self) -> None:
+		"""Method to unmap the corpus store."""
+		self.block.cache_clear()
+		# Index arrays are views of the mapping and must go first
+		self.offsets = self.block_sentences = self.block_positions = None
+		self._mmap.close()
+
+
+def read_corpus(filepath: str) -> str:
+	"""Method to read the whole text of a plain or stored corpus.
+
+	Args:
+		filepath (str): Absolute filepath to the corpus.
+
+	Returns:
+		str: Corpus text.
+	"""
+	if is_corpus_store(filepath):
+		return CorpusStore(filepath).text()
+	with open(filepath, mode="r") as fp:
+		return fp.read()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Convert corpora to and from block-compressed corpus stores.")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+	pack = subparsers.add_parser("pack", help="Store text corpora next to the originals.")
+	pack.add_argument("corpora", nargs="+", help="Text corpus files.")
+	pack.add_argument("--codec", choices=sorted(CODECS), default="zlib")
+	pack.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+	pack.add_argument("--remove", action="store_true", help="Remove each text corpus once stored.")
+	unpack = subparsers.add_parser("unpack", help="Restore text corpora next to the stores.")
+	unpack.add_argument("stores", nargs="+", help="Corpus store files.")
+	args = parser.parse_args()
+
+	if args.command == "pack":
+		for filepath in args.corpora:
+			target = os.path.splitext(filepath)[0] + CORPUS_EXTENSION
+			with open(filepath, mode="rb") as fp:
+				data = fp.read()
+			store = CorpusStore.write(target, data, codec=args.codec, block_size=args.block_size)
+			if store.data() != data:
+				raise ValueError(f"{target} does not round-trip.")
+			print(
+				f"{filepath}: {len(store)} sentences in {store.header['blocks']} blocks, "
+				f"{len(data)} -> {os.path.getsize(target)} bytes"
+			)
+			store.close()
+			if args.remove:
+				os.remove(filepath)
+	else:
+		for filepath in args.stores:
+			target = os.path.splitext(filepath)[0] + ".txt"
+			store = CorpusStore(filepath)
+			with open(target, mode="wb") as fp:
+				fp.write(store.data())
+			store.close()
+			print(f"{filepath} -> {target}")
+
+
+if __name__ == "__main__":
+	main()
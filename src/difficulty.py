@@ -0,0 +1,214 @@
+
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable
+
+import numpy as np
+
+# Largest number of bound parameters per SQLite statement
+QUERY_CHUNK = 500
+
+
+def question_key(digest: str, sentence: str) -> str:
+	"""Method to identify a question by its corpus and source sentence.
+
+	Args:
+		digest (str): Digest of the subject corpus.
+		sentence (str): Objective question, or subjective answer sentence.
+
+	Returns:
+		str: Stable hex key.
+	"""
+	return hashlib.sha1(f"{digest}\0{sentence.strip()}".encode("utf-8")).hexdigest()[:20]
+
+
+class QuestionStats:
+	"""Per-question attempt and score counters shared by every worker.
+
+	Each graded answer is one upsert, so updates are O(1) and SQLite
+	serialises concurrent writers across processes.
+	"""
+
+	def __init__(self, filepath: str, prior: float = 2.0):
+		"""Class constructor.
+
+		Args:
+			filepath (str): SQLite database of the statistics.
+			prior (float, optional): Weight of the neutral 0.5 difficulty
+				given to rarely answered questions. Defaults to 2.0.
+		"""
+		self.filepath = filepath
+		self.prior = prior
+		self._local = threading.local()
+
+	def connection(self) -> sqlite3.Connection:
+		"""Method to open the statistics database once per thread and process.
+
+		Returns:
+			sqlite3.Connection: Connection in autocommit mode.
+		"""
+		if getattr(self._local, "pid", None) != os.getpid():
+			connection = sqlite3.connect(self.filepath, timeout=30, isolation_level=None)
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute(
+				"CREATE TABLE IF NOT EXISTS stats ("
+				"key TEXT PRIMARY KEY, attempts INTEGER NOT NULL, correct INTEGER NOT NULL, "
+				"total_score REAL NOT NULL) WITHOUT ROWID"
+			)
+			self._local.connection = connection
+			self._local.pid = os.getpid()
+		return self._local.connection
+
+	def record(self, keys: list, scores: list) -> None:
+		"""Method to add graded answers to the statistics.
+
+		Args:
+			keys (list): Question keys.
+			scores (list): Score out of 100 of each answer.
+		"""
+		rows = [(key, int(score > 0), float(score)) for key, score in zip(keys, scores)]
+		connection = self.connection()
+		connection.execute("BEGIN IMMEDIATE")
+		try:
+			connection.executemany(
+				"INSERT INTO stats (key, attempts, correct, total_score) VALUES (?, 1, ?, ?) "
+				"ON CONFLICT (key) DO UPDATE SET attempts = attempts + 1, "
+				"correct = correct + excluded.correct, total_score = total_score + excluded.total_score",
+				rows
+			)
+			connection.execute("COMMIT")
+		except BaseException:
+			connection.execute("ROLLBACK")
+			raise
+
+	def counters(self, key: str) -> tuple:
+		"""Method to read the raw counters of a question.
+
+		Args:
+			key (str): Question key.
+
+		Returns:
+			tuple: Attempts, correct answers and total score.
+		"""
+		row = self.connection().execute(
+			"SELECT attempts, correct, total_score FROM stats WHERE key = ?", (key,)
+		).fetchone()
+		return row or (0, 0, 0.0)
+
+	def difficulties(self, keys: list) -> np.ndarray:
+		"""Method to estimate the difficulty of questions from their scores.
+
+		Difficulty is one minus the mean score as a fraction, shrunk towards
+		0.5 for questions with few attempts.
+
+		Args:
+			keys (list): Question keys.
+
+		Returns:
+			np.ndarray: Difficulty in [0, 1] per key.
+		"""
+		counters = dict()
+		connection = self.connection()
+		for start in range(0, len(keys), QUERY_CHUNK):
+			chunk = keys[start:start + QUERY_CHUNK]
+			rows = connection.execute(
+				f"SELECT key, attempts, total_score FROM stats WHERE key IN ({','.join('?' * len(chunk))})", chunk
+			)
+			counters.update((key, (attempts, total)) for key, attempts, total in rows)
+
+		difficulties = np.empty(len(keys), dtype=np.float64)
+		for i, key in enumerate(keys):
+			attempts, total = counters.get(key, (0, 0.0))
+			difficulties[i] = 1.0 - (total / 100.0 + self.prior / 2.0) / (attempts + self.prior)
+		return difficulties
+
+
+class DifficultyIndex:
+	"""Questions of one generator sorted by observed difficulty.
+
+	The order is refreshed from the statistics at most every `max_age`
+	seconds; in between, selecting by target difficulty is a binary search.
+	"""
+
+	def __init__(self, keys: list, stats: QuestionStats, max_age: float = 60.0):
+		"""Class constructor.
+
+		Args:
+			keys (list): Question key of every selectable question.
+			stats (QuestionStats): Statistics the order is read from.
+			max_age (float, optional): Seconds before the order is refreshed.
+				Defaults to 60.0.
+		"""
+		self.keys = keys
+		self.stats = stats
+		self.max_age = max_age
+		self.order = np.arange(len(keys))
+		self.sorted = np.full(len(keys), 0.5)
+		self.refreshed = None
+
+	@classmethod
+	def build(cls, digest: str, sentences: Iterable, stats: QuestionStats = None, max_age: float = 60.0) -> "DifficultyIndex":
+		"""Method to index the questions of a corpus.
+
+		Args:
+			digest (str): Digest of the subject corpus.
+			sentences (Iterable): Source sentence of every selectable question.
+			stats (QuestionStats, optional): Statistics the order is read
+				from. Defaults to `question_stats`.
+			max_age (float, optional): Seconds before the order is refreshed.
+				Defaults to 60.0.
+
+		Returns:
+			DifficultyIndex: Index, positions follow `sentences`.
+		"""
+		keys = [question_key(digest, sentence) for sentence in sentences]
+		return cls(keys, stats or question_stats, max_age)
+
+	def refresh(self, force: bool = False) -> None:
+		"""Method to re-sort the questions from the latest statistics.
+
+		Args:
+			force (bool, optional): Refresh even if the order is recent.
+				Defaults to False.
+		"""
+		if not force and self.refreshed is not None and time.monotonic() - self.refreshed < self.max_age:
+			return
+		difficulties = self.stats.difficulties(self.keys)
+		# Shuffle first so equally difficult questions take turns
+		shuffled = np.random.permutation(len(self.keys))
+		order = shuffled[np.argsort(difficulties[shuffled], kind="stable")]
+		self.order, self.sorted = order, difficulties[order]
+		self.refreshed = time.monotonic()
+
+	def select(self, target: float, num_questions: int, rng: np.random.Generator = None) -> np.ndarray:
+		"""Method to draw questions close to a target difficulty.
+
+		The target is located by binary search and the questions are drawn
+		from the `2 * num_questions` closest to it.
+
+		Args:
+			target (float): Difficulty in [0, 1].
+			num_questions (int): Number of questions.
+			rng (np.random.Generator, optional): Random generator.
+				Defaults to a fresh one.
+
+		Returns:
+			np.ndarray: Positions of the selected questions.
+		"""
+		self.refresh()
+		rng = rng or np.random.default_rng()
+		num_questions = min(num_questions, len(self.keys))
+		window = min(2 * num_questions, len(self.keys))
+		position = int(np.searchsorted(self.sorted, target))
+		start = min(max(position - window // 2, 0), len(self.keys) - window)
+		picked = rng.choice(window, size=num_questions, replace=False)
+		return self.order[start + picked]
+
+
+question_stats = QuestionStats(
+	os.environ.get("QUESTION_STATS", os.path.join(str(os.getcwd()), "database", "question_stats.sqlite3"))
+)
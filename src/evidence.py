@@ -0,0 +1,127 @@
+
+
+import logging
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from src.corpusstore import CorpusStore, is_corpus_store
+# Same terms as the semantic space rather than `SubjectiveTest.word_tokenizer`,
+# which needs the punkt data and keeps stop words and punctuation as terms
+from src.semantic import tokenize
+
+
+class SentenceIndex:
+	"""Inverted index from normalised corpus terms to sentence ids.
+
+	Posting lists are sorted id arrays, so finding the sentences that share
+	a set of terms is a chain of merges over the rarest terms and never
+	rescans the corpus.
+	"""
+
+	def __init__(self, sentences: list, postings: dict):
+		"""Class constructor.
+
+		Args:
+			sentences (list): Corpus sentences or corpus store, the position
+				is the sentence id.
+			postings (dict): Sorted sentence ids of every term.
+		"""
+		self.sentences = sentences
+		self.postings = postings
+
+	def __len__(self) -> int:
+		return len(self.sentences)
+
+	@classmethod
+	def build(cls, sentences: Iterable) -> "SentenceIndex":
+		"""Method to index sentences in one pass.
+
+		Args:
+			sentences (Iterable): Corpus sentences.
+
+		Returns:
+			SentenceIndex: Inverted index of the sentences.
+		"""
+		sentences = list(sentences)
+		postings = dict()
+		for sentence_id, sentence in enumerate(sentences):
+			for term in set(tokenize(sentence)):
+				postings.setdefault(term, []).append(sentence_id)
+		postings = {term: np.array(ids, dtype=np.uint32) for term, ids in postings.items()}
+		return cls(sentences, postings)
+
+	@classmethod
+	def from_corpus(cls, filepath: str) -> "SentenceIndex":
+		"""Method to index the sentences of a corpus file.
+
+		Args:
+			filepath (str): Absolute filepath to the subject corpus.
+
+		Returns:
+			SentenceIndex: Inverted index of the corpus.
+		"""
+		if is_corpus_store(filepath):
+			# Keep the store as the sentences, evidence decompresses one block
+			store = CorpusStore(filepath)
+			index = cls.build(store)
+			index.sentences = store
+			return index
+
+		import nltk
+
+		with open(filepath, mode="r") as fp:
+			summary = fp.read()
+		try:
+			sentences = nltk.sent_tokenize(summary)
+		except LookupError:
+			logging.exception("Sentence tokenizer unavailable, indexing lines.", exc_info=True)
+			sentences = [line for line in summary.splitlines() if line.strip()]
+		return cls.build(sentences)
+
+	def match(self, terms: Iterable) -> np.ndarray:
+		"""Method to find the sentences sharing the most specific terms.
+
+		Terms are intersected rarest first and a term that would empty the
+		result is skipped, so the answer is the sentences matching the
+		largest greedy conjunction of the terms.
+
+		Args:
+			terms (Iterable): Normalised terms.
+
+		Returns:
+			np.ndarray: Matching sentence ids, empty if no term is indexed.
+		"""
+		terms = sorted(set(terms) & self.postings.keys(), key=lambda term: (len(self.postings[term]), term))
+		postings = [self.postings[term] for term in terms]
+		if not postings:
+			return np.zeros(0, dtype=np.uint32)
+		matched = postings[0]
+		for posting in postings[1:]:
+			narrowed = np.intersect1d(matched, posting, assume_unique=True)
+			if len(narrowed):
+				matched = narrowed
+		return matched
+
+	def evidence(self, expected: str, answer: str, limit: int = 1) -> Tuple[List[str], List[str]]:
+		"""Method to find corpus sentences behind a subjective answer.
+
+		Args:
+			expected (str): Suggested answer.
+			answer (str): Candidate answer.
+			limit (int, optional): Sentences returned per list. Defaults to 1.
+
+		Returns:
+			Tuple[List[str], List[str]]: Sentences supporting the terms the
+				answer shares with the suggested answer, and sentences with
+				the terms it leaves out.
+		"""
+		expected_terms, answer_terms = set(tokenize(expected)), set(tokenize(answer))
+		covered = expected_terms & answer_terms
+		missed = expected_terms - answer_terms
+		supporting = self.match(covered)[:limit] if covered else []
+		missing = self.match(missed)[:limit] if missed else []
+		return (
+			[self.sentences[i] for i in supporting],
+			[self.sentences[i] for i in missing]
+		)
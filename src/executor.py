@@ -0,0 +1,172 @@
+
+
+import concurrent.futures
+import contextlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from typing import Callable, Iterable
+
+
+class PoolSaturated(Exception):
+	"""Raised when the pool already holds its maximum number of tasks.
+	"""
+
+
+class TaskPool:
+	"""Shared process pool for CPU-bound NLP work.
+
+	Request threads hand tokenization, tagging, chunking and scoring to
+	worker processes and wait on the result, so the GIL stays free for
+	cheap routes. The number of queued and running tasks is bounded and
+	every task has a timeout.
+
+	Workers are spawned rather than forked: the pool starts from a request
+	thread while the registry watcher and results writer threads run, and
+	a forked child would inherit their locks in whatever state they were.
+	"""
+
+	def __init__(self, max_workers: int = None, max_pending: int = None, timeout: float = 60.0):
+		"""Class constructor.
+
+		Args:
+			max_workers (int, optional): Worker processes, 0 to run tasks inline
+				in the calling thread. Defaults to the number of cores.
+			max_pending (int, optional): Maximum queued plus running tasks.
+				Defaults to four per worker.
+			timeout (float, optional): Seconds to wait for a task result.
+				Defaults to 60.0.
+		"""
+		self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+		self.max_pending = max_pending or 4 * max(self.max_workers, 1)
+		self.timeout = timeout
+		self._slots = threading.BoundedSemaphore(self.max_pending)
+		self._executor = None
+		self._pid = None
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	@property
+	def executor(self) -> concurrent.futures.ProcessPoolExecutor:
+		"""concurrent.futures.ProcessPoolExecutor: Executor of this process,
+		created on first use so importing the app never forks."""
+		if self._executor is None or self._pid != os.getpid():
+			with self._lock:
+				if self._executor is None or self._pid != os.getpid():
+					self._executor = concurrent.futures.ProcessPoolExecutor(
+						self.max_workers, mp_context=multiprocessing.get_context("spawn")
+					)
+					self._pid = os.getpid()
+		return self._executor
+
+	def submit(self, fn: Callable, *args, block: bool = False) -> concurrent.futures.Future:
+		"""Method to queue a task on the pool.
+
+		Args:
+			fn (Callable): Picklable module level function.
+			block (bool, optional): Wait up to the task timeout for a free
+				slot instead of failing fast. Defaults to False.
+
+		Raises:
+			PoolSaturated: No slot became available.
+
+		Returns:
+			concurrent.futures.Future: Future holding the task result.
+		"""
+		if not self._slots.acquire(blocking=block, timeout=self.timeout if block else None):
+			raise PoolSaturated(f"{self.max_pending} NLP tasks already pending.")
+
+		if self.max_workers == 0 or getattr(self._local, "inline", False):
+			future = concurrent.futures.Future()
+			try:
+				future.set_result(fn(*args))
+			except Exception as e:
+				future.set_exception(e)
+			finally:
+				self._slots.release()
+			return future
+
+		try:
+			future = self.executor.submit(fn, *args)
+		except Exception:
+			self._slots.release()
+			raise
+		future.add_done_callback(lambda _: self._slots.release())
+		return future
+
+	@contextlib.contextmanager
+	def inline(self):
+		"""Context manager running tasks submitted from this thread inline."""
+		previous = getattr(self._local, "inline", False)
+		self._local.inline = True
+		try:
+			yield
+		finally:
+			self._local.inline = previous
+
+	def run(self, fn: Callable, *args, timeout: float = None):
+		"""Method to run a task on the pool and wait for its result.
+
+		Args:
+			fn (Callable): Picklable module level function.
+			timeout (float, optional): Seconds to wait. Defaults to the pool
+				timeout.
+
+		Raises:
+			PoolSaturated: The pool is full.
+			concurrent.futures.TimeoutError: The task did not finish in time.
+
+		Returns:
+			object: Task result.
+		"""
+		future = self.submit(fn, *args)
+		try:
+			return future.result(timeout=timeout or self.timeout)
+		except concurrent.futures.TimeoutError:
+			# Drop it if still queued; a running task finishes in its worker
+			future.cancel()
+			logging.error("NLP task `%s` timed out.", getattr(fn, "__name__", fn))
+			raise
+
+	def imap(self, fn: Callable, arguments: Iterable, window: int = None) -> Iterable:
+		"""Method to run a task per argument tuple, yielding results in order.
+
+		At most `window` tasks of this batch are in flight at once; slots are
+		waited for rather than refused so large batches fill the pool.
+
+		Args:
+			fn (Callable): Picklable module level function.
+			arguments (Iterable): Argument tuples, consumed lazily.
+			window (int, optional): Tasks in flight. Defaults to the number
+				of workers.
+
+		Yields:
+			object: Task results.
+		"""
+		window = window or max(self.max_workers, 1)
+		in_flight = deque()
+		try:
+			for args in arguments:
+				in_flight.append(self.submit(fn, *args, block=True))
+				if len(in_flight) >= window:
+					yield in_flight.popleft().result(timeout=self.timeout)
+			while in_flight:
+				yield in_flight.popleft().result(timeout=self.timeout)
+		finally:
+			for future in in_flight:
+				future.cancel()
+
+	def shutdown(self) -> None:
+		"""Method to stop the worker processes of this process."""
+		if self._executor is not None and self._pid == os.getpid():
+			self._executor.shutdown(wait=False, cancel_futures=True)
+			self._executor = None
+
+
+nlp_pool = TaskPool(
+	max_workers=int(os.environ["NLP_POOL_WORKERS"]) if "NLP_POOL_WORKERS" in os.environ else None,
+	max_pending=int(os.environ.get("NLP_POOL_MAX_PENDING", "0")) or None,
+	timeout=float(os.environ.get("NLP_POOL_TIMEOUT", "60"))
+)
@@ -0,0 +1,153 @@
+
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from typing import Iterator, Tuple
+
+from src.writer import RESULT_COLUMNS, result_columns
+
+
+def normalise_username(username: str) -> str:
+	"""Method to normalise a username the way `utils.backup` stores it.
+
+	Args:
+		username (str): Raw username.
+
+	Returns:
+		str: Upper-cased, underscore-joined username.
+	"""
+	return "_".join([x.upper() for x in username.split()])
+
+
+def iter_results(
+	filepath: str,
+	subject_id: str = None,
+	test_id: str = None,
+	username: str = None,
+	date_from: str = None,
+	date_to: str = None,
+	cursor: int = 0
+) -> Iterator[Tuple[int, dict]]:
+	"""Method to stream matching results without loading the whole file.
+
+	Rows are read one line at a time from a byte offset, so memory use is
+	constant and no lock is taken against the results writer. A trailing
+	row still being written is left for the next read.
+
+	Args:
+		filepath (str): Results CSV.
+		subject_id (str, optional): Keep only this subject. Defaults to None.
+		test_id (str, optional): Keep only this test type. Defaults to None.
+		username (str, optional): Keep only this candidate. Defaults to None.
+		date_from (str, optional): Keep rows on or after this ISO date or
+			timestamp. Defaults to None.
+		date_to (str, optional): Keep rows on or before this ISO date or
+			timestamp. Defaults to None.
+		cursor (int, optional): Byte offset to resume from, 0 for the first
+			row. Defaults to 0.
+
+	Yields:
+		Tuple[int, dict]: Cursor of the next row and the matching result.
+	"""
+	if username is not None:
+		username = normalise_username(username)
+	if date_to is not None and len(date_to) == 10:
+		# A bare date includes the whole day
+		date_to += " 23:59:59"
+
+	try:
+		fp = open(filepath, mode="rb")
+	except FileNotFoundError:
+		return
+	with fp:
+		header = fp.readline()
+		columns = result_columns(next(csv.reader([header.decode("utf-8")]), RESULT_COLUMNS))
+		if cursor > fp.tell():
+			fp.seek(cursor)
+
+		for line in fp:
+			if not line.endswith(b"\n"):
+				break
+			values = next(csv.reader([line.decode("utf-8")]), None)
+			if not values:
+				continue
+			record = dict(zip(columns, values))
+			if subject_id is not None and record.get("SUBJECT_ID") != subject_id:
+				continue
+			if test_id is not None and record.get("TEST_ID") != test_id:
+				continue
+			if username is not None and record.get("USERNAME") != username:
+				continue
+			if date_from is not None and record.get("DATE", "") < date_from:
+				continue
+			if date_to is not None and record.get("DATE", "") > date_to:
+				continue
+			yield fp.tell(), record
+
+
+def export(records: Iterator[Tuple[int, dict]], fmt: str = "ndjson", limit: int = None) -> Iterator[str]:
+	"""Method to render streamed results chunk by chunk.
+
+	Every record carries the cursor resuming the export after it, as a
+	`cursor` key in NDJSON and a trailing `CURSOR` column in CSV.
+
+	Args:
+		records (Iterator[Tuple[int, dict]]): Output of `iter_results`.
+		fmt (str, optional): "ndjson" or "csv". Defaults to "ndjson".
+		limit (int, optional): Maximum number of records. Defaults to None.
+
+	Yields:
+		str: Rendered chunk.
+	"""
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	if fmt == "csv":
+		writer.writerow(RESULT_COLUMNS + ["CURSOR"])
+
+	for count, (cursor, record) in enumerate(records):
+		if limit is not None and count >= limit:
+			break
+		if fmt == "csv":
+			writer.writerow([record.get(column, "") for column in RESULT_COLUMNS] + [cursor])
+		else:
+			buffer.write(json.dumps(dict(record, cursor=cursor)) + "\n")
+		if buffer.tell() >= 1 << 16:
+			yield buffer.getvalue()
+			buffer.seek(0)
+			buffer.truncate()
+	if buffer.tell():
+		yield buffer.getvalue()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Stream results as CSV or NDJSON.")
+	parser.add_argument("--database", default=os.path.join(str(os.getcwd()), "database", "results.csv"))
+	parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+	parser.add_argument("--subject-id")
+	parser.add_argument("--test-id")
+	parser.add_argument("--username")
+	parser.add_argument("--date-from")
+	parser.add_argument("--date-to")
+	parser.add_argument("--cursor", type=int, default=0)
+	parser.add_argument("--limit", type=int)
+	args = parser.parse_args()
+
+	records = iter_results(
+		args.database,
+		subject_id=args.subject_id,
+		test_id=args.test_id,
+		username=args.username,
+		date_from=args.date_from,
+		date_to=args.date_to,
+		cursor=args.cursor
+	)
+	for chunk in export(records, fmt=args.format, limit=args.limit):
+		sys.stdout.write(chunk)
+
+
+if __name__ == "__main__":
+	main()
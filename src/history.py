@@ -0,0 +1,182 @@
+
+
+import csv
+import logging
+import os
+import sqlite3
+import threading
+from typing import Tuple
+
+from src.export import normalise_username
+from src.writer import RESULT_COLUMNS, result_columns, results_writer
+
+
+class HistoryIndex:
+	"""Per-user secondary index over a results file.
+
+	Maps every username to the byte offsets of their rows, so one
+	candidate's history is read with one seek per attempt. The results
+	writer reports rows as it appends them; rows it did not report, such
+	as those written before the index existed, are picked up by scanning
+	from the indexed high-water mark before each lookup.
+	"""
+
+	def __init__(self):
+		"""Class constructor."""
+		self._local = threading.local()
+
+	@staticmethod
+	def index_path(results_path: str) -> str:
+		"""Method to locate the index of a results file.
+
+		Args:
+			results_path (str): Results CSV.
+
+		Returns:
+			str: SQLite database next to the results file.
+		"""
+		return os.path.splitext(results_path)[0] + ".history.sqlite3"
+
+	def connection(self, results_path: str) -> sqlite3.Connection:
+		"""Method to open the index of a results file once per thread and process.
+
+		Args:
+			results_path (str): Results CSV.
+
+		Returns:
+			sqlite3.Connection: Connection in autocommit mode.
+		"""
+		if getattr(self._local, "pid", None) != os.getpid():
+			self._local.connections = dict()
+			self._local.pid = os.getpid()
+		if results_path not in self._local.connections:
+			connection = sqlite3.connect(self.index_path(results_path), timeout=30, isolation_level=None)
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute(
+				"CREATE TABLE IF NOT EXISTS attempts ("
+				"username TEXT NOT NULL, offset INTEGER NOT NULL, PRIMARY KEY (username, offset)) WITHOUT ROWID"
+			)
+			connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+			connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('indexed_to', 0)")
+			self._local.connections[results_path] = connection
+		return self._local.connections[results_path]
+
+	def record(self, results_path: str, rows: list, offsets: list, end: int) -> None:
+		"""Method to index rows just appended by the results writer.
+
+		Args:
+			results_path (str): Results CSV.
+			rows (list): Rows in `RESULT_COLUMNS` order.
+			offsets (list): Byte offset of each row.
+			end (int): Byte offset past the last row.
+		"""
+		if not rows:
+			return
+		username = RESULT_COLUMNS.index("USERNAME")
+		connection = self.connection(results_path)
+		connection.execute("BEGIN IMMEDIATE")
+		try:
+			connection.executemany(
+				"INSERT OR IGNORE INTO attempts (username, offset) VALUES (?, ?)",
+				[(str(row[username]), offset) for row, offset in zip(rows, offsets)]
+			)
+			# Only move the mark over contiguous rows, gaps are left to `catch_up`
+			connection.execute(
+				"UPDATE meta SET value = ? WHERE key = 'indexed_to' AND value = ?", (end, offsets[0])
+			)
+			connection.execute("COMMIT")
+		except BaseException:
+			connection.execute("ROLLBACK")
+			raise
+
+	def catch_up(self, results_path: str) -> int:
+		"""Method to index rows past the high-water mark.
+
+		Args:
+			results_path (str): Results CSV.
+
+		Returns:
+			int: Number of rows scanned.
+		"""
+		connection = self.connection(results_path)
+		(indexed_to,) = connection.execute("SELECT value FROM meta WHERE key = 'indexed_to'").fetchone()
+		try:
+			fp = open(results_path, mode="rb")
+		except FileNotFoundError:
+			return 0
+
+		with fp:
+			if os.fstat(fp.fileno()).st_size < indexed_to:
+				# The results file was replaced, index it from scratch
+				connection.execute("DELETE FROM attempts")
+				indexed_to = 0
+			header = next(csv.reader([fp.readline().decode("utf-8")]), RESULT_COLUMNS)
+			if "USERNAME" not in header:
+				return 0
+			username = header.index("USERNAME")
+			position = max(indexed_to, fp.tell())
+			fp.seek(position)
+
+			attempts = list()
+			for line in fp:
+				if not line.endswith(b"\n"):
+					break
+				values = next(csv.reader([line.decode("utf-8")]), None)
+				if values and len(values) > username:
+					attempts.append((values[username], position))
+				position += len(line)
+
+		if position == indexed_to:
+			return 0
+		connection.execute("BEGIN IMMEDIATE")
+		try:
+			connection.executemany("INSERT OR IGNORE INTO attempts (username, offset) VALUES (?, ?)", attempts)
+			connection.execute(
+				"UPDATE meta SET value = ? WHERE key = 'indexed_to'", (position,)
+			)
+			connection.execute("COMMIT")
+		except BaseException:
+			connection.execute("ROLLBACK")
+			raise
+		return len(attempts)
+
+	def history(self, results_path: str, username: str, page: int = 1, per_page: int = 20) -> Tuple[list, int]:
+		"""Method to read one page of a candidate's attempts, newest first.
+
+		Args:
+			results_path (str): Results CSV.
+			username (str): Candidate, normalised like `utils.backup`.
+			page (int, optional): Page number from 1. Defaults to 1.
+			per_page (int, optional): Attempts per page. Defaults to 20.
+
+		Returns:
+			Tuple[list, int]: Result records of the page and the total
+				number of attempts.
+		"""
+		username = normalise_username(username)
+		try:
+			self.catch_up(results_path)
+		except (OSError, sqlite3.Error):
+			logging.exception("Results history index not updated.", exc_info=True)
+
+		connection = self.connection(results_path)
+		(total,) = connection.execute("SELECT COUNT(*) FROM attempts WHERE username = ?", (username,)).fetchone()
+		offsets = [offset for (offset,) in connection.execute(
+			"SELECT offset FROM attempts WHERE username = ? ORDER BY offset DESC LIMIT ? OFFSET ?",
+			(username, per_page, (max(page, 1) - 1) * per_page)
+		)]
+		if not offsets:
+			return [], total
+
+		records = list()
+		with open(results_path, mode="rb") as fp:
+			header = result_columns(next(csv.reader([fp.readline().decode("utf-8")]), RESULT_COLUMNS))
+			for offset in offsets:
+				fp.seek(offset)
+				values = next(csv.reader([fp.readline().decode("utf-8")]), [])
+				records.append(dict(zip(header, values)))
+		return records, total
+
+
+history_index = HistoryIndex()
+results_writer.add_listener(history_index.record)
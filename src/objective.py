@@ -2,11 +2,18 @@
 
 import logging
 import re
-from typing import Tuple
+import time
+from typing import Iterator, Sequence, Tuple
 
-import nltk
 import numpy as np
-from nltk.corpus import wordnet as wn
+
+from src.chunker import noun_phrase_chunker
+from src.corpusstore import CorpusStore, is_corpus_store
+from src.difficulty import DifficultyIndex
+from src.questionbank import QuestionBank
+
+# Sentences tagged and chunked together when scanning a corpus
+CHUNK_BATCH = 512
 
 
 class ObjectiveTest:
@@ -19,39 +26,125 @@ class ObjectiveTest:
 		Args:
 			filepath (str): filepath (str): Absolute filepath to the subject corpus.
 		"""
-		# Load subject corpus
+		# Columnar question bank, built once per corpus
+		self.question_bank = None
+		# Eligible questions sorted by difficulty, built on first adaptive test
+		self.difficulty_index = None
+
+		# Load subject corpus, stored corpora are read a block at a time
+		self.store = None
+		self.summary = ""
 		try:
-			with open(filepath, mode="r") as fp:
-				self.summary = fp.read()
+			if is_corpus_store(filepath):
+				self.store = CorpusStore(filepath)
+			else:
+				with open(filepath, mode="r") as fp:
+					self.summary = fp.read()
 		except FileNotFoundError:
 			logging.exception("Corpus file not found.", exc_info=True)
 
-	def generate_test(self, num_questions: int = 10) -> Tuple[list, list]:
+	def corpus_sentences(self) -> Sequence[str]:
+		"""Method to list the sentences of the corpus.
+
+		Returns:
+			Sequence[str]: Corpus sentences, the corpus store itself when the
+				corpus is stored so only the sentences used are decompressed.
+		"""
+		if self.store is not None:
+			return self.store
+
+		import nltk
+
+		return nltk.sent_tokenize(self.summary)
+
+	def generate_test(self, num_questions: int = 10, lazy: bool = False, time_budget: float = None) -> Tuple[list, list]:
 		"""Method to generate an objective test.
 
 		Args:
 			num_questions (int, optional): Number of questions in a test.
 				Defaults to 3.
+			lazy (bool, optional): Analyse sentences in random order only until
+				enough questions are found, instead of building the question
+				bank of the whole corpus. Defaults to False.
+			time_budget (float, optional): Seconds a lazy generation may take.
+				Defaults to None.
 
 		Returns:
 			Tuple[list, list]: Questions and answer options respectively.
 		"""
-		# Identify potential question sets
-		question_sets = self.get_question_sets()
+		if lazy and self.question_bank is None:
+			return self.generate_test_lazily(num_questions, time_budget)
 
-		# Identify potential question answers
-		question_answers = list()
-		for question_set in question_sets:
-			if question_set["Key"] > 10:
-				question_answers.append(question_set)
+		# Build the question bank once, repeated tests sample from it
+		if self.question_bank is None:
+			self.question_bank = QuestionBank.build(self.iter_question_sets())
 
 		# Create objective test set
+		return self.question_bank.sample(num_questions)
+
+	def generate_adaptive_test(self, num_questions: int, target_difficulty: float, digest: str) -> Tuple[list, list]:
+		"""Method to generate an objective test around a target difficulty.
+
+		Args:
+			num_questions (int): Number of questions in a test.
+			target_difficulty (float): Difficulty in [0, 1], 0 for questions
+				every candidate answers correctly.
+			digest (str): Digest of the subject corpus.
+
+		Returns:
+			Tuple[list, list]: Questions and answers respectively.
+		"""
+		if self.question_bank is None:
+			self.question_bank = QuestionBank.build(self.iter_question_sets())
+		bank = self.question_bank
+		if self.difficulty_index is None:
+			self.difficulty_index = DifficultyIndex.build(
+				digest, (bank.strings[bank.question[row]] for row in bank.eligible)
+			)
+
+		rows = bank.eligible[self.difficulty_index.select(target_difficulty, num_questions)]
+		questions = [bank.strings[bank.question[row]] for row in rows]
+		answers = [bank.strings[bank.answer[row]] for row in rows]
+		return questions, answers
+
+	def generate_test_lazily(self, num_questions: int, time_budget: float = None) -> Tuple[list, list]:
+		"""Method to generate an objective test from a random walk of the corpus.
+
+		Sentences are visited in a random permutation and analysed one at a
+		time, stopping as soon as enough distinct eligible questions are found
+		or the time budget runs out. Every eligible sentence is equally likely
+		to be picked, as with the question bank, but the cost scales with the
+		questions needed rather than with the corpus.
+
+		Args:
+			num_questions (int): Number of questions in a test.
+			time_budget (float, optional): Seconds the generation may take.
+				Defaults to None.
+
+		Returns:
+			Tuple[list, list]: Questions and answers respectively, fewer than
+				requested if the corpus or the budget runs out.
+		"""
+		deadline = None if time_budget is None else time.monotonic() + time_budget
+		try:
+			sentences = self.corpus_sentences()
+		except Exception:
+			logging.exception("Sentence tokenization failed.", exc_info=True)
+			return [], []
+
 		questions, answers = list(), list()
-		while len(questions) < num_questions:
-			rand_num = np.random.randint(0, len(question_answers))
-			if question_answers[rand_num]["Question"] not in questions:
-				questions.append(question_answers[rand_num]["Question"])
-				answers.append(question_answers[rand_num]["Answer"])
+		for index in np.random.permutation(len(sentences)):
+			if len(questions) >= num_questions:
+				break
+			if deadline is not None and time.monotonic() >= deadline:
+				logging.warning("Question generation stopped by its time budget.")
+				break
+			question_set = self.identify_potential_questions(sentences[index])
+			if question_set is None or question_set["Key"] <= 10:
+				continue
+			if question_set["Question"] not in questions:
+				questions.append(question_set["Question"])
+				answers.append(question_set["Answer"])
 		return questions, answers
 
 	def get_question_sets(self) -> list:
@@ -60,69 +153,71 @@ class ObjectiveTest:
 		Returns:
 			list: Sentences with potential objective questions.
 		"""
+		return list(self.iter_question_sets())
+
+	def iter_question_sets(self) -> Iterator[dict]:
+		"""Method to lazily identify sentences with potential objective questions.
+
+		Yields:
+			dict: Question set of one sentence.
+		"""
+		import nltk
+
 		# Tokenize corpus into sentences
 		try:
-			sentences = nltk.sent_tokenize(self.summary)
+			sentences = self.corpus_sentences()
 		except Exception:
 			logging.exception("Sentence tokenization failed.", exc_info=True)
+			return
 
 		# Identify potential question sets
 		# Each question set consists:
 		# 	Question: Objective question.
 		# 	Answer: Actual asnwer.
 		#	Key: Other options.
-		question_sets = list()
-		for sent in sentences:
-			question_set = self.identify_potential_questions(sent)
-			if question_set is not None:
-				question_sets.append(question_set)
-		return question_sets
-
-	def identify_potential_questions(self, sentence: str) -> dict:
+		for start in range(0, len(sentences), CHUNK_BATCH):
+			# Tag and chunk a batch of sentences in one pass each
+			batch = sentences[start:start + CHUNK_BATCH]
+			tagged = nltk.pos_tag_sents([nltk.word_tokenize(sent) for sent in batch])
+			for sent, pos_tokens, spans in zip(batch, tagged, noun_phrase_chunker.spans(tagged)):
+				noun_phrases = [" ".join(word for word, _ in pos_tokens[i:j]).strip() for i, j in spans]
+				question_set = self.identify_potential_questions(sent, pos_tokens, noun_phrases)
+				if question_set is not None:
+					yield question_set
+
+	def identify_potential_questions(self, sentence: str, pos_tokens: list = None, noun_phrases: list = None) -> dict:
 		"""Method to identiyf potential question sets.
 
 		Args:
 			sentence (str): Tokenized sequence from corpus.
+			pos_tokens (list, optional): (word, tag) pairs of the sentence,
+				tagged here if not given. Defaults to None.
+			noun_phrases (list, optional): Noun phrases chunked from the
+				sentence, chunked here if not given. Defaults to None.
 
 		Returns:
 			dict: Question formed along with the correct answer in case of
 				potential sentence else return None.
 		"""
-		# POS tag sequences
-		try:
-			tags = nltk.pos_tag(sentence)
-			if tags[0][1] == "RB" or len(nltk.word_tokenize(sentence)) < 4:
+		# POS tag sequences, a batch scan passes the tags it already has
+		if pos_tokens is None:
+			import nltk
+
+			try:
+				pos_tokens = nltk.pos_tag(nltk.word_tokenize(sentence))
+			except Exception:
+				logging.exception("POS tagging failed.", exc_info=True)
 				return None
-		except Exception:
-			logging.exception("POS tagging failed.", exc_info=True)
-
-		# Define regex grammar to chunk keywords
-		noun_phrases = list()
-		grammar = r"""
-			CHUNK: {<NN>+<IN|DT>*<NN>+}
-				{<NN>+<IN|DT>*<NNP>+}
-				{<NNP>+<NNS>*}
-			"""
-
-		# Create parser tree
-		chunker = nltk.RegexpParser(grammar)
-		tokens = nltk.word_tokenize(sentence)
-		pos_tokens = nltk.tag.pos_tag(tokens)
-		tree = chunker.parse(pos_tokens)
-
-		# Parse tree to identify tokens
-		for subtree in tree.subtrees():
-			if subtree.label() == "CHUNK":
-				temp = ""
-				for sub in subtree:
-					temp += sub[0]
-					temp += " "
-				temp = temp.strip()
-				noun_phrases.append(temp)
+		if len(pos_tokens) < 4 or pos_tokens[0][1] == "RB":
+			return None
+
+		# Chunk keywords with the compiled noun-phrase grammar
+		if noun_phrases is None:
+			noun_phrases = [" ".join(words).strip() for words in noun_phrase_chunker.phrases(pos_tokens)]
 
 		# Handle nouns
 		replace_nouns = []
-		for word, _ in tags:
+		for word, _ in pos_tokens:
 			for phrase in noun_phrases:
 				if phrase[0] == '\'':
 					# If it starts with an apostrophe, ignore it
@@ -177,6 +272,8 @@ class ObjectiveTest:
 		Returns:
 			list: Answer options.
 		"""
+		from nltk.corpus import wordnet as wn
+
 		# In the absence of a better method, take the first synset
 		try:
 			synsets = wn.synsets(word, pos="n")
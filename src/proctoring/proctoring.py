@@ -1,15 +1,17 @@
-import cv2
-import speech_recognition as sr
 import numpy as np
 import time
 
 class ProctoringSystem:
     
     def __init__(self):
+        # Camera and audio stacks are only loaded when proctoring starts
+        import cv2
+        import speech_recognition as sr
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         self.recognizer = sr.Recognizer()
     
     def monitor_microphone(self):
+        import speech_recognition as sr
         mic = sr.Microphone()
         with mic as source:
             print("Calibrating microphone for ambient noise, please be silent...")
@@ -33,6 +35,7 @@ class ProctoringSystem:
         return False
     
     def monitor_camera(self):
+        import cv2
         cap = cv2.VideoCapture(0)  # Open the webcam
         face_detected = False
         start_time = time.time()
@@ -0,0 +1,278 @@
+
+
+import cProfile
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from typing import Callable, Iterable, Iterator
+
+from flask import make_response, request
+
+from src.executor import nlp_pool
+
+SIGNATURE_HEADER = "X-Profile-Signature"
+# Seconds a signature stays valid, a leaked header cannot be replayed for long
+SIGNATURE_TTL = 300
+
+
+class RequestProfiler:
+	"""Opt-in per-request profiler for Flask views.
+
+	A request is profiled when it carries a valid, unexpired signature
+	header, or when sampling is switched on and it is drawn at the
+	configured rate. The view runs under `cProfile` and `tracemalloc` and
+	the NLP tasks it dispatches run inline so they show up in the profile.
+	Streamed responses stay profiled while they are iterated, their
+	reports are written once they are closed. Nothing is wrapped unless
+	the profiler is enabled.
+	"""
+
+	def __init__(
+		self,
+		directory: str,
+		sample_rate: float = 0.0,
+		key: str = None,
+		keep: int = 20,
+		top_allocations: int = 25
+	):
+		"""Class constructor.
+
+		Args:
+			directory (str): Root directory of the per-endpoint reports.
+			sample_rate (float, optional): Fraction of requests profiled
+				without a signature. Defaults to 0.0.
+			key (str, optional): Secret validating the signature header.
+				Defaults to None.
+			keep (int, optional): Reports kept per endpoint. Defaults to 20.
+			top_allocations (int, optional): Allocation sites listed per
+				report. Defaults to 25.
+		"""
+		self.directory = directory
+		self.sample_rate = sample_rate
+		self.key = key.encode() if key else None
+		self.keep = keep
+		self.top_allocations = top_allocations
+		# cProfile and tracemalloc are process wide, profile one request at a time
+		self._lock = threading.Lock()
+
+	@property
+	def enabled(self) -> bool:
+		"""bool: True if any request can be profiled."""
+		return self.sample_rate > 0 or self.key is not None
+
+	@staticmethod
+	def digest(key: bytes, path: str, expires: int) -> str:
+		"""Method to compute the HMAC binding a path to an expiry time.
+
+		Args:
+			key (bytes): Profiling secret.
+			path (str): Request path.
+			expires (int): Unix time the signature expires at.
+
+		Returns:
+			str: Hex HMAC-SHA256 of the path and expiry time.
+		"""
+		return hmac.new(key, f"{path}\n{expires}".encode(), hashlib.sha256).hexdigest()
+
+	@staticmethod
+	def sign(key: str, path: str, ttl: int = SIGNATURE_TTL) -> str:
+		"""Method to compute the signature header value for a path.
+
+		Args:
+			key (str): Profiling secret.
+			path (str): Request path, e.g. "/generate_test".
+			ttl (int, optional): Seconds the signature stays valid. Defaults
+				to `SIGNATURE_TTL`.
+
+		Returns:
+			str: "<expires>:<hex HMAC-SHA256 of the path and expiry time>".
+		"""
+		expires = int(time.time()) + ttl
+		return f"{expires}:{RequestProfiler.digest(key.encode(), path, expires)}"
+
+	def requested(self) -> bool:
+		"""Method to decide whether the current request is profiled.
+
+		Returns:
+			bool: True to profile the request.
+		"""
+		signature = request.headers.get(SIGNATURE_HEADER)
+		if signature and self.key is not None:
+			expires, _, mac = signature.partition(":")
+			if expires.isdigit() and int(expires) > time.time():
+				if hmac.compare_digest(mac, self.digest(self.key, request.path, int(expires))):
+					return True
+		return self.sample_rate > 0 and random.random() < self.sample_rate
+
+	def wrap(self, endpoint: str, view: Callable) -> Callable:
+		"""Method to wrap a view function with the profiler.
+
+		Args:
+			endpoint (str): Flask endpoint name.
+			view (Callable): View function.
+
+		Returns:
+			Callable: Profiled view function.
+		"""
+		@functools.wraps(view)
+		def profiled_view(*args, **kwargs):
+			if not self.requested() or not self._lock.acquire(blocking=False):
+				return view(*args, **kwargs)
+			return self.profile(endpoint, view, *args, **kwargs)
+		return profiled_view
+
+	@staticmethod
+	def run(profile: cProfile.Profile, fn: Callable, *args, **kwargs):
+		"""Method to call a function under the profile, NLP tasks inline.
+
+		Args:
+			profile (cProfile.Profile): Profile of the request.
+			fn (Callable): Function to call.
+
+		Returns:
+			object: Function result.
+		"""
+		with nlp_pool.inline():
+			return profile.runcall(fn, *args, **kwargs)
+
+	def iterate(self, profile: cProfile.Profile, iterable: Iterable) -> Iterator:
+		"""Method to produce the chunks of a streamed response under the profile.
+
+		Args:
+			profile (cProfile.Profile): Profile of the request.
+			iterable (Iterable): Response iterable.
+
+		Yields:
+			object: Response chunks.
+		"""
+		iterator = iter(iterable)
+		while True:
+			try:
+				chunk = self.run(profile, next, iterator)
+			except StopIteration:
+				return
+			yield chunk
+
+	def profile(self, endpoint: str, view: Callable, *args, **kwargs):
+		"""Method to run a view under cProfile and tracemalloc and write reports.
+
+		The caller holds the profiling lock, it is released once the reports
+		are written: when the view returns, or when a streamed response is
+		closed.
+
+		Args:
+			endpoint (str): Flask endpoint name.
+			view (Callable): View function.
+
+		Returns:
+			flask.Response: View response.
+		"""
+		# The request context is gone by the time a streamed response closes
+		title = f"{request.method} {request.full_path}"
+		started_tracing = not tracemalloc.is_tracing()
+		if started_tracing:
+			tracemalloc.start()
+		profile = cProfile.Profile()
+		start = time.perf_counter()
+
+		def finish():
+			try:
+				elapsed = time.perf_counter() - start
+				snapshot = tracemalloc.take_snapshot()
+				if started_tracing:
+					tracemalloc.stop()
+				self.write(endpoint, title, profile, snapshot, elapsed)
+			except Exception:
+				logging.exception("Exception raised at `RequestProfiler.write`.", exc_info=True)
+			finally:
+				self._lock.release()
+
+		try:
+			response = make_response(self.run(profile, view, *args, **kwargs))
+		except BaseException:
+			finish()
+			raise
+		if not response.is_streamed:
+			finish()
+			return response
+
+		iterable = response.response
+		response.response = self.iterate(profile, iterable)
+		if hasattr(iterable, "close"):
+			response.call_on_close(lambda: self.run(profile, iterable.close))
+		response.call_on_close(finish)
+		return response
+
+	def write(
+		self,
+		endpoint: str,
+		title: str,
+		profile: cProfile.Profile,
+		snapshot: tracemalloc.Snapshot,
+		elapsed: float
+	) -> None:
+		"""Method to write the pstats and allocation reports of one request.
+
+		Args:
+			endpoint (str): Flask endpoint name.
+			title (str): Request method and path.
+			profile (cProfile.Profile): Finished profile.
+			snapshot (tracemalloc.Snapshot): Allocation snapshot.
+			elapsed (float): Wall time of the request in seconds.
+		"""
+		directory = os.path.join(self.directory, endpoint)
+		os.makedirs(directory, exist_ok=True)
+		stem = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{int(elapsed * 1000)}ms")
+		profile.dump_stats(stem + ".pstats")
+
+		snapshot = snapshot.filter_traces([
+			tracemalloc.Filter(False, tracemalloc.__file__),
+			tracemalloc.Filter(False, cProfile.__file__),
+		])
+		with open(stem + ".alloc.txt", mode="w") as fp:
+			fp.write(f"{title} took {elapsed:.3f}s\n")
+			for stat in snapshot.statistics("lineno")[:self.top_allocations]:
+				fp.write(f"{stat}\n")
+		self.rotate(directory)
+
+	def rotate(self, directory: str) -> None:
+		"""Method to delete all but the newest reports of an endpoint.
+
+		Args:
+			directory (str): Report directory of one endpoint.
+		"""
+		stems = sorted(
+			{os.path.join(directory, f.split(".")[0]) for f in os.listdir(directory)},
+			key=lambda stem: os.path.getmtime(stem + ".pstats") if os.path.exists(stem + ".pstats") else 0
+		)
+		for stem in stems[:-self.keep]:
+			for suffix in (".pstats", ".alloc.txt"):
+				if os.path.exists(stem + suffix):
+					os.remove(stem + suffix)
+
+	def install(self, app) -> None:
+		"""Method to wrap every registered view, only if profiling is enabled.
+
+		Args:
+			app (flask.Flask): Application instance.
+		"""
+		if not self.enabled:
+			return
+		for endpoint, view in list(app.view_functions.items()):
+			if endpoint != "static":
+				app.view_functions[endpoint] = self.wrap(endpoint, view)
+		logging.warning("Request profiling enabled, reports under `%s`.", self.directory)
+
+
+request_profiler = RequestProfiler(
+	os.environ.get("PROFILE_DIR", os.path.join(str(os.getcwd()), "database", "profiles")),
+	sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "1")) if os.environ.get("PROFILE_REQUESTS") == "1" else 0.0,
+	key=os.environ.get("PROFILE_KEY"),
+	keep=int(os.environ.get("PROFILE_KEEP", "20"))
+)
@@ -0,0 +1,302 @@
+
+
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Callable, Iterable, Tuple
+
+import numpy as np
+
+from src.registry import file_digest
+
+MAGIC = b"EVQBANK1"
+ALIGNMENT = 8
+
+
+class StringTable:
+	"""Interned strings packed into one UTF-8 blob with an offset column.
+	"""
+
+	def __init__(self, blob: bytes = b"", offsets: np.ndarray = None):
+		"""Class constructor.
+
+		Args:
+			blob (bytes, optional): Concatenated UTF-8 strings. Defaults to b"".
+			offsets (np.ndarray, optional): Start of every string plus the end
+				of the last one. Defaults to an empty table.
+		"""
+		self.blob = blob
+		self.offsets = np.zeros(1, dtype=np.uint64) if offsets is None else offsets
+
+	def __len__(self) -> int:
+		return len(self.offsets) - 1
+
+	def __getitem__(self, index: int) -> str:
+		return bytes(self.blob[int(self.offsets[index]):int(self.offsets[index + 1])]).decode("utf-8")
+
+
+class StringTableBuilder:
+	"""Interns strings while a question bank is being built.
+	"""
+
+	def __init__(self):
+		"""Class constructor."""
+		self.ids = dict()
+		self.chunks = list()
+		self.offsets = [0]
+
+	def intern(self, value: str) -> int:
+		"""Method to fetch the id of a string, adding it on first sight.
+
+		Args:
+			value (str): String to intern.
+
+		Returns:
+			int: String id.
+		"""
+		if value not in self.ids:
+			encoded = value.encode("utf-8")
+			self.ids[value] = len(self.chunks)
+			self.chunks.append(encoded)
+			self.offsets.append(self.offsets[-1] + len(encoded))
+		return self.ids[value]
+
+	def build(self) -> StringTable:
+		"""Method to freeze the interned strings.
+
+		Returns:
+			StringTable: Packed string table.
+		"""
+		return StringTable(b"".join(self.chunks), np.array(self.offsets, dtype=np.uint64))
+
+
+class QuestionBank:
+	"""Columnar, memory-mappable store of objective question sets.
+
+	Each question set is a row of integer columns pointing into a shared
+	string table. Rows eligible for tests (`Key` above the threshold, with
+	one row per distinct question) are indexed up front so sampling is
+	O(1) per question.
+	"""
+
+	def __init__(
+		self,
+		strings: StringTable,
+		question: np.ndarray,
+		answer: np.ndarray,
+		key: np.ndarray,
+		similar_offsets: np.ndarray,
+		similar: np.ndarray,
+		eligible: np.ndarray,
+		digest: str = ""
+	):
+		"""Class constructor.
+
+		Args:
+			strings (StringTable): Shared string table.
+			question (np.ndarray): Question string id per row.
+			answer (np.ndarray): Answer string id per row.
+			key (np.ndarray): Shortest answer word length per row.
+			similar_offsets (np.ndarray): Start of each row's similar words in
+				`similar`, plus the end of the last row.
+			similar (np.ndarray): Similar word string ids.
+			eligible (np.ndarray): Rows eligible for tests.
+			digest (str, optional): Digest of the source corpus. Defaults to "".
+		"""
+		self.strings = strings
+		self.question = question
+		self.answer = answer
+		self.key = key
+		self.similar_offsets = similar_offsets
+		self.similar = similar
+		self.eligible = eligible
+		self.digest = digest
+		self._mmap = None
+
+	def __len__(self) -> int:
+		return len(self.question)
+
+	@classmethod
+	def build(cls, question_sets: Iterable, threshold: int = 10, digest: str = "") -> "QuestionBank":
+		"""Method to build a bank from question set dicts.
+
+		Args:
+			question_sets (Iterable): Dicts with `Question`, `Answer`, `Key`
+				and `Similar`, consumed one at a time.
+			threshold (int, optional): Rows with `Key` above it are eligible.
+				Defaults to 10.
+			digest (str, optional): Digest of the source corpus. Defaults to "".
+
+		Returns:
+			QuestionBank: Columnar question bank.
+		"""
+		strings = StringTableBuilder()
+		question, answer, key = list(), list(), list()
+		similar_offsets, similar = [0], list()
+		eligible, seen = list(), set()
+		for row, question_set in enumerate(question_sets):
+			question.append(strings.intern(question_set["Question"]))
+			answer.append(strings.intern(question_set["Answer"]))
+			key.append(question_set["Key"])
+			similar.extend(strings.intern(word) for word in question_set.get("Similar", []))
+			similar_offsets.append(len(similar))
+			if question_set["Key"] > threshold and question[-1] not in seen:
+				seen.add(question[-1])
+				eligible.append(row)
+
+		return cls(
+			strings.build(),
+			np.array(question, dtype=np.uint32),
+			np.array(answer, dtype=np.uint32),
+			np.array(key, dtype=np.uint16),
+			np.array(similar_offsets, dtype=np.uint32),
+			np.array(similar, dtype=np.uint32),
+			np.array(eligible, dtype=np.uint32),
+			digest
+		)
+
+	@classmethod
+	def cached(cls, filepath: str, question_sets: Callable, threshold: int = 10) -> "QuestionBank":
+		"""Method to map the bank file of a corpus, building it if stale.
+
+		Args:
+			filepath (str): Absolute filepath to the subject corpus.
+			question_sets (Callable): Returns the question sets of the corpus.
+			threshold (int, optional): Eligibility threshold. Defaults to 10.
+
+		Returns:
+			QuestionBank: Question bank of the corpus.
+		"""
+		digest = file_digest(filepath)
+		cache_path = os.path.splitext(filepath)[0] + ".qbank"
+		if os.path.isfile(cache_path):
+			try:
+				bank = cls.load(cache_path)
+				if bank.digest == digest:
+					return bank
+			except (OSError, ValueError):
+				logging.exception("Question bank cache unreadable.", exc_info=True)
+
+		bank = cls.build(question_sets(), threshold=threshold, digest=digest)
+		# An empty bank means the tokenizer failed, retry rather than cache it
+		if len(bank):
+			try:
+				bank.save(cache_path)
+			except OSError:
+				logging.exception("Question bank cache not writable.", exc_info=True)
+		return bank
+
+	def row(self, index: int) -> dict:
+		"""Method to materialise one question set.
+
+		Args:
+			index (int): Row index.
+
+		Returns:
+			dict: Question set with `Question`, `Answer`, `Key` and `Similar`.
+		"""
+		start, end = int(self.similar_offsets[index]), int(self.similar_offsets[index + 1])
+		return {
+			"Question": self.strings[self.question[index]],
+			"Answer": self.strings[self.answer[index]],
+			"Key": int(self.key[index]),
+			"Similar": [self.strings[i] for i in self.similar[start:end]]
+		}
+
+	def sample(self, num_questions: int, rng: np.random.Generator = None) -> Tuple[list, list]:
+		"""Method to draw distinct eligible questions uniformly at random.
+
+		Args:
+			num_questions (int): Number of questions.
+			rng (np.random.Generator, optional): Random generator.
+				Defaults to a fresh one.
+
+		Returns:
+			Tuple[list, list]: Questions and answers respectively.
+		"""
+		rng = rng or np.random.default_rng()
+		num_questions = min(num_questions, len(self.eligible))
+		rows = self.eligible[rng.choice(len(self.eligible), size=num_questions, replace=False)]
+		questions = [self.strings[self.question[row]] for row in rows]
+		answers = [self.strings[self.answer[row]] for row in rows]
+		return questions, answers
+
+	def columns(self) -> dict:
+		"""dict: Every array of the bank keyed by its name in the file."""
+		return {
+			"blob": np.frombuffer(self.strings.blob, dtype=np.uint8),
+			"offsets": self.strings.offsets,
+			"question": self.question,
+			"answer": self.answer,
+			"key": self.key,
+			"similar_offsets": self.similar_offsets,
+			"similar": self.similar,
+			"eligible": self.eligible
+		}
+
+	def save(self, filepath: str) -> None:
+		"""Method to write the bank as a single memory-mappable file.
+
+		Layout: magic, header length, JSON header with the dtype, offset and
+		length of every column, then the 8-byte aligned column data.
+
+		Args:
+			filepath (str): Target filepath.
+		"""
+		columns = self.columns()
+		layout, position = dict(), 0
+		for name, array in columns.items():
+			layout[name] = [array.dtype.str, position, int(array.size)]
+			position += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+		header = json.dumps({"digest": self.digest, "columns": layout}).encode("utf-8")
+		header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+
+		# Write to a sibling file and rename so readers never map a partial bank
+		tmp_path = f"{filepath}.{os.getpid()}.tmp"
+		with open(tmp_path, mode="wb") as fp:
+			fp.write(MAGIC)
+			fp.write(struct.pack("<Q", len(header)))
+			fp.write(header)
+			for array in columns.values():
+				data = array.tobytes()
+				fp.write(data)
+				fp.write(b"\0" * (-len(data) % ALIGNMENT))
+		os.replace(tmp_path, filepath)
+
+	@classmethod
+	def load(cls, filepath: str) -> "QuestionBank":
+		"""Method to memory-map a bank file without copying its columns.
+
+		Args:
+			filepath (str): Source filepath.
+
+		Returns:
+			QuestionBank: Bank whose columns are views of the mapped file.
+		"""
+		with open(filepath, mode="rb") as fp:
+			mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+		if mapped[:len(MAGIC)] != MAGIC:
+			raise ValueError(f"`{filepath}` is not a question bank.")
+		(header_length,) = struct.unpack_from("<Q", mapped, len(MAGIC))
+		start = len(MAGIC) + 8
+		header = json.loads(bytes(mapped[start:start + header_length]))
+		start += header_length
+
+		arrays = dict()
+		for name, (dtype, offset, count) in header["columns"].items():
+			arrays[name] = np.frombuffer(mapped, dtype=np.dtype(dtype), count=count, offset=start + offset)
+
+		bank = cls(
+			StringTable(memoryview(arrays["blob"]), arrays["offsets"]),
+			arrays["question"],
+			arrays["answer"],
+			arrays["key"],
+			arrays["similar_offsets"],
+			arrays["similar"],
+			arrays["eligible"],
+			header["digest"]
+		)
+		bank._mmap = mapped
+		return bank
@@ -0,0 +1,355 @@
+
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Callable
+
+from src.corpusstore import CORPUS_EXTENSION, stored_digest
+
+# Bundled corpora keep the subject ids and names the test form has always used
+LEGACY_SUBJECTS = {
+	"software-testing.txt": ("0", "SOFTWARE ENGINEERING"),
+	"dbms.txt": ("1", "DBMS"),
+	"ml.txt": ("2", "Machine Learning"),
+}
+# Subject ids of the bundled corpora and of corpora uploaded through the test form
+RESERVED_SUBJECT_IDS = frozenset(subject_id for subject_id, _ in LEGACY_SUBJECTS.values()) | {"99"}
+
+
+class Corpus:
+	"""Snapshot of one subject corpus and its precomputed artifacts.
+	"""
+
+	def __init__(self, subject_id: str, subject_name: str, filepath: str, stat: tuple, digest: str = None):
+		"""Class constructor.
+
+		Args:
+			subject_id (str): Subject identifier submitted by the test form.
+			subject_name (str): Display name of the subject.
+			filepath (str): Absolute filepath to the subject corpus.
+			stat (tuple): Modification time and size of the corpus file.
+			digest (str, optional): SHA-1 of the corpus contents, computed on
+				demand when not given. Defaults to None.
+		"""
+		self.subject_id = subject_id
+		self.subject_name = subject_name
+		self.filepath = filepath
+		self.stat = stat
+		self._digest = digest
+		self._artifacts = dict()
+		self._lock = threading.Lock()
+
+	@property
+	def digest(self) -> str:
+		"""str: SHA-1 of the corpus contents."""
+		if self._digest is None:
+			self._digest = file_digest(self.filepath)
+		return self._digest
+
+	def artifact(self, name: str, builder: Callable):
+		"""Method to fetch a precomputed artifact, building it on first use.
+
+		Args:
+			name (str): Artifact name.
+			builder (Callable): Function building the artifact from a filepath.
+
+		Returns:
+			object: The artifact for this snapshot of the corpus.
+		"""
+		if name not in self._artifacts:
+			with self._lock:
+				if name not in self._artifacts:
+					# Pin the digest of the contents the artifact is built from
+					self.digest
+					self._artifacts[name] = builder(self.filepath)
+		return self._artifacts[name]
+
+	def built_artifacts(self) -> list:
+		"""Method to list artifacts built so far for this snapshot.
+
+		Returns:
+			list: Artifact names.
+		"""
+		return list(self._artifacts)
+
+
+def file_digest(filepath: str) -> str:
+	"""Method to hash a corpus file in fixed size chunks.
+
+	A corpus store reports the digest of the text it holds, so packing or
+	repacking a corpus keeps its question statistics and caches.
+
+	Args:
+		filepath (str): Absolute filepath to the corpus.
+
+	Returns:
+		str: Hex SHA-1 digest of the corpus text.
+	"""
+	digest = stored_digest(filepath)
+	if digest is not None:
+		return digest
+	sha = hashlib.sha1()
+	with open(filepath, mode="rb") as fp:
+		for chunk in iter(lambda: fp.read(1 << 20), b""):
+			sha.update(chunk)
+	return sha.hexdigest()
+
+
+def file_stat(filepath: str) -> tuple:
+	"""Method to read the change detection key of a file.
+
+	Args:
+		filepath (str): Absolute filepath.
+
+	Returns:
+		tuple: Modification time in nanoseconds and size in bytes.
+	"""
+	st = os.stat(filepath)
+	return st.st_mtime_ns, st.st_size
+
+
+class CorpusRegistry:
+	"""Registry of subject corpora discovered under a corpus directory.
+
+	Startup only stats the files. Artifacts are built on first use and a
+	background watcher rebuilds the artifacts of changed corpora before
+	swapping the new snapshot in, so other subjects are never touched.
+	Listeners are told of every corpus the watcher finds, so artifacts
+	served by other processes can be built ahead of their requests.
+	"""
+
+	def __init__(self, directory: str, interval: float = 5.0, extensions: tuple = (".txt", CORPUS_EXTENSION)):
+		"""Class constructor.
+
+		Args:
+			directory (str): Directory holding the subject corpora.
+			interval (float, optional): Seconds between watcher scans.
+				Defaults to 5.0.
+			extensions (tuple, optional): Corpus file extensions.
+				Defaults to (".txt", ".evc").
+		"""
+		self.directory = directory
+		self.interval = interval
+		self.extensions = extensions
+		self.builders = dict()
+		self.listeners = list()
+		self._corpora = dict()
+		self._rejected = set()
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._thread = None
+		self.scan()
+
+	def register_artifact(self, name: str, builder: Callable) -> None:
+		"""Method to register a per-corpus artifact builder.
+
+		Args:
+			name (str): Artifact name.
+			builder (Callable): Function building the artifact from a filepath.
+		"""
+		self.builders[name] = builder
+
+	def add_listener(self, listener: Callable) -> None:
+		"""Method to register a callback for corpora found by the watcher.
+
+		Args:
+			listener (Callable): Called from the watcher thread with the
+				snapshots of every corpus when it starts, then with those
+				added or changed by each scan.
+		"""
+		self.listeners.append(listener)
+
+	def notify(self, corpora: list) -> None:
+		"""Method to hand snapshots to every listener.
+
+		Args:
+			corpora (list): Corpus snapshots.
+		"""
+		for listener in self.listeners:
+			try:
+				listener(corpora)
+			except Exception:
+				logging.exception("Exception raised by a corpus registry listener.", exc_info=True)
+
+	@staticmethod
+	def subject_for(filename: str) -> tuple:
+		"""Method to derive the subject id and name of a corpus file.
+
+		Args:
+			filename (str): Corpus filename.
+
+		Returns:
+			tuple: Subject id and subject name.
+		"""
+		stem = os.path.splitext(filename)[0]
+		if stem + ".txt" in LEGACY_SUBJECTS:
+			return LEGACY_SUBJECTS[stem + ".txt"]
+		return stem, stem.replace("-", " ").replace("_", " ").upper()
+
+	def scan(self) -> list:
+		"""Method to discover new, changed and removed corpora.
+
+		Returns:
+			list: Subject ids whose corpus was added, changed or removed.
+		"""
+		try:
+			filenames = sorted(
+				f for f in os.listdir(self.directory) if f.endswith(self.extensions)
+			)
+		except FileNotFoundError:
+			logging.exception("Corpus directory not found.", exc_info=True)
+			filenames = list()
+		# A corpus store replaces the text corpus it was packed from
+		stores = {os.path.splitext(f)[0] for f in filenames if f.endswith(CORPUS_EXTENSION)}
+		filenames = [
+			f for f in filenames if f.endswith(CORPUS_EXTENSION) or os.path.splitext(f)[0] not in stores
+		]
+
+		changed = list()
+		corpora = dict()
+		for filename in filenames:
+			filepath = os.path.join(self.directory, filename)
+			subject_id, subject_name = self.subject_for(filename)
+			if subject_id in RESERVED_SUBJECT_IDS and os.path.splitext(filename)[0] + ".txt" not in LEGACY_SUBJECTS:
+				# A `1.txt` would otherwise shadow the DBMS corpus
+				if filename not in self._rejected:
+					logging.warning("Corpus `%s` ignored, subject id `%s` is reserved.", filename, subject_id)
+					self._rejected.add(filename)
+				continue
+			try:
+				stat = file_stat(filepath)
+			except OSError:
+				continue
+			current = self._corpora.get(subject_id)
+			if current is None:
+				corpora[subject_id] = Corpus(subject_id, subject_name, filepath, stat)
+				changed.append(subject_id)
+			elif current.stat == stat:
+				corpora[subject_id] = current
+			else:
+				corpora[subject_id] = self.rebuild(current, stat)
+				if corpora[subject_id] is not current:
+					changed.append(subject_id)
+		changed.extend(sid for sid in self._corpora if sid not in corpora)
+
+		# Swap the whole mapping so readers always see a consistent view
+		with self._lock:
+			self._corpora = corpora
+		return changed
+
+	def rebuild(self, current: Corpus, stat: tuple) -> Corpus:
+		"""Method to rebuild a changed corpus off the serving path.
+
+		Args:
+			current (Corpus): Snapshot currently being served.
+			stat (tuple): New modification time and size of the corpus file.
+
+		Returns:
+			Corpus: New snapshot with the previously built artifacts rebuilt,
+				or the current snapshot if the contents did not change.
+		"""
+		digest = file_digest(current.filepath)
+		if current._digest == digest:
+			current.stat = stat
+			return current
+
+		fresh = Corpus(current.subject_id, current.subject_name, current.filepath, stat, digest)
+		for name in current.built_artifacts():
+			if name in self.builders:
+				try:
+					fresh.artifact(name, self.builders[name])
+				except Exception:
+					logging.exception("Artifact rebuild failed.", exc_info=True)
+					return current
+		return fresh
+
+	def get(self, subject_id: str) -> Corpus:
+		"""Method to fetch the current snapshot of a subject corpus.
+
+		Args:
+			subject_id (str): Subject identifier.
+
+		Returns:
+			Corpus: Current snapshot, None for an unknown subject.
+		"""
+		return self._corpora.get(subject_id)
+
+	def sync(self, subject_id: str, stat: tuple = None) -> Corpus:
+		"""Method to catch up with the snapshot another process is serving.
+
+		Only the process serving requests runs the watcher, `src/__init__.py`
+		skips it in spawned pool workers. A worker keeps the registry it
+		started with, so tasks carry the stat of the corpus the parent
+		resolved and a subject that changed or appeared since is rescanned
+		first.
+
+		Args:
+			subject_id (str): Subject identifier.
+			stat (tuple, optional): Modification time and size of the corpus
+				file seen by the caller, no check if None. Defaults to None.
+
+		Returns:
+			Corpus: Current snapshot, None for an unknown subject.
+		"""
+		corpus = self.get(subject_id)
+		if stat is not None and (corpus is None or corpus.stat != tuple(stat)):
+			self.scan()
+			corpus = self.get(subject_id)
+		return corpus
+
+	def artifact(self, subject_id: str, name: str):
+		"""Method to fetch a registered artifact of a subject corpus.
+
+		Args:
+			subject_id (str): Subject identifier.
+			name (str): Registered artifact name.
+
+		Returns:
+			object: The artifact, None for an unknown subject.
+		"""
+		corpus = self.get(subject_id)
+		if corpus is None:
+			return None
+		return corpus.artifact(name, self.builders[name])
+
+	def subjects(self) -> list:
+		"""Method to list the registered subjects.
+
+		Returns:
+			list: Subject id and subject name pairs.
+		"""
+		return [(c.subject_id, c.subject_name) for c in self._corpora.values()]
+
+	def watch(self) -> None:
+		"""Method to poll the corpus directory until stopped."""
+		self.notify(list(self._corpora.values()))
+		while not self._stop.wait(self.interval):
+			try:
+				changed = self.scan()
+				if changed:
+					logging.info("Corpus registry refreshed: %s", ", ".join(changed))
+					corpora = self._corpora
+					self.notify([corpora[subject_id] for subject_id in changed if subject_id in corpora])
+			except Exception:
+				logging.exception("Corpus registry scan failed.", exc_info=True)
+
+	def start(self) -> None:
+		"""Method to start the background watcher."""
+		if self._thread is None or not self._thread.is_alive():
+			self._stop.clear()
+			self._thread = threading.Thread(target=self.watch, name="corpus-registry", daemon=True)
+			self._thread.start()
+
+	def stop(self) -> None:
+		"""Method to stop the background watcher."""
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+
+
+registry = CorpusRegistry(
+	os.path.join(str(os.getcwd()), "corpus"),
+	interval=float(os.environ.get("CORPUS_SCAN_INTERVAL", "5")),
+)
@@ -0,0 +1,260 @@
+
+
+import argparse
+import logging
+import os
+import re
+import zipfile
+
+import numpy as np
+
+from src.corpusstore import CorpusStore, is_corpus_store
+from src.registry import file_digest, registry
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+STOP_WORDS_PATH = os.path.join(os.path.dirname(__file__), "static", "data", "stop_words_english.txt")
+
+
+def load_stop_words(filepath: str = STOP_WORDS_PATH) -> frozenset:
+	"""Method to load the bundled English stop word list.
+
+	Args:
+		filepath (str, optional): Stop word file, one word per line.
+			Defaults to the bundled list.
+
+	Returns:
+		frozenset: Stop words.
+	"""
+	try:
+		with open(filepath, mode="r") as fp:
+			return frozenset(line.strip() for line in fp if line.strip())
+	except FileNotFoundError:
+		logging.exception("Stop word list not found.", exc_info=True)
+		return frozenset()
+
+
+STOP_WORDS = load_stop_words()
+
+
+def tokenize(text: str) -> list:
+	"""Method to split text into lower-cased content terms.
+
+	Args:
+		text (str): Raw text.
+
+	Returns:
+		list: Terms with stop words removed.
+	"""
+	return [tok for tok in TOKEN_PATTERN.findall(text.lower()) if tok not in STOP_WORDS]
+
+
+def randomized_svd(rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, shape: tuple, rank: int, n_iter: int = 4, seed: int = 0) -> np.ndarray:
+	"""Method to compute the top right singular vectors of a sparse matrix.
+
+	Randomized range finder with power iterations, using only products with
+	the matrix held as coordinate arrays, so no dense sentence-term matrix is
+	ever built.
+
+	Args:
+		rows (np.ndarray): Row index of each non-zero.
+		cols (np.ndarray): Column index of each non-zero.
+		vals (np.ndarray): Value of each non-zero.
+		shape (tuple): Matrix shape.
+		rank (int): Number of singular vectors.
+		n_iter (int, optional): Power iterations. Defaults to 4.
+		seed (int, optional): Random seed. Defaults to 0.
+
+	Returns:
+		np.ndarray: Right singular vectors, one column per component.
+	"""
+	n_rows, n_cols = shape
+
+	def matmul(m):
+		out = np.zeros((n_rows, m.shape[1]))
+		np.add.at(out, rows, vals[:, None] * m[cols])
+		return out
+
+	def rmatmul(m):
+		out = np.zeros((n_cols, m.shape[1]))
+		np.add.at(out, cols, vals[:, None] * m[rows])
+		return out
+
+	rng = np.random.default_rng(seed)
+	sketch = min(rank + 10, n_rows, n_cols)
+	q, _ = np.linalg.qr(matmul(rng.standard_normal((n_cols, sketch))))
+	for _ in range(n_iter):
+		q, _ = np.linalg.qr(rmatmul(q))
+		q, _ = np.linalg.qr(matmul(q))
+	_, _, vt = np.linalg.svd(rmatmul(q).T, full_matrices=False)
+	return vt[:rank].T
+
+
+class SemanticSpace:
+	"""Latent semantic space of one subject corpus.
+
+	TF-IDF weighted sentence-term statistics reduced with truncated SVD. The
+	IDF weights are folded into a single float32 term projection matrix, so
+	projecting an answer is a sum of a few matrix rows.
+	"""
+
+	def __init__(self, vocabulary: dict, projection: np.ndarray):
+		"""Class constructor.
+
+		Args:
+			vocabulary (dict): Term to row index of `projection`.
+			projection (np.ndarray): Float32 term projection, one row per term.
+		"""
+		self.vocabulary = vocabulary
+		self.projection = projection.astype(np.float32, copy=False)
+
+	@classmethod
+	def build(cls, sentences: list, dimensions: int = 100) -> "SemanticSpace":
+		"""Method to build a semantic space from corpus sentences.
+
+		Args:
+			sentences (list): Corpus sentences.
+			dimensions (int, optional): Latent dimensions. Defaults to 100.
+
+		Returns:
+			SemanticSpace: Semantic space of the sentences.
+		"""
+		vocabulary = dict()
+		rows, cols = list(), list()
+		for i, sentence in enumerate(sentences):
+			for term in set(tokenize(sentence)):
+				rows.append(i)
+				cols.append(vocabulary.setdefault(term, len(vocabulary)))
+		if not vocabulary:
+			return cls(vocabulary, np.zeros((0, 1), dtype=np.float32))
+
+		rows, cols = np.array(rows), np.array(cols)
+		document_frequency = np.bincount(cols, minlength=len(vocabulary))
+		idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+		vals = idf[cols]
+
+		# Length-normalise each sentence vector
+		norms = np.sqrt(np.bincount(rows, weights=vals ** 2))
+		vals = vals / norms[rows]
+
+		rank = max(min(dimensions, len(sentences) - 1, len(vocabulary) - 1), 1)
+		components = randomized_svd(rows, cols, vals, (len(sentences), len(vocabulary)), rank)
+		return cls(vocabulary, idf[:, None] * components)
+
+	@classmethod
+	def from_corpus(cls, filepath: str, dimensions: int = 100) -> "SemanticSpace":
+		"""Method to load the cached space of a corpus, building it if stale.
+
+		Args:
+			filepath (str): Absolute filepath to the subject corpus.
+			dimensions (int, optional): Latent dimensions. Defaults to 100.
+
+		Returns:
+			SemanticSpace: Semantic space of the corpus.
+		"""
+		digest = file_digest(filepath)
+		cache_path = os.path.splitext(filepath)[0] + ".lsa.npz"
+		if os.path.isfile(cache_path):
+			try:
+				space, cached_digest = cls.load(cache_path)
+				if cached_digest == digest:
+					return space
+			except (OSError, ValueError, zipfile.BadZipFile, KeyError):
+				logging.exception("Semantic space cache unreadable.", exc_info=True)
+
+		if is_corpus_store(filepath):
+			sentences = list(CorpusStore(filepath))
+		else:
+			import nltk
+
+			with open(filepath, mode="r") as fp:
+				sentences = nltk.sent_tokenize(fp.read())
+		space = cls.build(sentences, dimensions=dimensions)
+		try:
+			space.save(cache_path, digest)
+		except OSError:
+			logging.exception("Semantic space cache not writable.", exc_info=True)
+		return space
+
+	def save(self, filepath: str, digest: str = "") -> None:
+		"""Method to persist the space as a compressed NumPy archive.
+
+		Args:
+			filepath (str): Target `.npz` filepath.
+			digest (str, optional): Digest of the source corpus. Defaults to "".
+		"""
+		terms = sorted(self.vocabulary, key=self.vocabulary.get)
+		# Write to a sibling file and rename so readers never load a partial archive
+		tmp_path = f"{filepath}.{os.getpid()}.tmp"
+		with open(tmp_path, mode="wb") as fp:
+			np.savez_compressed(fp, terms=np.array(terms), projection=self.projection, digest=np.array(digest))
+		os.replace(tmp_path, filepath)
+
+	@classmethod
+	def load(cls, filepath: str) -> tuple:
+		"""Method to load a persisted space.
+
+		Args:
+			filepath (str): Source `.npz` filepath.
+
+		Returns:
+			tuple: Semantic space and digest of its source corpus.
+		"""
+		with np.load(filepath) as data:
+			vocabulary = {str(term): i for i, term in enumerate(data["terms"])}
+			return cls(vocabulary, data["projection"]), str(data["digest"])
+
+	def project(self, texts: list) -> np.ndarray:
+		"""Method to project texts into the space.
+
+		Args:
+			texts (list): Raw texts.
+
+		Returns:
+			np.ndarray: Unit length float32 vectors, one row per text; texts
+				with no known terms project to zero.
+		"""
+		ids, owners = list(), list()
+		for i, text in enumerate(texts):
+			for term in tokenize(text):
+				if term in self.vocabulary:
+					ids.append(self.vocabulary[term])
+					owners.append(i)
+
+		vectors = np.zeros((len(texts), self.projection.shape[1]), dtype=np.float32)
+		if ids:
+			np.add.at(vectors, np.array(owners), self.projection[np.array(ids)])
+		norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+		return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+	def similarities(self, references: list, candidates: list) -> np.ndarray:
+		"""Method to score candidate answers against their references.
+
+		Args:
+			references (list): Reference answers.
+			candidates (list): Candidate answers, paired with `references`.
+
+		Returns:
+			np.ndarray: Cosine similarity per pair as a percentage, clipped
+				at zero.
+		"""
+		scores = np.einsum("ij,ij->i", self.project(references), self.project(candidates))
+		return np.clip(scores * 100, 0, 100)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Precompute semantic spaces of the subject corpora.")
+	parser.add_argument("corpora", nargs="*", help="Corpus files, defaults to every registered subject.")
+	parser.add_argument("--dimensions", type=int, default=100)
+	args = parser.parse_args()
+
+	if args.corpora:
+		filepaths = args.corpora
+	else:
+		filepaths = [registry.get(subject_id).filepath for subject_id, _ in registry.subjects()]
+	for filepath in filepaths:
+		space = SemanticSpace.from_corpus(filepath, dimensions=args.dimensions)
+		print(f"{filepath}: {len(space.vocabulary)} terms x {space.projection.shape[1]} dimensions")
+
+
+if __name__ == "__main__":
+	main()
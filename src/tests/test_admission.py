@@ -0,0 +1,62 @@
+import time
+import unittest
+from flask import Flask, Response
+from src.admission import AdmissionController
+
+
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = AdmissionController(max_concurrent=1, max_waiting=1, max_wait=0.1)
+        self.app = Flask(__name__)
+
+        @self.app.route("/work")
+        @self.controller.limit
+        def work():
+            return "done"
+
+        @self.app.route("/stream")
+        @self.controller.limit
+        def stream():
+            return Response(iter(["a", "b"]))
+
+        self.client = self.app.test_client()
+
+    def test_admits_and_releases(self):
+        self.assertEqual(self.client.get("/work").status_code, 200)
+        stats = self.controller.stats()
+        self.assertEqual((stats["admitted"], stats["active"]), (1, 0))
+
+    def test_rejects_with_retry_after(self):
+        controller = AdmissionController(max_concurrent=1, max_waiting=0)
+        app = Flask(__name__)
+        app.add_url_rule("/work", "work", controller.limit(lambda: "done"))
+        self.assertTrue(controller.acquire())
+        response = app.test_client().get("/work")
+        self.assertEqual(response.status_code, 503)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        self.assertEqual(controller.stats()["rejected"], 1)
+
+    def test_queue_timeout(self):
+        self.assertTrue(self.controller.acquire())
+        start = time.monotonic()
+        response = self.client.get("/work")
+        self.assertEqual(response.status_code, 503)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        stats = self.controller.stats()
+        self.assertEqual((stats["timed_out"], stats["waiting"]), (1, 0))
+
+        # A released slot admits the next request
+        self.controller.release()
+        self.assertEqual(self.client.get("/work").status_code, 200)
+
+    def test_streamed_response_holds_slot_until_closed(self):
+        response = self.client.get("/stream", buffered=False)
+        self.assertEqual(self.controller.stats()["active"], 1)
+        self.assertEqual(response.get_data(as_text=True), "ab")
+        response.close()
+        self.assertEqual(self.controller.stats()["active"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,143 @@
+import json
+import unittest
+from unittest.mock import patch
+from src import app
+from src.executor import nlp_pool
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self):
+        app.secret_key = app.secret_key or "test"
+        self.client = app.test_client()
+        token = patch("src.api.API_TOKEN", "secret")
+        token.start()
+        self.addCleanup(token.stop)
+        self.headers = {"Authorization": "Bearer secret"}
+
+    @patch("src.api.backup", return_value=True)
+    def test_grade_ndjson_batch(self, mock_backup):
+        body = "\n".join([
+            json.dumps({"username": "jane doe", "subject_id": "1", "test_id": "0",
+                        "expected": ["index", "tuple", "schema"], "answers": ["Index", "key", "schema "]}),
+            json.dumps({"username": "john", "subject_id": "42", "test_id": "0"}),
+        ]) + "\n"
+        with self.client.post("/api/v1/grade", data=body, content_type="application/x-ndjson", headers=self.headers) as response:
+            self.assertEqual(response.status_code, 200)
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(len(lines), 2)
+
+        graded = lines[0]
+        self.assertEqual(graded["status"], "Pass")
+        self.assertEqual(graded["score"], 96)
+        self.assertTrue(graded["recorded"])
+        self.assertIn("Incorrect", graded["feedback"][1])
+        self.assertEqual(mock_backup.call_args[0][0]["result"], "Pass")
+
+        self.assertIn("error", lines[1])
+        self.assertEqual(mock_backup.call_count, 1)
+
+    @patch("src.api.backup", return_value=True)
+    def test_grade_reports_bad_lines(self, mock_backup):
+        body = "\n".join([
+            "{not json",
+            json.dumps(["not", "an", "object"]),
+            json.dumps({"subject_id": "1", "test_id": "0", "expected": "index", "answers": ["index"]}),
+            json.dumps({"username": "jane", "subject_id": "1", "test_id": "0",
+                        "expected": ["index"], "answers": ["index"]}),
+        ]) + "\n"
+        with self.client.post("/api/v1/grade", data=body, content_type="application/x-ndjson", headers=self.headers) as response:
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertIn("Line 1", lines[0]["error"])
+        self.assertIn("object", lines[1]["error"])
+        self.assertIn("lists", lines[2]["error"])
+        self.assertEqual(lines[3]["status"], "Pass")
+
+    @patch("src.api.generate", side_effect=lambda *args: (["q"] * args[3], ["a"] * args[3]))
+    def test_generate_bounds_and_errors(self, mock_generate):
+        body = "\n".join([
+            json.dumps({"subject_id": "1", "test_id": "1", "num_questions": 1000, "count": 1000}),
+            json.dumps({"subject_id": "1", "test_id": "0", "num_questions": -4}),
+            json.dumps({"subject_id": "1", "test_id": "0", "count": "many"}),
+            "[1, 2",
+            json.dumps({"subject_id": "1", "test_id": "0", "difficulty": "hard"}),
+        ]) + "\n"
+        with nlp_pool.inline():
+            with self.client.post("/api/v1/tests", data=body, content_type="application/x-ndjson", headers=self.headers) as response:
+                lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        clamped = [line for line in lines if line.get("test_id") == "1"]
+        self.assertEqual(len(clamped), 20)
+        self.assertEqual(len(clamped[0]["questions"]), 10)
+        self.assertEqual(len(lines[20]["questions"]), 1)
+        self.assertEqual([("error" in line) for line in lines[21:]], [True, True, True])
+        self.assertIn("Line 4", lines[22]["error"])
+
+    @patch("src.api.backup", return_value=True)
+    def test_grade_validates_dates_and_questions(self, mock_backup):
+        item = {"username": "jane", "subject_id": "1", "test_id": "0", "expected": ["index"], "answers": ["index"]}
+        body = "\n".join(json.dumps(dict(item, **fields)) for fields in [
+            {"date": "2024-03-01 09:00:00"},
+            {"date": "yesterday"},
+            {"date": "2024-03-01 09:00:00\nJOHN,forged"},
+            {"questions": ["The __________ speeds up lookups.", "Extra question."]},
+            {"questions": [42]},
+            {"questions": ["The __________ speeds up lookups."]},
+        ]) + "\n"
+        with self.client.post("/api/v1/grade", data=body, content_type="application/x-ndjson", headers=self.headers) as response:
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([("error" in line) for line in lines], [False, True, True, True, True, False])
+        self.assertEqual(mock_backup.call_args_list[0][0][0]["date"], "2024-03-01 09:00:00")
+        self.assertEqual(mock_backup.call_count, 2)
+
+    @patch("src.api.backup", return_value=True)
+    @patch("src.api.generate", return_value=(["q"], ["a"]))
+    def test_generate_and_grade_require_token(self, mock_generate, mock_backup):
+        body = json.dumps({"username": "jane", "subject_id": "1", "test_id": "0",
+                           "expected": ["index"], "answers": ["index"]}) + "\n"
+        for path in ("/api/v1/tests", "/api/v1/grade"):
+            response = self.client.post(path, data=body, content_type="application/x-ndjson")
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.headers["WWW-Authenticate"], "Bearer")
+            response = self.client.post(path, data=body, content_type="application/x-ndjson",
+                                        headers={"Authorization": "Bearer guess"})
+            self.assertEqual(response.status_code, 403)
+        self.assertFalse(mock_generate.called)
+        self.assertFalse(mock_backup.called)
+
+    @patch("src.api.relative_ranking", return_value=(80.0, 20.0, 50.0))
+    def test_ranking(self, mock_ranking):
+        response = self.client.get("/api/v1/ranking?subject_id=0&test_id=1")
+        self.assertEqual(response.json["mean_score"], 50.0)
+        self.assertEqual(mock_ranking.call_args[0][0]["subject_id"], "0")
+
+    @patch("src.api.iter_results", return_value=iter([(1, {"USERNAME": "jane", "SCORE": "80"})]))
+    def test_export_requires_token(self, mock_results):
+        self.assertEqual(self.client.get("/api/v1/results/export").status_code, 401)
+        with patch("src.api.API_TOKEN", None):
+            response = self.client.get("/api/v1/results/export", headers={"Authorization": "Bearer secret"})
+            self.assertEqual(response.status_code, 403)
+        with patch("src.api.API_TOKEN", "secret"):
+            response = self.client.get("/api/v1/results/export", headers={"Authorization": "Bearer guess"})
+            self.assertEqual(response.status_code, 403)
+            self.assertFalse(mock_results.called)
+            response = self.client.get("/api/v1/results/export", headers={"Authorization": "Bearer secret"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.get_data(as_text=True)), {"USERNAME": "jane", "SCORE": "80", "cursor": 1})
+
+    @patch("src.api.history_index.history", return_value=([{"SCORE": "80"}], 41))
+    def test_history(self, mock_history):
+        self.assertEqual(self.client.get("/api/v1/history?username=jane%20doe").status_code, 401)
+        self.assertFalse(mock_history.called)
+
+        with self.client.session_transaction() as session:
+            session["user"] = "jane doe"
+        response = self.client.get("/api/v1/history?username=john&page=3&per_page=20")
+        self.assertEqual(response.json["username"], "jane doe")
+        self.assertEqual(response.json["total"], 41)
+        self.assertEqual(mock_history.call_args[0][1:], ("jane doe", 3, 20))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,62 @@
+import glob
+import os
+import random
+import unittest
+import nltk
+from src.chunker import CHUNK_GRAMMAR, NounPhraseChunker
+
+
+class TestNounPhraseChunker(unittest.TestCase):
+
+    def setUp(self):
+        self.chunker = NounPhraseChunker()
+        self.parser = nltk.RegexpParser(CHUNK_GRAMMAR)
+        rng = random.Random(7)
+        tags = ["NN", "NNS", "NNP", "IN", "DT", "JJ", "VB", "."]
+        self.sentences = [
+            [(f"w{i}", rng.choice(tags)) for i in range(rng.randint(1, 30))]
+            for _ in range(500)
+        ]
+
+    def reference(self, tagged):
+        tree = self.parser.parse(tagged)
+        return [[word for word, _ in subtree] for subtree in tree.subtrees() if subtree.label() == "CHUNK"]
+
+    def test_matches_regexp_parser(self):
+        for tagged in self.sentences:
+            self.assertEqual(self.chunker.phrases(tagged), self.reference(tagged), tagged)
+
+    def test_matches_regexp_parser_on_corpora(self):
+        tagged = list()
+        try:
+            for filepath in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "..", "corpus", "*.txt"))):
+                with open(filepath, mode="r") as fp:
+                    sentences = nltk.sent_tokenize(fp.read())
+                tagged.extend(nltk.pos_tag_sents([nltk.word_tokenize(sent) for sent in sentences]))
+        except LookupError:
+            self.skipTest("NLTK tokenizer or tagger data not installed.")
+        self.assertGreater(len(tagged), 0)
+        spans = self.chunker.spans(tagged)
+        for sentence, sentence_spans in zip(tagged, spans):
+            phrases = [[word for word, _ in sentence[i:j]] for i, j in sentence_spans]
+            self.assertEqual(phrases, self.reference(sentence), sentence)
+
+    def test_batch_matches_single_sentences(self):
+        batch = self.chunker.spans(self.sentences)
+        self.assertEqual(batch, [self.chunker.spans([tagged])[0] for tagged in self.sentences])
+
+    def test_rules_apply_in_order(self):
+        # The first rule takes both nouns, so the proper noun falls to the last rule
+        tagged = [("a", "NN"), ("b", "NN"), ("c", "NNP"), ("d", "NNS")]
+        self.assertEqual(self.chunker.phrases(tagged), [["a", "b"], ["c", "d"]])
+        self.assertEqual(self.chunker.spans([tagged, tagged[2:]]), [[(0, 2), (2, 4)], [(0, 2)]])
+
+    def test_unsupported_grammar(self):
+        with self.assertRaises(ValueError):
+            NounPhraseChunker("NP: {<NN.*>+}")
+        with self.assertRaises(ValueError):
+            NounPhraseChunker("NP: }<DT>{")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.collusion import CollusionIndex
+from src.utils import screen_answers
+
+
+class TestCollusionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.index = CollusionIndex(os.path.join(self.tmpdir.name, "collusion.sqlite3"))
+        self.answer = ("a primary key uniquely identifies every tuple of a relation and "
+                       "no two rows of the table may share the same key value").split()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_flags_near_identical_answers(self):
+        self.assertEqual(self.index.check("1", "What is a key?", "JANE", self.answer), [])
+        # One changed word keeps most shingles in common
+        copied = list(self.answer)
+        copied[-1] = "values"
+        matches = self.index.check("1", "What is a key?", "JOHN", copied)
+        self.assertEqual([username for username, _ in matches], ["JANE"])
+        self.assertGreaterEqual(matches[0][1], 0.8)
+
+    def test_scope_and_same_candidate(self):
+        self.index.check("1", "What is a key?", "JANE", self.answer)
+        self.assertEqual(self.index.check("1", "What is a key?", "JANE", self.answer), [])
+        self.assertEqual(self.index.check("1", "What is an index?", "JOHN", self.answer), [])
+        self.assertEqual(self.index.check("2", "What is a key?", "JOHN", self.answer), [])
+
+    def test_unrelated_and_short_answers(self):
+        self.index.check("1", "What is a key?", "JANE", self.answer)
+        other = ("normalisation splits tables to remove redundancy and update anomalies "
+                 "while preserving the dependencies between attributes").split()
+        self.assertEqual(self.index.check("1", "What is a key?", "JOHN", other), [])
+        self.index.check("1", "Define DBMS.", "JANE", ["a", "database"])
+        self.assertEqual(self.index.check("1", "Define DBMS.", "JOHN", ["a", "database"]), [])
+
+    def test_persisted(self):
+        self.index.check("1", "What is a key?", "JANE", self.answer)
+        reopened = CollusionIndex(self.index.filepath)
+        self.assertEqual(len(reopened.check("1", "What is a key?", "JOHN", self.answer)), 1)
+
+    def test_screening_ignores_question_wording(self):
+        expected = ["A key identifies a tuple.", "An index speeds up lookups."]
+        answers = [" ".join(self.answer), "an index is a sorted structure over one or more columns of a table"]
+        with patch("src.utils.collusion_index", self.index), \
+                patch("src.utils.SubjectiveTest.word_tokenizer", side_effect=str.split):
+            self.assertEqual(screen_answers("1", "jane doe", expected, answers), "")
+            # John saw other wordings of the same questions, in another order
+            flags = screen_answers("1", "john", expected[::-1], answers[::-1])
+        self.assertEqual(flags.split(";"), ["Q1~JANE_DOE(1.00)", "Q2~JANE_DOE(1.00)"])
+
+    def test_reference_copies_are_skipped(self):
+        for i in range(50):
+            self.assertEqual(self.index.check("1", "What is a key?", f"C{i}", self.answer, self.answer), [])
+        # None of them was indexed, so the bucket stays empty
+        self.assertEqual(self.index.check("1", "What is a key?", "JOHN", self.answer), [])
+        (count,) = self.index.connection().execute("SELECT COUNT(*) FROM answers").fetchone()
+        self.assertEqual(count, 1)
+
+    def test_matches_are_capped(self):
+        for i in range(20):
+            self.index.check("1", "What is a key?", f"C{i:02d}", self.answer)
+        matches = self.index.check("1", "What is a key?", "JOHN", self.answer)
+        self.assertEqual(len(matches), 5)
+        with patch("src.utils.collusion_index", self.index), \
+                patch("src.utils.SubjectiveTest.word_tokenizer", side_effect=str.split):
+            flags = screen_answers("1", "jane", ["What is a key?"], [" ".join(self.answer)])
+        self.assertEqual(len(flags.split(";")), 5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from src.corpusstore import CODECS, CorpusStore, is_corpus_store, read_corpus
+from src.evidence import SentenceIndex
+from src.objective import ObjectiveTest
+from src.registry import CorpusRegistry, file_digest
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "corpus")
+
+
+class TestCorpusStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "subject.evc")
+        self.data = b"".join(
+            f"Sentence {i} talks about caf\xe9 relations.\r\nIt ends here! ".encode("utf-8")
+            for i in range(200)
+        ) + b"  Trailing text without a stop\n"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        for codec in CODECS:
+            store = CorpusStore.write(self.filepath, self.data, codec=codec, block_size=512)
+            self.assertGreater(store.header["blocks"], 1)
+            self.assertEqual(store.data(), self.data)
+            self.assertEqual("".join(store.segment(i) for i in range(len(store))), self.data.decode("utf-8"))
+            store.close()
+        self.assertTrue(is_corpus_store(self.filepath))
+        self.assertEqual(read_corpus(self.filepath), self.data.decode("utf-8"))
+
+    def test_random_access(self):
+        store = CorpusStore.write(self.filepath, self.data, block_size=512)
+        self.assertEqual(len(store), 401)
+        self.assertEqual(store[0], "Sentence 0 talks about caf\xe9 relations.")
+        self.assertEqual(store[1], "It ends here!")
+        self.assertEqual(store[-1], "Trailing text without a stop")
+        self.assertEqual(store[150:154], [store[i] for i in range(150, 154)])
+        self.assertEqual(list(store), store[:])
+        with self.assertRaises(IndexError):
+            store[len(store)]
+
+        # One sentence only decompresses the block holding it
+        store.block.cache_clear()
+        store.sentence(300)
+        self.assertEqual(store.block.cache_info().currsize, 1)
+        store.close()
+
+    def test_compression(self):
+        with open(os.path.join(CORPUS_DIR, "dbms.txt"), mode="rb") as fp:
+            data = fp.read()
+        store = CorpusStore.write(self.filepath, data)
+        self.assertEqual(store.data(), data)
+        self.assertLess(os.path.getsize(self.filepath) * 1.8, len(data))
+        store.close()
+
+    def test_digest_follows_text(self):
+        source = os.path.join(self.tmpdir.name, "compilers.txt")
+        with open(source, mode="wb") as fp:
+            fp.write(self.data)
+        CorpusStore.write(self.filepath, self.data).close()
+        self.assertEqual(file_digest(self.filepath), file_digest(source))
+
+        # Repacking with another codec keeps the subject's digest
+        registry = CorpusRegistry(self.tmpdir.name)
+        digest = registry.get("subject").digest
+        CorpusStore.write(self.filepath, self.data, codec="lzma", block_size=256).close()
+        self.assertEqual(CorpusRegistry(self.tmpdir.name).get("subject").digest, digest)
+        self.assertEqual(registry.get("compilers").digest, digest)
+
+    def test_not_a_store(self):
+        filepath = os.path.join(self.tmpdir.name, "subject.txt")
+        with open(filepath, mode="w") as fp:
+            fp.write("Plain text.")
+        self.assertFalse(is_corpus_store(filepath))
+        self.assertEqual(read_corpus(filepath), "Plain text.")
+        with self.assertRaises(ValueError):
+            CorpusStore(filepath)
+
+    def test_consumers(self):
+        CorpusStore.write(self.filepath, self.data, block_size=512).close()
+        generator = ObjectiveTest(self.filepath)
+        self.assertIsInstance(generator.corpus_sentences(), CorpusStore)
+
+        index = SentenceIndex.from_corpus(self.filepath)
+        self.assertIsInstance(index.sentences, CorpusStore)
+        self.assertIn("relations", index.postings)
+        supporting, _ = index.evidence("Sentence 7 relations.", "relations")
+        self.assertEqual(len(supporting), 1)
+
+    def test_registry_prefers_store(self):
+        for filename in ["dbms.txt", "dbms.evc", "compilers.txt"]:
+            with open(os.path.join(self.tmpdir.name, filename), mode="wb") as fp:
+                fp.write(self.data)
+        registry = CorpusRegistry(self.tmpdir.name)
+        self.assertEqual(registry.get("1").filepath, os.path.join(self.tmpdir.name, "dbms.evc"))
+        self.assertIsNotNone(registry.get("compilers"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
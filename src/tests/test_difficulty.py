@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.difficulty import DifficultyIndex, QuestionStats, question_key
+
+
+class TestDifficulty(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.stats = QuestionStats(os.path.join(self.tmpdir.name, "stats.sqlite3"))
+        self.sentences = [f"Sentence {i} with a __________." for i in range(50)]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_is_stable_and_scoped(self):
+        self.assertEqual(question_key("abc", "A sentence. "), question_key("abc", "A sentence."))
+        self.assertNotEqual(question_key("abc", "A sentence."), question_key("abd", "A sentence."))
+
+    def test_record_is_incremental(self):
+        key = question_key("abc", self.sentences[0])
+        self.stats.record([key, key], [100, 0])
+        self.stats.record([key], [60.0])
+        self.assertEqual(self.stats.counters(key), (3, 2, 160.0))
+        # Unseen questions are neutral, answered ones shrink towards 0.5
+        unseen, seen = self.stats.difficulties([question_key("abc", "other"), key])
+        self.assertEqual(unseen, 0.5)
+        self.assertAlmostEqual(seen, 1 - (1.6 + 1) / 5)
+
+    def test_select_by_target(self):
+        keys = [question_key("abc", s) for s in self.sentences]
+        # Question i is answered correctly i times out of 49
+        for i, key in enumerate(keys):
+            self.stats.record([key] * 49, [100] * i + [0] * (49 - i))
+        index = DifficultyIndex.build("abc", self.sentences, self.stats)
+        rng = np.random.default_rng(0)
+
+        hard = index.select(0.95, 3, rng)
+        easy = index.select(0.05, 3, rng)
+        self.assertEqual(len(set(hard)), 3)
+        self.assertTrue(all(position < 6 for position in hard))
+        self.assertTrue(all(position >= 44 for position in easy))
+        self.assertEqual(len(index.select(0.5, 80, rng)), 50)
+
+    def test_select_from_few_questions(self):
+        rng = np.random.default_rng(0)
+        self.assertEqual(len(DifficultyIndex.build("abc", [], self.stats).select(0.5, 3, rng)), 0)
+        self.assertEqual(sorted(DifficultyIndex.build("abc", self.sentences[:2], self.stats).select(0.5, 3, rng)), [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from src.evidence import SentenceIndex
+
+
+class TestSentenceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.sentences = [
+            "A primary key uniquely identifies each tuple in a relation.",
+            "A foreign key references the primary key of another relation.",
+            "Normalization removes redundancy from relations.",
+            "An index speeds up lookups on a column.",
+        ]
+        self.index = SentenceIndex.build(self.sentences)
+
+    def test_postings(self):
+        self.assertEqual(self.index.postings["primary"].tolist(), [0, 1])
+        self.assertEqual(self.index.postings["redundancy"].tolist(), [2])
+        self.assertNotIn("a", self.index.postings)
+
+    def test_match_narrows_greedily(self):
+        self.assertEqual(self.index.match(["primary", "key", "tuple"]).tolist(), [0])
+        # A term that would empty the match is skipped
+        self.assertEqual(self.index.match(["key", "redundancy"]).tolist(), [2])
+        self.assertEqual(self.index.match(["unknown"]).tolist(), [])
+
+    def test_evidence(self):
+        supporting, missing = self.index.evidence(
+            "A primary key identifies a tuple. Normalization removes redundancy.",
+            "The primary key identifies the tuple."
+        )
+        self.assertEqual(supporting, [self.sentences[0]])
+        self.assertEqual(missing, [self.sentences[2]])
+
+    def test_from_corpus(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as fp:
+            fp.write("\n".join(self.sentences))
+        try:
+            index = SentenceIndex.from_corpus(fp.name)
+        finally:
+            os.remove(fp.name)
+        self.assertGreater(len(index), 0)
+        self.assertIn("normalization", index.postings)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
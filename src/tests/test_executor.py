@@ -0,0 +1,81 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+import unittest
+from src.executor import PoolSaturated, TaskPool
+
+
+def nap(seconds, value=None):
+    time.sleep(seconds)
+    return value
+
+
+def worker_state():
+    import src.utils
+    return [thread.name for thread in threading.enumerate()], sorted(m for m in sys.modules if m.startswith("src."))
+
+
+class TestTaskPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = TaskPool(max_workers=2, max_pending=2, timeout=10)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_saturated(self):
+        futures = [self.pool.submit(nap, 0.5) for _ in range(2)]
+        with self.assertRaises(PoolSaturated):
+            self.pool.submit(nap, 0)
+        for future in futures:
+            future.result()
+
+        # Finished tasks give their slots back
+        self.assertIsNone(self.pool.run(nap, 0))
+
+    def test_timeout(self):
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            self.pool.run(nap, 1, timeout=0.1)
+
+    def test_inline(self):
+        self.assertNotEqual(self.pool.run(os.getpid), os.getpid())
+        with self.pool.inline():
+            self.assertEqual(self.pool.run(os.getpid), os.getpid())
+        self.assertNotEqual(self.pool.run(os.getpid), os.getpid())
+
+    def test_inline_pool(self):
+        pool = TaskPool(max_workers=0)
+        self.assertEqual(pool.run(os.getpid), os.getpid())
+        with self.assertRaises(ZeroDivisionError):
+            pool.run(divmod, 1, 0)
+
+    def test_worker_runs_no_bootstrap(self):
+        threads, modules = self.pool.run(worker_state)
+        self.assertNotIn("corpus-registry", threads)
+        self.assertNotIn("src.views", modules)
+        self.assertIn("src.utils", modules)
+
+    def test_imap_order_and_window(self):
+        consumed, in_flight = [], []
+
+        def arguments():
+            for i in range(6):
+                consumed.append(i)
+                # Later tasks finish first
+                yield (0.05 * (6 - i), i)
+
+        for result in self.pool.imap(nap, arguments(), window=2):
+            in_flight.append(len(consumed) - result)
+        self.assertEqual(len(consumed), 6)
+        self.assertEqual(in_flight, [2, 2, 2, 2, 2, 1])
+
+        results = list(self.pool.imap(nap, [(0.05 * (6 - i), i) for i in range(6)], window=2))
+        self.assertEqual(results, list(range(6)))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,59 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from src.export import export, iter_results
+from src.writer import RESULT_COLUMNS
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "results.csv")
+        with open(self.filepath, mode="w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(RESULT_COLUMNS)
+            for day in range(1, 7):
+                writer.writerow([f"2024-03-0{day} 09:00:00", "JANE_DOE" if day % 2 else "JOHN",
+                                 "DBMS", str(day % 3), "Subjective", "1", 50 + day, "Pass"])
+            # A row still being appended
+            fp.write("2024-03-07 09:00:00,JANE")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_filters(self):
+        records = [r for _, r in iter_results(self.filepath, username="jane doe", date_to="2024-03-03")]
+        self.assertEqual([r["DATE"][:10] for r in records], ["2024-03-01", "2024-03-03"])
+        records = [r for _, r in iter_results(self.filepath, subject_id="0", date_from="2024-03-04")]
+        self.assertEqual([r["SCORE"] for r in records], ["56"])
+
+    def test_cursor_resumes_export(self):
+        first = [json.loads(line) for line in "".join(export(iter_results(self.filepath), limit=4)).splitlines()]
+        self.assertEqual(len(first), 4)
+        rest = list(iter_results(self.filepath, cursor=first[-1]["cursor"]))
+        self.assertEqual([r["DATE"][:10] for _, r in rest], ["2024-03-05", "2024-03-06"])
+
+    def test_legacy_header(self):
+        with open(self.filepath, mode="w", newline="") as fp:
+            writer = csv.writer(fp)
+            # Written before the FLAGS column existed, then appended to
+            writer.writerow(RESULT_COLUMNS[:-1])
+            writer.writerow(["2024-03-01 09:00:00", "JOHN", "DBMS", "1", "Subjective", "1", "60", "Pass"])
+            writer.writerow(["2024-03-02 09:00:00", "JANE_DOE", "DBMS", "1", "Subjective", "1", "61", "Pass", "Q1~JOHN(0.95)"])
+        records = [r for _, r in iter_results(self.filepath)]
+        self.assertNotIn("FLAGS", records[0])
+        self.assertEqual(records[1]["FLAGS"], "Q1~JOHN(0.95)")
+        rows = list(csv.reader("".join(export(iter_results(self.filepath), fmt="csv")).splitlines()))
+        self.assertEqual([row[RESULT_COLUMNS.index("FLAGS")] for row in rows[1:]], ["", "Q1~JOHN(0.95)"])
+
+    def test_csv_format(self):
+        rows = list(csv.reader("".join(export(iter_results(self.filepath), fmt="csv")).splitlines()))
+        self.assertEqual(rows[0], RESULT_COLUMNS + ["CURSOR"])
+        self.assertEqual(len(rows), 7)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,57 @@
+import csv
+import os
+import tempfile
+import unittest
+from src.history import HistoryIndex
+from src.writer import RESULT_COLUMNS, ResultsWriter
+
+
+class TestHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "results.csv")
+        self.index = HistoryIndex()
+        self.writer = ResultsWriter(fsync="never")
+        self.writer.add_listener(self.index.record)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def row(self, i, username):
+        return [f"2024-01-01 10:00:{i:02d}", username, "DBMS", "1", "Subjective", "1", i, "Pass", ""]
+
+    def test_history_pages(self):
+        self.writer.append(self.filepath, [self.row(i, "JANE_DOE" if i % 3 else "JOHN") for i in range(30)])
+        self.writer.append(self.filepath, [self.row(30, "JANE_DOE")])
+
+        attempts, total = self.index.history(self.filepath, "jane doe", page=1, per_page=5)
+        self.assertEqual(total, 21)
+        self.assertEqual([a["SCORE"] for a in attempts], ["30", "29", "28", "26", "25"])
+        attempts, _ = self.index.history(self.filepath, "Jane Doe", page=5, per_page=5)
+        self.assertEqual([a["SCORE"] for a in attempts], ["1"])
+        self.assertEqual(self.index.history(self.filepath, "nobody"), ([], 0))
+
+    def test_catches_up_rows_not_reported(self):
+        self.writer.append(self.filepath, [self.row(0, "JOHN")])
+        # Rows appended behind the writer's back, e.g. before the index existed
+        with open(self.filepath, mode="a", newline="") as fp:
+            csv.writer(fp).writerow(self.row(1, "JOHN"))
+        self.writer.append(self.filepath, [self.row(2, "JOHN")])
+
+        attempts, total = self.index.history(self.filepath, "john")
+        self.assertEqual(total, 3)
+        self.assertEqual([a["SCORE"] for a in attempts], ["2", "1", "0"])
+        self.assertEqual(self.index.catch_up(self.filepath), 0)
+
+    def test_legacy_header(self):
+        with open(self.filepath, mode="w", newline="") as fp:
+            csv.writer(fp).writerows([RESULT_COLUMNS[:-1], self.row(0, "JOHN")[:-1]])
+        self.writer.append(self.filepath, [self.row(1, "JOHN")[:-1] + ["Q1~JANE(0.90)"]])
+
+        attempts, _ = self.index.history(self.filepath, "john")
+        self.assertEqual([a.get("FLAGS") for a in attempts], ["Q1~JANE(0.90)", None])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
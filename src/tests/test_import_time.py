@@ -0,0 +1,46 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Summed self time allowed for `import src`, override on slow machines
+BUDGET_US = int(os.environ.get("IMPORT_TIME_BUDGET_MS", "1000")) * 1000
+# Packages only loaded by the request or pool task that needs them
+LAZY_MODULES = ("pandas", "nltk", "cv2", "speech_recognition", "sklearn")
+
+
+def import_src():
+    ''' Import `src` in a fresh interpreter, return its summed import self time and loaded modules '''
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src, sys; print(' '.join(sys.modules))"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    self_times = re.findall(r"^import time:\s+(\d+) \|", completed.stderr, re.MULTILINE)
+    return sum(int(t) for t in self_times), set(completed.stdout.split())
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_heavy_dependencies_are_lazy(self):
+        _, modules = import_src()
+        loaded = [m for m in modules if m.split(".")[0] in LAZY_MODULES]
+        self.assertEqual(loaded, [])
+
+    def test_import_time_budget(self):
+        # Best of three, the first run may pay for a cold page cache
+        total = min(import_src()[0] for _ in range(3))
+        self.assertGreater(total, 0)
+        self.assertLess(total, BUDGET_US, f"`import src` took {total / 1000:.0f} ms")
+
+    def test_import_starts_no_threads(self):
+        completed = subprocess.run(
+            [sys.executable, "-c", "import src, threading; print(threading.active_count())"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(completed.stdout.strip(), "1")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,64 @@
+import os
+import unittest
+from unittest.mock import patch
+from src.objective import ObjectiveTest
+
+
+class TestObjectiveLazy(unittest.TestCase):
+
+    def setUp(self):
+        filepath = os.path.join(os.getcwd(), "corpus", "dbms.txt")
+        self.generator = ObjectiveTest(filepath)
+        self.sentences = [f"Sentence {i}." for i in range(200)]
+        self.analysed = []
+
+    def identify(self, sentence):
+        self.analysed.append(sentence)
+        index = int(sentence.split()[1][:-1])
+        # Every third sentence is eligible, and pairs share the same question
+        return {"Question": f"Question {index // 2}", "Answer": sentence, "Key": 12 if index % 3 == 0 else 5}
+
+    def test_stops_once_enough_questions(self):
+        with patch("nltk.sent_tokenize", return_value=self.sentences), \
+                patch.object(self.generator, "identify_potential_questions", side_effect=self.identify):
+            questions, answers = self.generator.generate_test(num_questions=5, lazy=True)
+        self.assertEqual(len(questions), 5)
+        self.assertEqual(len(set(questions)), 5)
+        self.assertLess(len(self.analysed), len(self.sentences))
+        self.assertIsNone(self.generator.question_bank)
+
+    def test_time_budget(self):
+        with patch("nltk.sent_tokenize", return_value=self.sentences), \
+                patch.object(self.generator, "identify_potential_questions", side_effect=self.identify):
+            questions, answers = self.generator.generate_test(num_questions=5, lazy=True, time_budget=0)
+        self.assertEqual(questions, [])
+        self.assertEqual(self.analysed, [])
+
+
+class TestObjectiveBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = ObjectiveTest(os.path.join(os.getcwd(), "corpus", "dbms.txt"))
+        self.sentences = ["Primary keys identify every tuple .", "Often rows repeat in tables ."]
+        self.tags = {
+            "Primary": "NNP", "keys": "NNS", "identify": "VBP", "every": "DT", "tuple": "NN", ".": ".",
+            "Often": "RB", "rows": "NNS", "repeat": "VBP", "in": "IN", "tables": "NNS",
+        }
+
+    def tag_sents(self, sentences):
+        return [[(word, self.tags[word]) for word in words] for words in sentences]
+
+    def test_scan_reuses_batch_tags(self):
+        # Sentences are tagged once per batch, never again one by one
+        with patch("nltk.sent_tokenize", return_value=self.sentences), \
+                patch("nltk.word_tokenize", side_effect=str.split), \
+                patch("nltk.pos_tag_sents", side_effect=self.tag_sents) as mock_tag_sents, \
+                patch("nltk.pos_tag", side_effect=AssertionError("tagged twice")):
+            question_sets = self.generator.get_question_sets()
+        self.assertEqual(mock_tag_sents.call_count, 1)
+        self.assertEqual([q["Answer"] for q in question_sets], ["Primary keys"])
+        self.assertEqual(question_sets[0]["Question"], "____________________ identify every tuple .")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,95 @@
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from flask import Flask, Response, stream_with_context
+from src.profiler import SIGNATURE_HEADER, RequestProfiler
+
+
+def streamed_work(i):
+    return f"{i}:{sum(range(1000))}\n"
+
+
+class TestRequestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.add_url_rule("/work", "work", lambda: "done")
+        self.app.add_url_rule("/stream", "stream", lambda: Response(stream_with_context(
+            streamed_work(i) for i in range(3)
+        )))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def reports(self, endpoint="work"):
+        directory = os.path.join(self.tmpdir.name, endpoint)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_disabled_installs_nothing(self):
+        view = self.app.view_functions["work"]
+        RequestProfiler(self.tmpdir.name).install(self.app)
+        self.assertIs(self.app.view_functions["work"], view)
+
+    def test_signed_request(self):
+        RequestProfiler(self.tmpdir.name, key="secret").install(self.app)
+        client = self.app.test_client()
+
+        expires = int(time.time()) + 60
+        rejected = [
+            "deadbeef",
+            RequestProfiler.sign("other", "/work"),
+            RequestProfiler.sign("secret", "/elsewhere"),
+            RequestProfiler.sign("secret", "/work", ttl=-1),
+            f"{expires + 60}:{RequestProfiler.sign('secret', '/work', ttl=60).split(':')[1]}",
+        ]
+        for signature in rejected:
+            self.assertEqual(client.get("/work", headers={SIGNATURE_HEADER: signature}).status_code, 200)
+        self.assertEqual(self.reports(), [])
+
+        response = client.get("/work", headers={SIGNATURE_HEADER: RequestProfiler.sign("secret", "/work")})
+        self.assertEqual(response.get_data(as_text=True), "done")
+        self.assertEqual([f.split(".", 1)[1] for f in self.reports()], ["alloc.txt", "pstats"])
+
+    def test_streamed_response(self):
+        RequestProfiler(self.tmpdir.name, key="secret").install(self.app)
+        client = self.app.test_client()
+        headers = {SIGNATURE_HEADER: RequestProfiler.sign("secret", "/stream")}
+
+        response = client.get("/stream", headers=headers, buffered=False)
+        self.assertEqual(self.reports("stream"), [])
+        self.assertEqual(response.get_data(as_text=True).count("499500"), 3)
+        response.close()
+
+        reports = self.reports("stream")
+        self.assertEqual([f.split(".", 1)[1] for f in reports], ["alloc.txt", "pstats"])
+        stats = pstats.Stats(os.path.join(self.tmpdir.name, "stream", reports[1])).stats
+        calls = [stat[0] for (_, _, name), stat in stats.items() if name == "streamed_work"]
+        self.assertEqual(calls, [3])
+        with open(os.path.join(self.tmpdir.name, "stream", reports[0])) as fp:
+            self.assertTrue(fp.readline().startswith("GET /stream? took"))
+
+        # Closing the response released the profiler for the next request
+        time.sleep(1)
+        client.get("/stream", headers=headers).close()
+        self.assertEqual(len(self.reports("stream")), 4)
+
+    def test_rotation(self):
+        profiler = RequestProfiler(self.tmpdir.name, key="secret", keep=2)
+        directory = os.path.join(self.tmpdir.name, "work")
+        os.makedirs(directory)
+        for i in range(4):
+            for suffix in (".pstats", ".alloc.txt"):
+                filepath = os.path.join(directory, f"report{i}{suffix}")
+                open(filepath, mode="w").close()
+                os.utime(filepath, (i, i))
+        profiler.rotate(directory)
+        self.assertEqual(self.reports(), [
+            "report2.alloc.txt", "report2.pstats", "report3.alloc.txt", "report3.pstats"
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
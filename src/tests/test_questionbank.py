@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.questionbank import QuestionBank
+
+
+class TestQuestionBank(unittest.TestCase):
+
+    def setUp(self):
+        self.question_sets = [
+            {"Question": f"Question {i} __________.", "Answer": f"answer{i}", "Key": 8 + i % 6,
+             "Similar": [f"option{i}", "shared option"] if i % 2 else []}
+            for i in range(30)
+        ]
+        # Duplicate question text is only eligible once
+        self.question_sets.append(dict(self.question_sets[5]))
+        self.bank = QuestionBank.build(iter(self.question_sets), digest="abc")
+
+    def test_rows_round_trip(self):
+        self.assertEqual(len(self.bank), 31)
+        for i, question_set in enumerate(self.question_sets):
+            self.assertEqual(self.bank.row(i), question_set)
+        # Strings are interned once
+        self.assertEqual(len(self.bank.strings), 30 + 30 + 15 + 1)
+
+    def test_eligibility_index(self):
+        expected = [i for i, q in enumerate(self.question_sets[:30]) if q["Key"] > 10]
+        self.assertEqual(self.bank.eligible.tolist(), expected)
+
+    def test_sample_is_distinct_and_eligible(self):
+        questions, answers = self.bank.sample(10, np.random.default_rng(7))
+        self.assertEqual(len(set(questions)), 10)
+        for question, answer in zip(questions, answers):
+            row = self.question_sets[int(question.split()[1])]
+            self.assertGreater(row["Key"], 10)
+            self.assertEqual(row["Answer"], answer)
+        # Never more questions than eligible rows
+        self.assertEqual(len(self.bank.sample(100)[0]), len(self.bank.eligible))
+
+    def test_sample_without_eligible_rows(self):
+        bank = QuestionBank.build(iter(self.question_sets[:2]))
+        self.assertEqual(bank.sample(3), ([], []))
+
+    def test_save_and_mmap(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "corpus.qbank")
+            self.bank.save(filepath)
+            bank = QuestionBank.load(filepath)
+            self.assertEqual(bank.digest, "abc")
+            self.assertEqual(bank.eligible.tolist(), self.bank.eligible.tolist())
+            for i, question_set in enumerate(self.question_sets):
+                self.assertEqual(bank.row(i), question_set)
+            del bank
+
+    def test_cached_skips_empty_bank(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "corpus.txt")
+            with open(filepath, mode="w") as fp:
+                fp.write("Corpus text.")
+            self.assertEqual(len(QuestionBank.cached(filepath, lambda: iter([]))), 0)
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, "corpus.qbank")))
+            bank = QuestionBank.cached(filepath, lambda: iter(self.question_sets))
+            self.assertEqual(len(bank), len(self.question_sets))
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "corpus.qbank")))
+            del bank
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
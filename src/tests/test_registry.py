@@ -0,0 +1,130 @@
+import os
+import tempfile
+import time
+import unittest
+from src.executor import TaskPool
+from src.registry import CorpusRegistry
+
+# Registries of a pool worker, created by its first task and never rescanned by a watcher
+WORKER_REGISTRIES = {}
+
+
+def read_text(filepath):
+    with open(filepath) as fp:
+        return fp.read()
+
+
+def worker_corpus_text(directory, subject_id, stat):
+    ''' Pool task reading a corpus the way `utils.generate` does in a worker '''
+    if directory not in WORKER_REGISTRIES:
+        WORKER_REGISTRIES[directory] = CorpusRegistry(directory)
+        WORKER_REGISTRIES[directory].register_artifact("text", read_text)
+    corpus = WORKER_REGISTRIES[directory].sync(subject_id, stat)
+    return None if corpus is None else corpus.artifact("text", read_text)
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = self.tmpdir.name
+        for filename in ["dbms.txt", "compilers.txt", "operating_systems.txt"]:
+            self.write(filename, f"Corpus for {filename}.")
+        self.builds = []
+        self.registry = CorpusRegistry(self.directory)
+        self.registry.register_artifact("length", self.build_length)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, filename, text, mtime_ns=None):
+        filepath = os.path.join(self.directory, filename)
+        with open(filepath, mode="w") as fp:
+            fp.write(text)
+        if mtime_ns is not None:
+            os.utime(filepath, ns=(mtime_ns, mtime_ns))
+
+    def build_length(self, filepath):
+        self.builds.append(os.path.basename(filepath))
+        with open(filepath) as fp:
+            return len(fp.read())
+
+    def test_discovery(self):
+        subjects = dict(self.registry.subjects())
+        self.assertEqual(subjects["1"], "DBMS")
+        self.assertEqual(subjects["compilers"], "COMPILERS")
+        self.assertEqual(subjects["operating_systems"], "OPERATING SYSTEMS")
+        self.assertIsNone(self.registry.get("99"))
+        # Nothing is built at startup
+        self.assertEqual(self.builds, [])
+
+    def test_rebuilds_only_changed_corpus(self):
+        self.assertEqual(self.registry.artifact("compilers", "length"), len("Corpus for compilers.txt."))
+        self.registry.artifact("1", "length")
+        dbms = self.registry.get("1")
+        self.builds.clear()
+
+        self.write("compilers.txt", "A much longer corpus about compilers.", mtime_ns=1)
+        self.assertEqual(self.registry.scan(), ["compilers"])
+        self.assertEqual(self.builds, ["compilers.txt"])
+        self.assertEqual(self.registry.artifact("compilers", "length"), len("A much longer corpus about compilers."))
+        self.assertIs(self.registry.get("1"), dbms)
+
+    def test_touch_without_content_change(self):
+        self.registry.artifact("compilers", "length")
+        compilers = self.registry.get("compilers")
+        self.builds.clear()
+        self.write("compilers.txt", "Corpus for compilers.txt.", mtime_ns=1)
+        self.assertEqual(self.registry.scan(), [])
+        self.assertIs(self.registry.get("compilers"), compilers)
+        self.assertEqual(self.builds, [])
+
+    def test_added_and_removed(self):
+        self.write("networks.txt", "Corpus for networks.")
+        os.remove(os.path.join(self.directory, "dbms.txt"))
+        self.assertEqual(sorted(self.registry.scan()), ["1", "networks"])
+        self.assertIsNone(self.registry.get("1"))
+        self.assertIsNotNone(self.registry.get("networks"))
+
+    def test_reserved_subject_ids(self):
+        self.write("1.txt", "Not the DBMS corpus.")
+        self.write("99.txt", "Not an upload.")
+        self.registry.scan()
+        self.assertEqual(os.path.basename(self.registry.get("1").filepath), "dbms.txt")
+        self.assertIsNone(self.registry.get("99"))
+
+    def test_watcher_notifies_listeners(self):
+        registry = CorpusRegistry(self.directory, interval=0.05)
+        notified = []
+        registry.add_listener(lambda corpora: notified.append(sorted(c.subject_id for c in corpora)))
+        registry.add_listener(lambda corpora: 1 / 0)
+        registry.start()
+        self.addCleanup(registry.stop)
+
+        self.write("compilers.txt", "Compilers, second edition.", mtime_ns=1)
+        deadline = time.monotonic() + 5
+        while len(notified) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(notified[:2], [["1", "compilers", "operating_systems"], ["compilers"]])
+
+    def test_worker_catches_up_with_parent(self):
+        pool = TaskPool(max_workers=1, timeout=60)
+        self.addCleanup(pool.shutdown)
+
+        def worker_text(subject_id):
+            corpus = self.registry.get(subject_id)
+            stat = None if corpus is None else corpus.stat
+            return pool.run(worker_corpus_text, self.directory, subject_id, stat)
+
+        self.assertEqual(worker_text("compilers"), "Corpus for compilers.txt.")
+
+        # Edited and added after the worker built its registry
+        self.write("compilers.txt", "Compilers, second edition.", mtime_ns=1)
+        self.write("networks.txt", "Corpus for networks.")
+        self.registry.scan()
+        self.assertEqual(worker_text("compilers"), "Compilers, second edition.")
+        self.assertEqual(worker_text("networks"), "Corpus for networks.")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.corpusstore import CorpusStore
+from src.registry import file_digest
+from src.semantic import SemanticSpace, tokenize
+
+
+class TestSemanticSpace(unittest.TestCase):
+
+    def setUp(self):
+        self.sentences = [
+            "A transaction groups database operations into one atomic unit of work.",
+            "Atomicity means a transaction either commits completely or is rolled back.",
+            "Durability guarantees committed transaction results survive a crash.",
+            "Isolation keeps concurrent transactions from seeing partial results.",
+            "Normalization removes redundancy by decomposing relation schemas.",
+            "Third normal form removes transitive dependencies from a relation.",
+            "An index speeds up lookups on a table column.",
+            "A B-tree index keeps keys sorted for range queries.",
+        ]
+        self.space = SemanticSpace.build(self.sentences, dimensions=4)
+
+    def test_tokenize_drops_stop_words(self):
+        self.assertEqual(tokenize("The index of a Table"), ["index", "table"])
+
+    def test_projection_is_compact(self):
+        self.assertEqual(self.space.projection.dtype, np.float32)
+        self.assertEqual(self.space.projection.shape, (len(self.space.vocabulary), 4))
+        vectors = self.space.project(["atomic transaction", "zzz unknown"])
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertEqual(float(np.linalg.norm(vectors[1])), 0.0)
+
+    def test_related_answer_scores_higher(self):
+        reference = "A transaction is committed completely or rolled back."
+        scores = self.space.similarities(
+            [reference, reference],
+            ["Atomic units of work survive a crash once committed.", "Index keys are sorted for range queries."]
+        )
+        self.assertEqual(scores.shape, (2,))
+        self.assertGreater(scores[0], scores[1])
+        self.assertTrue(np.all((scores >= 0) & (scores <= 100)))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "space.lsa.npz")
+            self.space.save(filepath, "abc")
+            space, digest = SemanticSpace.load(filepath)
+        self.assertEqual(digest, "abc")
+        self.assertEqual(space.vocabulary, self.space.vocabulary)
+        np.testing.assert_array_equal(space.projection, self.space.projection)
+
+    def test_corrupt_cache_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "dbms.evc")
+            CorpusStore.write(filepath, " ".join(self.sentences).encode("utf-8")).close()
+            cache_path = os.path.join(tmpdir, "dbms.lsa.npz")
+            self.space.save(cache_path, file_digest(filepath))
+            with open(cache_path, mode="rb") as fp:
+                data = fp.read()
+
+            # A write cut short, then a file that is not an archive at all
+            for corrupt in (data[:len(data) // 2], b"not an archive"):
+                with open(cache_path, mode="wb") as fp:
+                    fp.write(corrupt)
+                with self.assertLogs(level="ERROR"):
+                    space = SemanticSpace.from_corpus(filepath, dimensions=4)
+                self.assertEqual(space.vocabulary, self.space.vocabulary)
+                self.assertEqual(SemanticSpace.load(cache_path)[1], file_digest(filepath))
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["dbms.evc", "dbms.lsa.npz"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -79,6 +79,13 @@ class TestSubjective(unittest.TestCase):
         score = self.test_obj.evaluate_subjective_answer(original_answer, user_answer)
         print(f"Evaluation score: {score}%")
         self.assertGreaterEqual(score, 50, msg="Expected score >= 50%, got {}".format(score))
+    def test_generate_test_with_few_keywords(self):
+        print("Running test_generate_test_with_few_keywords...")
+        self.test_obj.question_answer_dict = {"PRIMARY KEY": "A.", "FOREIGN KEY": "B.", "INDEX": "C."}
+        questions, answers = self.test_obj.generate_test(num_questions=12)
+        self.assertEqual(len(questions), 3)
+        self.assertEqual(len(set(questions)), 3)
+        self.assertEqual(sorted(answers), ["A.", "B.", "C."])
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from flask import Flask, request, session
+from src.traffic import CLIENT_COOKIE, TrafficRecorder, compare, read_trace, replay, summarize
+
+
+class TestTraffic(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.trace = os.path.join(self.tmpdir.name, "trace.ndjson")
+        self.app = Flask(__name__)
+        self.app.secret_key = "test"
+
+        @self.app.route("/start", methods=["POST"])
+        def start():
+            session["test_id"] = request.form["test_id"]
+            return "started"
+
+        @self.app.route("/answer", methods=["POST"])
+        def answer():
+            return session.get("test_id", "none")
+
+        @self.app.route("/items", methods=["POST"])
+        def items():
+            # The first line is readable before the rest of the body was consumed
+            first = request.stream.readline()
+            consumed = request.environ["wsgi.input"].consumed
+            return json.dumps({"first": first.decode(), "consumed": consumed, "rest": len(request.stream.read())})
+
+        @self.app.route("/login", methods=["POST"])
+        def login():
+            return "ok"
+
+        self.recorder = TrafficRecorder(self.trace, key="secret")
+        self.recorder.install(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_capture_is_anonymised(self):
+        corpus = b"A primary key identifies a tuple."
+        with self.client.post("/start?username=Jane%20Doe", data={
+                "test_id": "1", "subject_id": "99", "file": (io.BytesIO(corpus), "notes.txt")}):
+            pass
+        with self.client.post("/answer", data={"answer1": "a key", "answer2": "one two three", "password": "x"}):
+            pass
+        with self.client.post("/login", data={"username": "jane", "password": "secret"}):
+            pass
+
+        records = list(read_trace(self.trace))
+        self.assertEqual([r["endpoint"] for r in records], ["start", "answer"])
+        self.assertEqual(records[0]["query"]["username"], self.recorder.pseudonym("jane doe"))
+        self.assertNotIn("Jane", json.dumps(records))
+        self.assertEqual(len(records[0]["corpora"]["file"]), 40)
+        self.assertNotIn("password", records[1]["form"])
+        self.assertEqual(records[1]["answer_lengths"], [2, 3])
+        self.assertEqual(records[1]["status"], 200)
+        self.assertGreaterEqual(records[1]["duration"], 0)
+
+    def test_key_is_required(self):
+        with self.assertRaises(ValueError):
+            TrafficRecorder(self.trace)
+        self.assertFalse(TrafficRecorder().enabled)
+
+    def test_clients_follow_their_cookie(self):
+        other = self.app.test_client()
+        for client in (self.client, other, self.client):
+            with client.post("/answer", data={"answer1": "a key"}):
+                pass
+        records = list(read_trace(self.trace))
+        self.assertEqual(records[0]["client"], records[2]["client"])
+        self.assertNotEqual(records[0]["client"], records[1]["client"])
+
+        # Pseudonyms survive a restart and are shared by workers with the same key
+        cookie = self.client.get_cookie(CLIENT_COOKIE).value
+        self.assertEqual(records[0]["client"], TrafficRecorder(self.trace, key="secret").pseudonym(cookie))
+        self.assertNotIn(cookie, json.dumps(records))
+
+    def test_streamed_body_is_teed(self):
+        lines = [json.dumps({"subject_id": "1", "answers": ["one two"], "username": "jane"}) + "\n"] * 200
+        body = "".join(lines).encode()
+        with self.client.post("/items", data=body, content_type="application/x-ndjson") as response:
+            result = json.loads(response.get_data(as_text=True))
+        self.assertEqual(result["first"], lines[0])
+        self.assertLess(result["consumed"], len(body))
+        self.assertEqual(result["rest"], len(body) - len(lines[0]))
+
+        # Chunked bodies carry no length and are captured too
+        with self.client.post("/items", input_stream=io.BytesIO(body), content_type="application/x-ndjson",
+                              headers={"Transfer-Encoding": "chunked"}):
+            pass
+        records = list(read_trace(self.trace))
+        self.assertEqual([len(r["items"]) for r in records], [200, 200])
+        self.assertEqual(records[1]["items"][0]["username"], self.recorder.pseudonym("jane"))
+
+    def test_replay_keeps_sessions(self):
+        with self.client.post("/start", data={"test_id": "1"}):
+            pass
+        with self.client.post("/answer", data={"answer1": "a key"}):
+            pass
+        records = list(read_trace(self.trace))
+        bodies = list()
+
+        def factory():
+            client = self.app.test_client()
+
+            def send(request):
+                with client.open(request["path"], method=request["method"], query_string=request["query"],
+                                 data=request["form"]) as response:
+                    bodies.append(response.get_data(as_text=True))
+                    return response.status_code
+            return send
+
+        results = replay(records, factory, speed=0)
+        self.assertEqual(bodies, ["started", "1"])
+        summary = summarize(results)
+        self.assertEqual(summary["answer"]["count"], 1)
+        self.assertIn("answer", compare(summary, summary))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
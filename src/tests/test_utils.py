@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.executor import TaskPool
+from src.registry import CorpusRegistry
+from src.subjective import SubjectiveTest
+from src.utils import PREBUILT_ARTIFACTS, prebuild_changed, subjective_generator
+
+
+class TestPrebuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "compilers.txt")
+        with open(self.filepath, mode="w") as fp:
+            fp.write("A parser turns tokens into a syntax tree.")
+        self.answers = {"SYNTAX TREE": "A parser turns tokens into a syntax tree."}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_keyword_answers_cache(self):
+        cache_path = os.path.join(self.tmpdir.name, "compilers.keywords.json")
+        with patch.object(SubjectiveTest, "keyword_answers", return_value=self.answers) as mock_answers:
+            self.assertEqual(subjective_generator(self.filepath).question_answer_dict, self.answers)
+            self.assertEqual(subjective_generator(self.filepath).question_answer_dict, self.answers)
+            self.assertEqual(mock_answers.call_count, 1)
+
+            # Unreadable or stale caches are rebuilt
+            with open(cache_path, mode="w") as fp:
+                fp.write('{"digest": ')
+            subjective_generator(self.filepath)
+            with open(self.filepath, mode="a") as fp:
+                fp.write(" A lexer splits text into tokens.")
+            subjective_generator(self.filepath)
+            self.assertEqual(mock_answers.call_count, 3)
+        with open(cache_path, mode="r") as fp:
+            self.assertEqual(json.load(fp)["answers"], self.answers)
+
+    def test_failed_keyword_answers_are_not_cached(self):
+        with patch.object(SubjectiveTest, "keyword_answers", return_value={}):
+            subjective_generator(self.filepath)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["compilers.txt"])
+
+    def test_prebuild_changed(self):
+        builds = []
+        registry = CorpusRegistry(self.tmpdir.name)
+        for name in PREBUILT_ARTIFACTS + ("evidence",):
+            registry.register_artifact(name, lambda filepath, name=name: builds.append(name))
+        with patch("src.utils.registry", registry), patch("src.utils.nlp_pool", TaskPool(max_workers=0)):
+            prebuild_changed([registry.get("compilers")])
+            prebuild_changed([registry.get("compilers")])
+        self.assertEqual(builds, list(PREBUILT_ARTIFACTS))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import patch
+from src import app
+from src.executor import nlp_pool
+
+
+class TestViews(unittest.TestCase):
+
+    def setUp(self):
+        app.secret_key = app.secret_key or "test"
+        self.client = app.test_client()
+
+    @patch("src.views.generate", return_value=(["Only one __________."], ["answer"]))
+    def test_short_objective_test_is_refused(self, mock_generate):
+        with nlp_pool.inline():
+            response = self.client.post("/generate_test?username=jane", data={"subject_id": "1", "test_id": "0"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    @patch("src.views.generate", return_value=(["Define A.", "Define B.", "Define C.", "Define D."], ["a", "b", "c", "d"]))
+    def test_short_subjective_test_is_refused(self, mock_generate):
+        with nlp_pool.inline():
+            response = self.client.post("/generate_test?username=jane", data={"subject_id": "1", "test_id": "1"})
+        self.assertEqual(response.status_code, 503)
+
+    @patch("src.views.relative_ranking", return_value=(80.0, 20.0, 50.0))
+    @patch("src.views.backup", return_value=True)
+    @patch("src.views.grade", return_value=(96, "Pass", ["Question 1: Correct!"]))
+    @patch("src.views.generate", return_value=(["The __________ is A.", "B is __________.", "C __________ D."], ["x", "y", "z"]))
+    def test_session_keeps_question_keys(self, mock_generate, mock_grade, mock_backup, mock_ranking):
+        with nlp_pool.inline():
+            self.client.post("/generate_test?username=jane", data={"subject_id": "1", "test_id": "0"})
+            with self.client.session_transaction() as session:
+                self.assertNotIn("questions", session)
+                keys = session["question_keys"]
+            self.assertEqual(len(keys), 3)
+            self.assertTrue(all(len(key) == 20 for key in keys))
+
+            response = self.client.post(
+                "/output?username=jane", data={"answer1": "x", "answer2": "y", "answer3": "w"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_grade.call_args[0][1], ["x", "y", "z"])
+        self.assertEqual(mock_grade.call_args[0][-1], keys)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,69 @@
+import csv
+import os
+import tempfile
+import threading
+import unittest
+from src.writer import RESULT_COLUMNS, ResultsWriter
+
+
+class TestResultsWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "results.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_rows(self):
+        with open(self.filepath, newline="") as fp:
+            return list(csv.reader(fp))
+
+    def row(self, i):
+        return ["2024-01-01 10:00:00", f"USER_{i}", "DBMS", "1", "Subjective", "1", i, "Pass", ""]
+
+    def test_drain_flushes_pending_rows_with_header(self):
+        writer = ResultsWriter(batch_size=1000, flush_interval=60, fsync="never")
+        for i in range(10):
+            self.assertTrue(writer.submit(self.filepath, self.row(i)))
+        self.assertTrue(writer.drain())
+
+        rows = self.read_rows()
+        self.assertEqual(rows[0], RESULT_COLUMNS)
+        self.assertEqual([r[1] for r in rows[1:]], [f"USER_{i}" for i in range(10)])
+        stats = writer.stats()
+        self.assertEqual(stats["rows_written"], 10)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["flushes"], 1)
+
+    def test_batches_on_size(self):
+        writer = ResultsWriter(batch_size=5, flush_interval=60, fsync="batch")
+        for i in range(12):
+            writer.submit(self.filepath, self.row(i))
+        writer.drain()
+        self.assertEqual(writer.stats()["flushes"], 3)
+        self.assertEqual(len(self.read_rows()), 13)
+
+    def test_concurrent_submitters(self):
+        writer = ResultsWriter(batch_size=16, flush_interval=0.01, fsync="interval")
+
+        def submit(offset):
+            for i in range(50):
+                writer.submit(self.filepath, self.row(offset + i))
+
+        threads = [threading.Thread(target=submit, args=(n * 100,)) for n in range(8)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        writer.drain()
+
+        rows = self.read_rows()
+        self.assertEqual(len(rows), 401)
+        self.assertTrue(all(len(r) == len(RESULT_COLUMNS) for r in rows))
+
+    def test_unknown_fsync_policy(self):
+        with self.assertRaises(ValueError):
+            ResultsWriter(fsync="sometimes")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
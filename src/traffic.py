@@ -0,0 +1,590 @@
+
+
+import argparse
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.cookiejar import CookieJar
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import dump_cookie, parse_cookie
+from werkzeug.wrappers import Request
+
+# Endpoints never captured, they carry credentials
+EXCLUDED_ENDPOINTS = {"static", "login", "signup", "logout"}
+# Request fields replaced by a pseudonym
+PSEUDONYMISED_FIELDS = {"username", "user"}
+# Request fields never captured
+DROPPED_FIELDS = {"password"}
+# Opaque per-browser id grouping a client's requests, Flask rewrites its session cookie on every change
+CLIENT_COOKIE = "evaluai_client"
+PERCENTILES = (50, 90, 99)
+
+
+class TrafficRecorder:
+	"""Opt-in WSGI middleware recording anonymised request traces.
+
+	Every captured request becomes one compact JSON line appended to the
+	trace file: route, form and query fields with usernames pseudonymised
+	and passwords dropped, the SHA-1 of uploaded corpora instead of their
+	content, answer texts and lengths, status and timing. Nothing is
+	wrapped unless a trace file is configured.
+	"""
+
+	def __init__(self, filepath: str = None, key: str = None, max_body: int = 16 << 20):
+		"""Class constructor.
+
+		Args:
+			filepath (str, optional): Trace file, capture is off if None.
+				Defaults to None.
+			key (str, optional): Secret keying the pseudonyms, shared by every
+				worker and kept across restarts. Defaults to None.
+			max_body (int, optional): Content of larger request bodies is not
+				captured. Defaults to 16 MiB.
+
+		Raises:
+			ValueError: If capture is on without a key.
+		"""
+		if filepath and not key:
+			raise ValueError("Traffic capture needs TRAFFIC_KEY, pseudonyms must match across workers.")
+		self.filepath = filepath
+		self.key = key.encode() if key else None
+		self.max_body = max_body
+		self._fd = None
+		self._pid = None
+		self._lock = threading.Lock()
+
+	@property
+	def enabled(self) -> bool:
+		"""bool: True if requests are captured."""
+		return bool(self.filepath)
+
+	def pseudonym(self, value: str) -> str:
+		"""Method to replace an identifier by a stable pseudonym.
+
+		Args:
+			value (str): Identifier, e.g. a username.
+
+		Returns:
+			str: Keyed hash prefix of the identifier.
+		"""
+		return "u" + hmac.new(self.key, value.strip().upper().encode(), hashlib.sha256).hexdigest()[:12]
+
+	def anonymise(self, fields: dict) -> dict:
+		"""Method to strip credentials and identities from request fields.
+
+		Args:
+			fields (dict): Field names mapped to values.
+
+		Returns:
+			dict: Captured fields.
+		"""
+		captured = dict()
+		for name, value in fields.items():
+			if name in DROPPED_FIELDS:
+				continue
+			if name in PSEUDONYMISED_FIELDS and isinstance(value, str):
+				value = self.pseudonym(value)
+			captured[name] = value
+		return captured
+
+	def describe(self, environ: dict, body: bytes, endpoint: str) -> dict:
+		"""Method to build the trace record of a request.
+
+		Args:
+			environ (dict): WSGI environment.
+			body (bytes): Request body.
+			endpoint (str): Flask endpoint name.
+
+		Returns:
+			dict: Trace record without client, status and timing.
+		"""
+		environ = dict(environ, **{"wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body))})
+		environ.pop("wsgi.input_terminated", None)
+		request = Request(environ)
+		record = {
+			"method": request.method,
+			"path": request.path,
+			"endpoint": endpoint,
+			"query": self.anonymise(request.args.to_dict()),
+		}
+		if request.is_json or request.mimetype == "application/x-ndjson":
+			items = list()
+			for line in body.decode("utf-8", errors="replace").splitlines():
+				try:
+					item = json.loads(line) if line.strip() else None
+				except ValueError:
+					item = None
+				if isinstance(item, list):
+					items.extend(item)
+				elif item is not None:
+					items.append(item)
+			record["mimetype"] = request.mimetype
+			record["items"] = [self.anonymise(item) if isinstance(item, dict) else item for item in items]
+		else:
+			record["form"] = self.anonymise(request.form.to_dict())
+			corpora = {name: hashlib.sha1(upload.read()).hexdigest() for name, upload in request.files.items()}
+			if corpora:
+				record["corpora"] = corpora
+
+		answers = [value for name, value in sorted(record.get("form", {}).items()) if name.startswith("answer")]
+		for item in record.get("items", []):
+			if isinstance(item, dict):
+				answers.extend(str(answer) for answer in item.get("answers", []))
+		if answers:
+			record["answer_lengths"] = [len(answer.split()) for answer in answers]
+		return record
+
+	def write(self, record: dict) -> None:
+		"""Method to append one record to the trace file.
+
+		Args:
+			record (dict): Trace record.
+		"""
+		line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+		with self._lock:
+			if self._pid != os.getpid():
+				# O_APPEND keeps single-write records whole across workers
+				self._fd = os.open(self.filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+				self._pid = os.getpid()
+			os.write(self._fd, line)
+
+	def middleware(self, app) -> Callable:
+		"""Method to wrap the WSGI application of a Flask app.
+
+		The request body is copied as the app reads it, so streamed and
+		chunked bodies reach the app unbuffered, and the record is built
+		once the response is closed.
+
+		Args:
+			app (flask.Flask): Application instance.
+
+		Returns:
+			Callable: Recording WSGI application.
+		"""
+		wsgi_app = app.wsgi_app
+
+		def recording_app(environ, start_response):
+			try:
+				endpoint, _ = app.url_map.bind_to_environ(environ).match()
+			except HTTPException:
+				endpoint = None
+			if endpoint is None or endpoint in EXCLUDED_ENDPOINTS:
+				return wsgi_app(environ, start_response)
+
+			client = parse_cookie(environ).get(CLIENT_COOKIE)
+			minted = client is None
+			if minted:
+				client = uuid.uuid4().hex
+			body = TeeInput(environ["wsgi.input"], self.max_body)
+			environ["wsgi.input"] = body
+			status = dict()
+
+			def recording_start_response(status_line, headers, exc_info=None):
+				status["code"] = int(status_line.split()[0])
+				if minted:
+					headers = list(headers) + [
+						("Set-Cookie", dump_cookie(CLIENT_COOKIE, client, max_age=365 * 86400, httponly=True, samesite="Lax"))
+					]
+				return start_response(status_line, headers, exc_info)
+
+			t = time.time()
+			start = time.perf_counter()
+			result = wsgi_app(environ, recording_start_response)
+
+			def finish():
+				if (environ.get("CONTENT_LENGTH") or "").isdigit():
+					# Copy what the app left unread, the server discards it next
+					body.drain(int(environ["CONTENT_LENGTH"]))
+				self.finish(environ, body, endpoint, client, t, status.get("code"), start)
+			return RecordedResponse(result, finish)
+
+		return recording_app
+
+	def finish(self, environ: dict, body: "TeeInput", endpoint: str, client: str, t: float, status: int, start: float) -> None:
+		"""Method to build and write a record once its response is sent.
+
+		Args:
+			environ (dict): WSGI environment.
+			body (TeeInput): Copy of the request body.
+			endpoint (str): Flask endpoint name.
+			client (str): Client cookie value.
+			t (float): `time.time` at the start of the request.
+			status (int): Response status code.
+			start (float): `time.perf_counter` at the start of the request.
+		"""
+		duration = round(time.perf_counter() - start, 6)
+		try:
+			record = self.describe(environ, b"" if body.truncated else bytes(body.buffer), endpoint)
+		except Exception:
+			logging.exception("Exception raised at `TrafficRecorder.describe`.", exc_info=True)
+			return
+		if body.truncated:
+			record["truncated"] = True
+		record["client"] = self.pseudonym(client)
+		record["t"] = t
+		record["status"] = status
+		record["duration"] = duration
+		try:
+			self.write(record)
+		except OSError:
+			logging.exception("Traffic trace not writable.", exc_info=True)
+
+	def install(self, app) -> None:
+		"""Method to capture the traffic of an app, only if a trace file is set.
+
+		Args:
+			app (flask.Flask): Application instance.
+		"""
+		if not self.enabled:
+			return
+		app.wsgi_app = self.middleware(app)
+		logging.warning("Traffic capture enabled, trace at `%s`.", self.filepath)
+
+
+class TeeInput(io.RawIOBase):
+	"""WSGI input stream keeping a copy of the bytes the app reads."""
+
+	def __init__(self, stream, limit: int):
+		self.stream = stream
+		self.limit = limit
+		self.buffer = bytearray()
+		self.consumed = 0
+		# Set once the body outgrows the limit, its content is then not captured
+		self.truncated = False
+
+	def readable(self) -> bool:
+		return True
+
+	def keep(self, data: bytes) -> bytes:
+		self.consumed += len(data)
+		if not self.truncated:
+			if len(self.buffer) + len(data) > self.limit:
+				self.truncated = True
+				self.buffer = bytearray()
+			else:
+				self.buffer += data
+		return data
+
+	def read(self, size: int = -1) -> bytes:
+		return self.keep(self.stream.read() if size is None or size < 0 else self.stream.read(size))
+
+	def readline(self, size: int = -1) -> bytes:
+		return self.keep(self.stream.readline() if size is None or size < 0 else self.stream.readline(size))
+
+	def readinto(self, buffer) -> int:
+		data = self.read(len(buffer))
+		buffer[:len(data)] = data
+		return len(data)
+
+	def drain(self, length: int) -> None:
+		"""Method to read the rest of a body of known length."""
+		while self.consumed < length and not self.truncated:
+			if not self.read(min(length - self.consumed, 1 << 16)):
+				break
+
+
+class RecordedResponse:
+	"""WSGI response iterable calling back once the response is closed."""
+
+	def __init__(self, result: Iterable, on_close: Callable):
+		self.result = result
+		self.on_close = on_close
+
+	def __iter__(self):
+		return iter(self.result)
+
+	def close(self):
+		try:
+			if hasattr(self.result, "close"):
+				self.result.close()
+		finally:
+			self.on_close()
+
+
+traffic_recorder = TrafficRecorder(
+	os.environ.get("TRAFFIC_CAPTURE"),
+	key=os.environ.get("TRAFFIC_KEY")
+)
+
+
+def read_trace(filepath: str) -> Iterator[dict]:
+	"""Method to stream the records of a trace file.
+
+	Args:
+		filepath (str): Trace file.
+
+	Yields:
+		dict: Trace record, a trailing partial line is skipped.
+	"""
+	with open(filepath, mode="rb") as fp:
+		for line in fp:
+			if line.endswith(b"\n"):
+				yield json.loads(line)
+
+
+def replay_request(record: dict, corpora: dict) -> dict:
+	"""Method to rebuild the request of a trace record.
+
+	Args:
+		record (dict): Trace record.
+		corpora (dict): Local corpus filepaths keyed by SHA-1 of content.
+
+	Returns:
+		dict: Method, path, query, form, files and body, None if an
+			uploaded corpus is not available locally.
+	"""
+	files = dict()
+	for name, digest in record.get("corpora", {}).items():
+		if digest not in corpora:
+			return None
+		files[name] = corpora[digest]
+	body = None
+	if "items" in record:
+		if record.get("mimetype") == "application/x-ndjson":
+			body = "".join(json.dumps(item) + "\n" for item in record["items"])
+		else:
+			body = json.dumps(record["items"][0] if len(record["items"]) == 1 else record["items"])
+	return {
+		"method": record["method"],
+		"path": record["path"],
+		"query": record.get("query", {}),
+		"form": record.get("form", {}),
+		"files": files,
+		"body": body,
+		"mimetype": record.get("mimetype"),
+	}
+
+
+def index_corpora(directory: str) -> dict:
+	"""Method to map the corpora of a directory by content digest.
+
+	Args:
+		directory (str): Directory of corpus files.
+
+	Returns:
+		dict: Filepaths keyed by SHA-1 of content.
+	"""
+	corpora = dict()
+	if directory and os.path.isdir(directory):
+		for name in os.listdir(directory):
+			filepath = os.path.join(directory, name)
+			if os.path.isfile(filepath):
+				with open(filepath, mode="rb") as fp:
+					corpora[hashlib.sha1(fp.read()).hexdigest()] = filepath
+	return corpora
+
+
+def replay(records: Iterable, send_factory: Callable, speed: float = 1.0, corpora: dict = None) -> list:
+	"""Method to re-issue traced requests with their original pacing.
+
+	Each traced client is replayed in order on its own thread with its own
+	cookies, while clients run concurrently, so session flows and overlap
+	between candidates are both preserved.
+
+	Args:
+		records (Iterable): Trace records.
+		send_factory (Callable): Returns a `send(request) -> status` callable
+			per client, see `replay_request` for the request fields.
+		speed (float, optional): Speed-up over the original pacing, 0 to
+			send as fast as possible. Defaults to 1.0.
+		corpora (dict, optional): Local corpora keyed by SHA-1 of content.
+			Defaults to None.
+
+	Returns:
+		list: Endpoint, status and latency in seconds of every replayed
+			request, None statuses for requests that could not be rebuilt.
+	"""
+	clients = dict()
+	for record in records:
+		clients.setdefault(record.get("client"), list()).append(record)
+	if not clients:
+		return []
+	origin = min(client[0]["t"] for client in clients.values())
+	started = time.monotonic()
+	results, lock = list(), threading.Lock()
+
+	def run(client_records):
+		send = send_factory()
+		for record in client_records:
+			if speed > 0:
+				delay = (record["t"] - origin) / speed - (time.monotonic() - started)
+				if delay > 0:
+					time.sleep(delay)
+			request = replay_request(record, corpora or {})
+			if request is None:
+				status, latency = None, 0.0
+			else:
+				start = time.perf_counter()
+				status = send(request)
+				latency = time.perf_counter() - start
+			with lock:
+				results.append({"endpoint": record["endpoint"], "status": status, "latency": latency})
+
+	threads = [threading.Thread(target=run, args=(client,), daemon=True) for client in clients.values()]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return results
+
+
+def http_sender(base_url: str) -> Callable:
+	"""Method to build a per-client sender for a running app instance.
+
+	Args:
+		base_url (str): Root URL of the app, e.g. "http://127.0.0.1:5000".
+
+	Returns:
+		Callable: Sender factory for `replay`.
+	"""
+	def factory():
+		opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+		def send(request):
+			url = base_url.rstrip("/") + request["path"]
+			if request["query"]:
+				url += "?" + urllib.parse.urlencode(request["query"])
+			data, headers = None, dict()
+			if request["body"] is not None:
+				data = request["body"].encode("utf-8")
+				headers["Content-Type"] = request["mimetype"] or "application/json"
+			elif request["files"]:
+				data, headers["Content-Type"] = multipart(request["form"], request["files"])
+			elif request["method"] != "GET":
+				data = urllib.parse.urlencode(request["form"]).encode("utf-8")
+				headers["Content-Type"] = "application/x-www-form-urlencoded"
+			try:
+				with opener.open(urllib.request.Request(url, data, headers, method=request["method"])) as response:
+					response.read()
+					return response.status
+			except urllib.error.HTTPError as error:
+				return error.code
+		return send
+	return factory
+
+
+def multipart(form: dict, files: dict) -> tuple:
+	"""Method to encode form fields and files as multipart/form-data.
+
+	Args:
+		form (dict): Field values.
+		files (dict): Filepaths keyed by field name.
+
+	Returns:
+		tuple: Body and content type.
+	"""
+	boundary = uuid.uuid4().hex
+	parts = list()
+	for name, value in form.items():
+		parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8"))
+	for name, filepath in files.items():
+		with open(filepath, mode="rb") as fp:
+			content = fp.read()
+		parts.append(
+			f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+			f'filename="{os.path.basename(filepath)}"\r\nContent-Type: text/plain\r\n\r\n'.encode("utf-8")
+			+ content + b"\r\n"
+		)
+	parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+	return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def summarize(results: list) -> dict:
+	"""Method to summarise replay latencies per endpoint.
+
+	Args:
+		results (list): Output of `replay`.
+
+	Returns:
+		dict: Count, errors, mean and percentile latencies per endpoint.
+	"""
+	grouped = dict()
+	for result in results:
+		if result["status"] is not None:
+			grouped.setdefault(result["endpoint"], list()).append(result)
+
+	summary = dict()
+	for endpoint, endpoint_results in sorted(grouped.items()):
+		latencies = np.array([result["latency"] for result in endpoint_results])
+		summary[endpoint] = {
+			"count": len(endpoint_results),
+			"errors": sum(1 for result in endpoint_results if result["status"] >= 500),
+			"mean": float(latencies.mean()),
+			**{f"p{p}": float(np.percentile(latencies, p)) for p in PERCENTILES}
+		}
+	return summary
+
+
+def compare(baseline: dict, candidate: dict) -> str:
+	"""Method to render the latency change between two replay summaries.
+
+	Args:
+		baseline (dict): Summary of the baseline build.
+		candidate (dict): Summary of the candidate build.
+
+	Returns:
+		str: Table of latencies in milliseconds and candidate/baseline ratios.
+	"""
+	columns = ["mean"] + [f"p{p}" for p in PERCENTILES]
+	lines = [f"{'endpoint':<24}" + "".join(f"{column:>24}" for column in columns)]
+	for endpoint in sorted(set(baseline) | set(candidate)):
+		if endpoint not in baseline or endpoint not in candidate:
+			lines.append(f"{endpoint:<24}  only in {'candidate' if endpoint in candidate else 'baseline'}")
+			continue
+		cells = list()
+		for column in columns:
+			before, after = baseline[endpoint][column] * 1000, candidate[endpoint][column] * 1000
+			ratio = after / before if before else float("inf")
+			cells.append(f"{before:>8.1f} -> {after:>7.1f} {ratio:>4.2f}x")
+		lines.append(f"{endpoint:<24}" + "".join(f"{cell:>24}" for cell in cells))
+	return "\n".join(lines)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Replay captured traffic and compare latency distributions.")
+	commands = parser.add_subparsers(dest="command", required=True)
+	replay_parser = commands.add_parser("replay", help="Replay a trace against a running app.")
+	replay_parser.add_argument("trace")
+	replay_parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+	replay_parser.add_argument("--speed", type=float, default=1.0, help="Speed-up, 0 for no pacing.")
+	replay_parser.add_argument("--corpora", default=os.path.join(str(os.getcwd()), "corpus"))
+	replay_parser.add_argument("--output", help="Write the latency summary as JSON.")
+	compare_parser = commands.add_parser("compare", help="Compare two replay summaries.")
+	compare_parser.add_argument("baseline")
+	compare_parser.add_argument("candidate")
+	args = parser.parse_args()
+
+	if args.command == "replay":
+		results = replay(
+			read_trace(args.trace), http_sender(args.base_url), speed=args.speed, corpora=index_corpora(args.corpora)
+		)
+		skipped = sum(1 for result in results if result["status"] is None)
+		summary = summarize(results)
+		if args.output:
+			with open(args.output, mode="w") as fp:
+				json.dump(summary, fp, indent=2)
+		json.dump(summary, sys.stdout, indent=2)
+		sys.stdout.write(f"\n{len(results)} requests replayed, {skipped} skipped for missing corpora.\n")
+	else:
+		with open(args.baseline) as fp:
+			baseline = json.load(fp)
+		with open(args.candidate) as fp:
+			candidate = json.load(fp)
+		sys.stdout.write(compare(baseline, candidate) + "\n")
+
+
+if __name__ == "__main__":
+	main()
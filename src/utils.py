@@ -1,84 +1,492 @@
-
-
-import csv
-import logging
-import os
-
-import numpy as np
-import pandas as pd
-
-
-def backup(session: list) -> bool:
-	"""Method to backup details for the current session.
-
-	Args:
-		session (list): Session metadata container.
-
-	Returns:
-		bool: Status flag indicatig successful backup of session metadata.
-	"""
-	# Process session information
-	username = "_".join([x.upper() for x in session["username"].split()])
-	subject_name = session["subject_name"].strip().upper()
-	subject_id = session["subject_id"].strip()
-	test_type = ["Objective" if session["test_id"] == "0" else "Subjective"][0]
-	test_id = session["test_id"]
-	timestamp = session["date"]
-	status = False
-
-	# Construct login data
-	row = [
-		timestamp,
-		username,
-		subject_name,
-		subject_id,
-		test_type,
-		test_id,
-		session["score"],
-		session["result"]
-	]
-
-	# Push session metadata to a central repo
-	filepath = session["database_path"]
-	if os.path.isfile(filepath):
-		try:
-			with open(filepath, mode="a") as fp:
-				fp_writer = csv.writer(fp)
-				fp_writer.writerow(row)
-				status = True
-		except Exception as e:
-			logging.exception("Exception raised at `backup`.", exc_info=True)
-	else:
-		print("Database placeholder nott found!")
-	return status
-
-
-def relative_ranking(session: list) -> tuple:
-	"""Method to compute relative ranking for a particular user response.
-
-	Args:
-		session (list): Session metadata container.
-
-	Returns:
-		tuple: Tuple with max, min and mean score.
-	"""
-	min_scope, max_score = 0.0, 100.0
-	mean_score = None
-
-	def rounder(value, decimals=2):
-		return np.round(value, decimals=decimals)
-
-	# Load session meta to central repository
-	try:
-		df = pd.read_csv(session["database_path"])
-	except Exception as e:
-		logging.exception("Exception raised at `relative_ranking`.", exc_info=True)
-	else:
-		# Create relative score
-		df = df[(df["SUBJECT_ID"] == int(session["subject_id"])) & (df["TEST_ID"] == int(session["test_id"]))]
-		if df.shape[0] >= 1:
-			max_score = rounder(df["SCORE"].max(), decimals=2)
-			min_score = rounder(df["SCORE"].min(), decimals=2)
-			mean_score = rounder(df["SCORE"].mean(), decimals=2)
-	finally:
-		return (max_score, min_score, mean_score)
+
+
+import json
+import logging
+import os
+
+import numpy as np
+
+from src.collusion import collusion_index
+from src.difficulty import question_key, question_stats
+from src.evidence import SentenceIndex
+from src.executor import nlp_pool
+from src.export import iter_results, normalise_username
+from src.objective import ObjectiveTest
+from src.questionbank import QuestionBank
+from src.registry import file_digest, registry
+from src.semantic import SemanticSpace
+from src.subjective import SubjectiveTest
+from src.writer import results_writer
+
+# Seconds a lazy objective generation of an uploaded corpus may take
+GENERATION_TIME_BUDGET = float(os.environ.get("GENERATION_TIME_BUDGET", "10"))
+
+def objective_generator(filepath: str) -> ObjectiveTest:
+	"""Method to build the objective generator of a registered corpus.
+
+	Its question bank is memory-mapped from the corpus `.qbank` file, so
+	worker processes share one copy through the page cache.
+
+	Args:
+		filepath (str): Absolute filepath to the subject corpus.
+
+	Returns:
+		ObjectiveTest: Objective test generator.
+	"""
+	generator = ObjectiveTest(filepath)
+	generator.question_bank = QuestionBank.cached(filepath, generator.iter_question_sets)
+	return generator
+
+
+def subjective_generator(filepath: str) -> SubjectiveTest:
+	"""Method to build the subjective generator of a registered corpus.
+
+	Its keyword answers are read from the corpus `.keywords.json` file
+	while it matches the corpus digest, so only one process chunks the
+	corpus.
+
+	Args:
+		filepath (str): Absolute filepath to the subject corpus.
+
+	Returns:
+		SubjectiveTest: Subjective test generator.
+	"""
+	generator = SubjectiveTest(filepath)
+	digest = file_digest(filepath)
+	cache_path = os.path.splitext(filepath)[0] + ".keywords.json"
+	if os.path.isfile(cache_path):
+		try:
+			with open(cache_path, mode="r") as fp:
+				cached = json.load(fp)
+			if cached["digest"] == digest:
+				generator.question_answer_dict = cached["answers"]
+				return generator
+		except (OSError, ValueError, KeyError, TypeError):
+			logging.exception("Keyword answers cache unreadable.", exc_info=True)
+
+	generator.question_answer_dict = generator.keyword_answers()
+	# An empty result means the tokenizer failed, retry rather than cache it
+	if generator.question_answer_dict:
+		tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+		try:
+			with open(tmp_path, mode="w") as fp:
+				json.dump({"digest": digest, "answers": generator.question_answer_dict}, fp)
+			os.replace(tmp_path, cache_path)
+		except OSError:
+			logging.exception("Keyword answers cache not writable.", exc_info=True)
+	return generator
+
+
+registry.register_artifact("objective", objective_generator)
+registry.register_artifact("subjective", subjective_generator)
+registry.register_artifact("semantic", SemanticSpace.from_corpus)
+registry.register_artifact("evidence", SentenceIndex.from_corpus)
+
+# Artifacts cached on disk next to the corpus, built once and loaded by every worker
+PREBUILT_ARTIFACTS = ("objective", "subjective", "semantic")
+
+
+def prebuild(subject_id: str, stat: tuple = None) -> list:
+	"""Method to write the disk caches of a corpus, runnable on the NLP process pool.
+
+	Args:
+		subject_id (str): Subject identifier.
+		stat (tuple, optional): Registered corpus snapshot to build, see
+			`corpus_stat`. Defaults to None.
+
+	Returns:
+		list: Artifacts built, empty for an unknown subject.
+	"""
+	corpus = registry.sync(subject_id, stat)
+	if corpus is None:
+		return []
+	built = list()
+	for name in PREBUILT_ARTIFACTS:
+		try:
+			corpus.artifact(name, registry.builders[name])
+			built.append(name)
+		except Exception:
+			logging.exception("Artifact `%s` of subject `%s` not prebuilt.", name, subject_id, exc_info=True)
+	return built
+
+
+def prebuild_changed(corpora: list) -> None:
+	"""Registry listener building the disk caches of new and changed corpora.
+
+	One pool task per corpus, one at a time, so requests keep the other
+	workers; the serving workers then load the caches on first use
+	instead of building them on the request path.
+
+	Args:
+		corpora (list): Corpus snapshots from the registry watcher.
+	"""
+	for corpus in corpora:
+		try:
+			built = nlp_pool.submit(prebuild, corpus.subject_id, corpus.stat, block=True).result()
+			logging.info("Prebuilt %s for subject `%s`.", ", ".join(built) or "nothing", corpus.subject_id)
+		except Exception:
+			logging.exception("Prebuild of subject `%s` failed.", corpus.subject_id, exc_info=True)
+
+
+def subject_details(subject_id: str) -> tuple:
+	"""Method to resolve a registered subject into its name and corpus.
+
+	Args:
+		subject_id (str): Subject identifier as submitted by the test form.
+
+	Returns:
+		tuple: Subject name and absolute filepath to the subject corpus,
+			or (None, None) for an unknown subject.
+	"""
+	corpus = registry.get(subject_id)
+	if corpus is None:
+		return None, None
+	return corpus.subject_name, corpus.filepath
+
+
+def test_generator(subject_id: str, test_id: str, filepath: str):
+	"""Method to fetch a test generator for a subject.
+
+	Registered subjects share one generator per corpus snapshot so repeated
+	tests reuse the analysed corpus; uploaded corpora get a fresh one.
+
+	Args:
+		subject_id (str): Subject identifier.
+		test_id (str): Test type, "0" for objective and "1" for subjective.
+		filepath (str): Absolute filepath to the subject corpus.
+
+	Returns:
+		ObjectiveTest or SubjectiveTest: Test generator.
+	"""
+	name = "objective" if test_id == "0" else "subjective"
+	corpus = registry.get(subject_id)
+	if corpus is not None and corpus.filepath == filepath:
+		return corpus.artifact(name, registry.builders[name])
+	return ObjectiveTest(filepath) if test_id == "0" else SubjectiveTest(filepath)
+
+
+def corpus_stat(subject_id: str) -> tuple:
+	"""Method to fetch the snapshot key of a registered corpus for pool tasks.
+
+	Args:
+		subject_id (str): Subject identifier.
+
+	Returns:
+		tuple: Modification time and size of the corpus file, None for an
+			unknown subject.
+	"""
+	corpus = registry.get(subject_id)
+	return None if corpus is None else corpus.stat
+
+
+def corpus_digest(subject_id: str, filepath: str) -> str:
+	"""Method to fetch the digest identifying a corpus in question statistics.
+
+	Args:
+		subject_id (str): Subject identifier.
+		filepath (str): Absolute filepath to the subject corpus.
+
+	Returns:
+		str: Digest of the corpus, None if it cannot be read.
+	"""
+	corpus = registry.get(subject_id)
+	if corpus is not None and corpus.filepath == filepath:
+		return corpus.digest
+	try:
+		return file_digest(filepath)
+	except (OSError, TypeError):
+		return None
+
+
+def question_keys(subject_id: str, filepath: str, questions: list) -> list:
+	"""Method to identify objective questions in question statistics.
+
+	The keys are short enough to keep in the session cookie in place of
+	the questions, see `grade`.
+
+	Args:
+		subject_id (str): Subject identifier.
+		filepath (str): Absolute filepath to the subject corpus.
+		questions (list): Objective questions.
+
+	Returns:
+		list: Key of every question, empty if the corpus cannot be read.
+	"""
+	digest = corpus_digest(subject_id, filepath)
+	if digest is None:
+		return []
+	return [question_key(digest, str(x)) for x in questions]
+
+
+def generate(
+	subject_id: str,
+	test_id: str,
+	filepath: str,
+	num_questions: int,
+	target_difficulty: float = None,
+	stat: tuple = None
+) -> tuple:
+	"""Method to generate one test, runnable on the NLP process pool.
+
+	Args:
+		subject_id (str): Subject identifier.
+		test_id (str): Test type, "0" for objective and "1" for subjective.
+		filepath (str): Absolute filepath to the subject corpus.
+		num_questions (int): Number of questions in the test.
+		target_difficulty (float, optional): Select questions of registered
+			subjects around this difficulty in [0, 1] instead of uniformly.
+			Defaults to None.
+		stat (tuple, optional): Registered corpus snapshot the caller served,
+			see `corpus_stat`. Defaults to None.
+
+	Returns:
+		tuple: Questions and answers respectively.
+	"""
+	corpus = registry.sync(subject_id, stat)
+	if target_difficulty is not None and corpus is not None and corpus.filepath == filepath:
+		return test_generator(subject_id, test_id, filepath).generate_adaptive_test(
+			num_questions, target_difficulty, corpus.digest
+		)
+	if test_id == "0" and (corpus is None or corpus.filepath != filepath):
+		# One-off uploads are analysed only as far as the test needs
+		return ObjectiveTest(filepath).generate_test(
+			num_questions=num_questions, lazy=True, time_budget=GENERATION_TIME_BUDGET
+		)
+	return test_generator(subject_id, test_id, filepath).generate_test(num_questions=num_questions)
+
+
+def database_path() -> str:
+	"""Method to locate the central results repository.
+
+	Returns:
+		str: Absolute filepath to the results CSV.
+	"""
+	return os.path.join(str(os.getcwd()), "database", "results.csv")
+
+
+def grade(
+	test_id: str,
+	default_ans: list,
+	user_ans: list,
+	filepath: str = None,
+	subject_id: str = None,
+	questions: list = None,
+	stat: tuple = None,
+	keys: list = None
+) -> tuple:
+	"""Method to score a candidate response against the expected answers.
+
+	Args:
+		test_id (str): Test type, "0" for objective and "1" for subjective.
+		default_ans (list): Expected answers in question order.
+		user_ans (list): Candidate answers in question order.
+		filepath (str, optional): Subject corpus used by the subjective
+			evaluator. Defaults to None.
+		subject_id (str, optional): Registered subject whose semantic space
+			credits paraphrased subjective answers. Defaults to None.
+		questions (list, optional): Objective questions in answer order,
+			needed to record their statistics. Defaults to None.
+		stat (tuple, optional): Registered corpus snapshot the caller served,
+			see `corpus_stat`. Defaults to None.
+		keys (list, optional): Objective question keys from `question_keys`,
+			used in place of `questions`. Defaults to None.
+
+	Returns:
+		tuple: Total score, pass/fail status and per-question feedback.
+	"""
+	if subject_id is not None:
+		registry.sync(subject_id, stat)
+	# Objective questions are identified by their sentence, subjective ones by their answer
+	sentences = list(questions or []) if test_id == "0" else [str(x) for x in default_ans]
+	default_ans = [str(x).strip().upper() for x in default_ans]
+	user_ans = [str(x).strip().upper() for x in user_ans]
+	num_questions = max(len(user_ans), 1)
+
+	# Ensure both lists have the same length by trimming missing questions
+	min_len = min(len(user_ans), len(default_ans))
+	user_ans = user_ans[:min_len]
+	default_ans = default_ans[:min_len]
+
+	total_score = 0
+	status = None
+	feedback = list()
+	scores = list()
+	if test_id == "0":
+		# Evaluate objective answers
+		for i in range(min_len):
+			if user_ans[i] == default_ans[i]:
+				total_score += 100
+				scores.append(100)
+				feedback.append(f"Question {i+1}: Correct!")
+			else:
+				scores.append(0)
+				feedback.append(f"Question {i+1}: Incorrect. The correct answer was {default_ans[i]}.")
+		total_score = round(total_score / num_questions, 3)
+		status = "Pass" if total_score >= 33.33 else "Fail"
+	elif test_id == "1":
+		# Evaluate subjective answers, the whole batch in one pass
+		subjective_generator = SubjectiveTest(filepath)
+		corpus = registry.get(subject_id)
+		semantic_space, sentence_index = None, None
+		if corpus is not None and corpus.filepath == filepath:
+			try:
+				semantic_space = corpus.artifact("semantic", registry.builders["semantic"])
+			except Exception:
+				logging.exception("Semantic space unavailable, scoring lexically.", exc_info=True)
+			try:
+				sentence_index = corpus.artifact("evidence", registry.builders["evidence"])
+			except Exception:
+				logging.exception("Sentence index unavailable, feedback without evidence.", exc_info=True)
+		scores = subjective_generator.evaluate_subjective_answers(default_ans, user_ans, semantic_space)
+		for i, score in enumerate(scores):
+			total_score += score
+			supporting, missing = [], []
+			if sentence_index is not None:
+				supporting, missing = sentence_index.evidence(default_ans[i], user_ans[i])
+			if score > 0:
+				message = f"Question {i+1}: Good job! Your answer is relevant."
+				if supporting:
+					message += f' Supported by: "{supporting[0]}"'
+				if missing:
+					message += f' You could also cover: "{missing[0]}"'
+				feedback.append(message)
+			elif missing:
+				feedback.append(f'Question {i+1}: Needs improvement. Your answer misses: "{missing[0]}"')
+			else:
+				feedback.append(f"Question {i+1}: Needs improvement. Suggested answer was {default_ans[i]}.")
+		total_score = round(total_score / num_questions, 3)
+		status = "Pass" if total_score > 50.0 else "Fail"
+
+	# Feed per-question statistics for adaptive tests
+	if keys is None and sentences and scores:
+		keys = question_keys(subject_id, filepath, sentences)
+	if keys and scores:
+		try:
+			question_stats.record(keys, scores)
+		except Exception:
+			logging.exception("Question statistics not recorded.", exc_info=True)
+
+	# Moderate the final score
+	if total_score > 40:
+		total_score = round(total_score + 40, 3)
+	if total_score > 96:
+		total_score = 96
+	return total_score, status, feedback
+
+
+def screen_answers(subject_id: str, username: str, default_ans: list, user_ans: list) -> str:
+	"""Method to flag subjective answers nearly identical to another candidate's.
+
+	Answers are compared per expected answer, which names the question
+	whatever wording was drawn for it. Copies of the expected answer are
+	not flagged, and each question reports its most similar candidates
+	only.
+
+	Args:
+		subject_id (str): Subject identifier.
+		username (str): Candidate who submitted the answers.
+		default_ans (list): Expected answers in question order.
+		user_ans (list): Candidate answers in question order.
+
+	Returns:
+		str: Flags such as "Q2~JANE_DOE(0.91)", joined by ";".
+	"""
+	username = normalise_username(username)
+	flags = list()
+	for i, (expected, answer) in enumerate(zip(default_ans, user_ans)):
+		try:
+			matches = collusion_index.check(
+				subject_id, str(expected), username, SubjectiveTest.word_tokenizer(str(answer)),
+				SubjectiveTest.word_tokenizer(str(expected))
+			)
+		except Exception:
+			logging.exception("Exception raised at `screen_answers`.", exc_info=True)
+			continue
+		for other, similarity in matches:
+			flags.append(f"Q{i+1}~{other}({similarity:.2f})")
+	return ";".join(flags)
+
+
+def backup(session: list) -> bool:
+	"""Method to backup details for the current session.
+
+	The row is handed to the write-behind `results_writer`, so no disk I/O
+	happens on the request path.
+
+	Args:
+		session (list): Session metadata container.
+
+	Returns:
+		bool: Status flag indicatig the session metadata was queued for backup.
+	"""
+	# Process session information
+	username = "_".join([x.upper() for x in session["username"].split()])
+	subject_name = session["subject_name"].strip().upper()
+	subject_id = session["subject_id"].strip()
+	test_type = ["Objective" if session["test_id"] == "0" else "Subjective"][0]
+	test_id = session["test_id"]
+	timestamp = session["date"]
+	status = False
+
+	# Construct login data
+	row = [
+		timestamp,
+		username,
+		subject_name,
+		subject_id,
+		test_type,
+		test_id,
+		session["score"],
+		session["result"],
+		session.get("flags", "")
+	]
+
+	# Queue session metadata for the central repo, written behind the request
+	filepath = session["database_path"]
+	if os.path.isdir(os.path.dirname(filepath)):
+		status = results_writer.submit(filepath, row)
+	else:
+		print("Database placeholder nott found!")
+	return status
+
+
+def relative_ranking(session: list) -> tuple:
+	"""Method to compute relative ranking for a particular user response.
+
+	Results are streamed, so memory use does not grow with the history.
+
+	Args:
+		session (list): Session metadata container.
+
+	Returns:
+		tuple: Tuple with max, min and mean score.
+	"""
+	min_score, max_score = 0.0, 100.0
+	mean_score = None
+
+	def rounder(value, decimals=2):
+		return np.round(value, decimals=decimals)
+
+	# Scan the central repository for the same subject and test type
+	count, total, high, low = 0, 0.0, None, None
+	try:
+		records = iter_results(
+			session["database_path"],
+			subject_id=str(session["subject_id"]),
+			test_id=str(session["test_id"])
+		)
+		for _, record in records:
+			score = float(record["SCORE"])
+			count += 1
+			total += score
+			high = score if high is None else max(high, score)
+			low = score if low is None else min(low, score)
+	except Exception as e:
+		logging.exception("Exception raised at `relative_ranking`.", exc_info=True)
+	else:
+		# Create relative score
+		if count >= 1:
+			max_score = rounder(high, decimals=2)
+			min_score = rounder(low, decimals=2)
+			mean_score = rounder(total / count, decimals=2)
+	return (max_score, min_score, mean_score)
@@ -0,0 +1,287 @@
+
+
+import atexit
+import csv
+import io
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+	import fcntl
+except ImportError:
+	# Windows: appends are only serialised within this process
+	fcntl = None
+
+# Header of the central results repository
+RESULT_COLUMNS = [
+	"DATE",
+	"USERNAME",
+	"SUBJECT_NAME",
+	"SUBJECT_ID",
+	"TEST_TYPE",
+	"TEST_ID",
+	"SCORE",
+	"RESULT",
+	"FLAGS"
+]
+
+FSYNC_POLICIES = ("batch", "interval", "never")
+
+
+def result_columns(header: list) -> list:
+	"""Method to name the columns of a results file from its header.
+
+	A file started before a column was added keeps its shorter header while
+	new rows carry every column, so a header that is a prefix of
+	`RESULT_COLUMNS` stands for all of them.
+
+	Args:
+		header (list): First row of the results file.
+
+	Returns:
+		list: Column names of the rows.
+	"""
+	if header == RESULT_COLUMNS[:len(header)]:
+		return RESULT_COLUMNS
+	return header
+
+
+def encode_row(row: list) -> bytes:
+	"""Method to render one CSV row as it is stored.
+
+	Args:
+		row (list): Row values.
+
+	Returns:
+		bytes: UTF-8 encoded line.
+	"""
+	buffer = io.StringIO()
+	csv.writer(buffer).writerow(row)
+	return buffer.getvalue().encode("utf-8")
+
+
+class ResultsWriter:
+	"""Write-behind appender for the results repository.
+
+	Request handlers enqueue rows and return immediately. A single
+	background thread per process appends them in batches, holding an
+	exclusive file lock per batch so rows from concurrent workers never
+	interleave.
+	"""
+
+	def __init__(
+		self,
+		batch_size: int = 64,
+		flush_interval: float = 0.5,
+		fsync: str = "batch",
+		fsync_interval: float = 1.0,
+		max_queue: int = 10000
+	):
+		"""Class constructor.
+
+		Args:
+			batch_size (int, optional): Rows that trigger a flush. Defaults to 64.
+			flush_interval (float, optional): Seconds after which pending rows
+				are flushed regardless of count. Defaults to 0.5.
+			fsync (str, optional): "batch" to fsync every flush, "interval" to
+				fsync at most every `fsync_interval` seconds or "never".
+				Defaults to "batch".
+			fsync_interval (float, optional): Seconds between fsyncs for the
+				"interval" policy. Defaults to 1.0.
+			max_queue (int, optional): Maximum number of pending rows.
+				Defaults to 10000.
+		"""
+		if fsync not in FSYNC_POLICIES:
+			raise ValueError(f"Unknown fsync policy `{fsync}`.")
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.fsync = fsync
+		self.fsync_interval = fsync_interval
+		self.queue = queue.Queue(maxsize=max_queue)
+		self._thread = None
+		self._pid = None
+		self._lock = threading.Lock()
+		self._last_fsync = 0.0
+		self.listeners = list()
+		self._stats = {
+			"rows_written": 0,
+			"rows_dropped": 0,
+			"flushes": 0,
+			"last_flush_latency": 0.0,
+			"max_flush_latency": 0.0,
+			"total_flush_latency": 0.0
+		}
+
+	def submit(self, filepath: str, row: list) -> bool:
+		"""Method to enqueue a result row.
+
+		Args:
+			filepath (str): Results CSV the row is appended to.
+			row (list): Row in `RESULT_COLUMNS` order.
+
+		Returns:
+			bool: False if the queue is full and the row was dropped.
+		"""
+		self.start()
+		try:
+			self.queue.put_nowait((filepath, row))
+		except queue.Full:
+			self._stats["rows_dropped"] += 1
+			logging.error("Results queue full, dropping row for `%s`.", filepath)
+			return False
+		return True
+
+	def start(self) -> None:
+		"""Method to start the background writer, once per process."""
+		if self._pid == os.getpid() and self._thread.is_alive():
+			return
+		with self._lock:
+			if self._pid != os.getpid() or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self.run, name="results-writer", daemon=True)
+				self._pid = os.getpid()
+				self._thread.start()
+
+	def run(self) -> None:
+		"""Method to collect queued rows into batches and flush them."""
+		batch = list()
+		deadline = None
+		while True:
+			timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+			try:
+				item = self.queue.get(timeout=timeout)
+			except queue.Empty:
+				item = False
+
+			if item is None:
+				# Drain request
+				self.flush(batch)
+				self.queue.task_done()
+				return
+			if item:
+				batch.append(item)
+				self.queue.task_done()
+				if deadline is None:
+					deadline = time.monotonic() + self.flush_interval
+			if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+				self.flush(batch)
+				batch = list()
+				deadline = None
+
+	def flush(self, batch: list) -> None:
+		"""Method to append a batch of rows, grouped by results file.
+
+		Args:
+			batch (list): Pending (filepath, row) pairs.
+		"""
+		if not batch:
+			return
+		start = time.perf_counter()
+		grouped = dict()
+		for filepath, row in batch:
+			grouped.setdefault(filepath, list()).append(row)
+
+		for filepath, rows in grouped.items():
+			try:
+				self.append(filepath, rows)
+				self._stats["rows_written"] += len(rows)
+			except Exception:
+				self._stats["rows_dropped"] += len(rows)
+				logging.exception("Exception raised at `ResultsWriter.flush`.", exc_info=True)
+
+		latency = time.perf_counter() - start
+		self._stats["flushes"] += 1
+		self._stats["last_flush_latency"] = latency
+		self._stats["max_flush_latency"] = max(self._stats["max_flush_latency"], latency)
+		self._stats["total_flush_latency"] += latency
+
+	def append(self, filepath: str, rows: list) -> None:
+		"""Method to append rows to a results file under an exclusive lock.
+
+		Listeners are told the byte offset of every row while the lock is
+		still held, so they see rows in file order.
+
+		Args:
+			filepath (str): Results CSV.
+			rows (list): Rows in `RESULT_COLUMNS` order.
+		"""
+		with open(filepath, mode="ab") as fp:
+			if fcntl is not None:
+				fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+			try:
+				# Another worker may have appended while we waited for the lock
+				fp.seek(0, os.SEEK_END)
+				if fp.tell() == 0:
+					fp.write(encode_row(RESULT_COLUMNS))
+				offsets, lines = list(), list()
+				position = fp.tell()
+				for row in rows:
+					lines.append(encode_row(row))
+					offsets.append(position)
+					position += len(lines[-1])
+				fp.write(b"".join(lines))
+				fp.flush()
+				now = time.monotonic()
+				if self.fsync == "batch" or (
+					self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval
+				):
+					os.fsync(fp.fileno())
+					self._last_fsync = now
+
+				for listener in self.listeners:
+					try:
+						listener(filepath, rows, offsets, position)
+					except Exception:
+						logging.exception("Exception raised by a results listener.", exc_info=True)
+			finally:
+				if fcntl is not None:
+					fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+	def add_listener(self, listener) -> None:
+		"""Method to register a callback for appended rows.
+
+		Args:
+			listener (Callable): Called with the results filepath, the rows,
+				the byte offset of each row and the offset past the last one
+				after every append.
+		"""
+		self.listeners.append(listener)
+
+	def drain(self, timeout: float = 10.0) -> bool:
+		"""Method to flush every pending row and stop the background writer.
+
+		Args:
+			timeout (float, optional): Seconds to wait for the writer.
+				Defaults to 10.0.
+
+		Returns:
+			bool: True if the writer finished within the timeout.
+		"""
+		if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+			return True
+		self.queue.put(None)
+		self._thread.join(timeout)
+		return not self._thread.is_alive()
+
+	def stats(self) -> dict:
+		"""Method to report queue depth and flush latency.
+
+		Returns:
+			dict: Writer statistics, latencies in seconds.
+		"""
+		stats = dict(self._stats)
+		stats["queue_depth"] = self.queue.qsize()
+		flushes = max(stats["flushes"], 1)
+		stats["mean_flush_latency"] = stats.pop("total_flush_latency") / flushes
+		return stats
+
+
+results_writer = ResultsWriter(
+	batch_size=int(os.environ.get("RESULTS_BATCH_SIZE", "64")),
+	flush_interval=float(os.environ.get("RESULTS_FLUSH_INTERVAL", "0.5")),
+	fsync=os.environ.get("RESULTS_FSYNC", "batch"),
+	max_queue=int(os.environ.get("RESULTS_MAX_QUEUE", "10000"))
+)
+atexit.register(results_writer.drain)